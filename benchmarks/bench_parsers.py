@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Parser scaling benchmark
+合成したSBI証券形式のCSVで JPCSVParser / USCSVParser の解析速度とピークメモリを行数ごとに計測する。
+
+    python benchmarks/bench_parsers.py --sizes 1000 10000 50000 --lean
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from libs.jp_csv_parser import JPCSVParser
+from libs.us_csv_parser import USCSVParser
+from libs.synthetic_exports import generate_jp_export, generate_us_export
+
+# 行数に対する解析時間の増え方（両対数の傾き）がこれを超えたら警告
+SCALING_WARN_EXPONENT = 1.25
+
+
+def _parse_jp(path: str, lean: bool) -> int:
+    parser = JPCSVParser(path, lean=lean)
+    sections = parser.parse_csv()
+    return len(parser.get_stock_holdings(sections)) + len(parser.get_fund_holdings(sections))
+
+
+def _parse_us(path: str, lean: bool) -> int:
+    return len(USCSVParser(path, lean=lean).get_us_stock_holdings())
+
+
+PARSERS = {
+    'jp': (generate_jp_export, _parse_jp),
+    'us': (generate_us_export, _parse_us),
+}
+
+
+def measure(parse_fn, path: str, lean: bool, repeat: int) -> dict:
+    """解析時間（repeat 回の最小値）とピークメモリ（tracemalloc）を計測"""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        parsed = parse_fn(path, lean)
+        times.append(time.perf_counter() - started)
+
+    # tracemalloc は解析を遅くするため時間の計測とは別に実行
+    tracemalloc.start()
+    try:
+        parse_fn(path, lean)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {'parsed': parsed, 'seconds': min(times), 'peak_bytes': peak}
+
+
+def run(sizes, encodings, lean_modes, repeat: int, sections: int) -> list:
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for name, (generate_fn, parse_fn) in PARSERS.items():
+            for encoding in encodings:
+                for rows in sizes:
+                    path = os.path.join(directory, f"{name}_{encoding}_{rows}.csv")
+                    section_count = sections if name == 'jp' else max(1, sections // 2)
+                    expected = sum(count for key, count in generate_fn(path, rows, section_count, encoding=encoding).items()
+                                   if key.endswith('_rows'))
+                    for lean in lean_modes:
+                        result = measure(parse_fn, path, lean, repeat)
+                        result.update({
+                            'parser': name, 'encoding': encoding, 'lean': lean, 'rows': rows,
+                            'expected': expected, 'file_bytes': os.path.getsize(path),
+                        })
+                        results.append(result)
+                        print_row(result)
+    return results
+
+
+def print_header():
+    print(f"{'parser':<6} {'encoding':<8} {'lean':<5} {'rows':>8} {'parsed':>8} {'MB':>7} "
+          f"{'sec':>8} {'rows/s':>10} {'peak MB':>8} {'peak B/row':>10}")
+
+
+def print_row(result: dict):
+    mismatch = '' if result['parsed'] == result['expected'] else f"  !! expected {result['expected']}"
+    print(f"{result['parser']:<6} {result['encoding']:<8} {str(result['lean']):<5} {result['rows']:>8} "
+          f"{result['parsed']:>8} {result['file_bytes'] / 1e6:>7.2f} {result['seconds']:>8.3f} "
+          f"{result['rows'] / result['seconds']:>10,.0f} {result['peak_bytes'] / 2**20:>8.1f} "
+          f"{result['peak_bytes'] / result['rows']:>10,.0f}{mismatch}")
+
+
+def scaling_exponents(results: list) -> dict:
+    """解析時間・ピークメモリの行数に対する増え方（最小と最大の行数の両対数の傾き、1.0 が線形）"""
+    groups = {}
+    for result in results:
+        groups.setdefault((result['parser'], result['encoding'], result['lean']), []).append(result)
+
+    exponents = {}
+    for key, group in groups.items():
+        group.sort(key=lambda result: result['rows'])
+        small, large = group[0], group[-1]
+        if large['rows'] == small['rows']:
+            continue
+        ratio = math.log(large['rows'] / small['rows'])
+        exponents[key] = {
+            'time': math.log(large['seconds'] / small['seconds']) / ratio,
+            'memory': math.log(large['peak_bytes'] / small['peak_bytes']) / ratio,
+        }
+    return exponents
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark portfolio CSV parsers on synthetic SBI exports')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 5000, 20000, 50000],
+                        help='Row counts to generate (default: 1000 5000 20000 50000)')
+    parser.add_argument('--encodings', nargs='+', choices=['cp932', 'utf-8'], default=['cp932', 'utf-8'])
+    parser.add_argument('--sections', type=int, default=6, help='Sections per JP export (default: 6)')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per case; the fastest is reported')
+    parser.add_argument('--lean', action='store_true', help='Also measure lean parsing (categorical/downcast dtypes)')
+    parser.add_argument('--json', default=None, metavar='PATH', help='Write raw results as JSON')
+    args = parser.parse_args()
+
+    print_header()
+    results = run(sorted(args.sizes), args.encodings, [False, True] if args.lean else [False],
+                  args.repeat, args.sections)
+
+    print()
+    print("Scaling exponents (1.0 = linear in rows):")
+    exponents = scaling_exponents(results)
+    for (name, encoding, lean), exponent in exponents.items():
+        warning = '  !! superlinear' if exponent['time'] > SCALING_WARN_EXPONENT else ''
+        print(f"  {name:<4} {encoding:<6} lean={str(lean):<5} time^{exponent['time']:.2f} "
+              f"memory^{exponent['memory']:.2f}{warning}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    mismatched = [result for result in results if result['parsed'] != result['expected']]
+    if mismatched:
+        print(f"\n{len(mismatched)} case(s) parsed a different number of rows than generated")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
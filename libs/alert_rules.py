@@ -0,0 +1,220 @@
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# ルール種別
+RULE_PRICE_CROSS = 0         # 価格が指定水準をまたいだ
+RULE_CHANGE_PCT = 1          # 前日比（％）が閾値を超えた
+RULE_FROM_ACQUISITION = 2    # 取得単価からの乖離（％）が閾値を超えた
+
+RULE_TYPES = {
+    'price_cross': RULE_PRICE_CROSS,
+    'change_pct': RULE_CHANGE_PCT,
+    'from_acquisition_pct': RULE_FROM_ACQUISITION,
+}
+
+DIRECTIONS = {'above': 1, 'below': -1}
+
+
+class _RuleBlock:
+    """1銘柄分のルールを配列で保持するブロック"""
+
+    def __init__(self, rules: List[Dict]):
+        self.rules = rules
+        self.kinds = np.array([RULE_TYPES[r['type']] for r in rules], dtype=np.int8)
+        self.thresholds = np.array([float(r['threshold']) for r in rules], dtype=np.float64)
+        self.directions = np.array([DIRECTIONS[r.get('direction', 'above')] for r in rules], dtype=np.int8)
+        # エッジトリガー用の状態（条件成立中はTrue、解除されるまで再通知しない）
+        self.active = np.zeros(len(rules), dtype=bool)
+
+
+class AlertRuleEngine:
+    """銘柄別にインデックス化した価格アラートルールを一括評価するクラス
+
+    ルールは銘柄ごとにNumPy配列のブロックとして保持し、評価時は
+    価格が変化した銘柄のブロックだけを連結してベクトル演算する。
+    そのため評価コストはルール総数ではなく変化した銘柄数に比例する。
+
+    state_path を指定した場合、前回評価時の株価と条件成立中のルールID（エッジ判定の状態）を
+    保存し、次回起動時に復元する（--check-alerts の単発実行でも再通知しない）。
+    """
+
+    def __init__(self, rules: Optional[List[Dict]] = None, state_path: Optional[str] = None):
+        self.blocks: Dict[tuple, _RuleBlock] = {}
+        self.last_prices: Dict[tuple, float] = {}
+        self.state_path = state_path
+        if rules:
+            self.set_rules(rules)
+
+    @classmethod
+    def from_json(cls, path: str, state_path: Optional[str] = None) -> 'AlertRuleEngine':
+        """JSONファイルからルールを読み込み"""
+        with open(path, 'r', encoding='utf-8') as f:
+            rules = json.load(f)
+        return cls(rules, state_path=state_path)
+
+    def _load_state(self):
+        """保存したエッジ判定の状態を復元（ルールIDで対応付け、削除されたルールは無視）"""
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("アラート状態の読み込みエラー: %s", e)
+            return
+
+        self.last_prices = {}
+        for key, price in state.get('last_prices', {}).items():
+            market, _, symbol = key.partition(':')
+            if (market, symbol) in self.blocks:
+                self.last_prices[(market, symbol)] = float(price)
+
+        active = set(state.get('active', []))
+        for block in self.blocks.values():
+            block.active = np.array([rule['id'] in active for rule in block.rules], dtype=bool)
+
+    def _save_state(self):
+        """エッジ判定の状態を保存（一時ファイル経由で置き換え）"""
+        if not self.state_path:
+            return
+        state = {
+            'updated_at': datetime.now().isoformat(),
+            'last_prices': {f"{market}:{symbol}": price for (market, symbol), price in self.last_prices.items()},
+            'active': [rule['id'] for block in self.blocks.values()
+                       for rule, active in zip(block.rules, block.active) if active],
+        }
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self.state_path)
+
+    def set_rules(self, rules: List[Dict]):
+        """ルールを銘柄別にインデックス化"""
+        grouped: Dict[tuple, List[Dict]] = {}
+        for i, rule in enumerate(rules):
+            if rule.get('type') not in RULE_TYPES:
+                logger.warning("未対応のルール種別をスキップしました: %s", rule)
+                continue
+            if rule.get('direction', 'above') not in DIRECTIONS:
+                logger.warning("未対応のdirectionのルールをスキップしました: %s", rule)
+                continue
+            rule = dict(rule)
+            rule.setdefault('id', f"rule-{i}")
+            rule['market'] = rule.get('market', 'JP').upper()
+            key = (rule['market'], str(rule['symbol']))
+            grouped.setdefault(key, []).append(rule)
+
+        self.blocks = {key: _RuleBlock(block_rules) for key, block_rules in grouped.items()}
+        logger.info("アラートルールを読み込みました: %d件 (%d銘柄)",
+                    sum(len(b.rules) for b in self.blocks.values()), len(self.blocks))
+        self._load_state()
+
+    def get_symbols(self, market: str) -> List[str]:
+        """ルールが設定されている銘柄を取得"""
+        market = market.upper()
+        return [symbol for (m, symbol) in self.blocks if m == market]
+
+    def evaluate(self, quotes: Dict[str, Dict], market: str = "JP",
+                 acquisition_prices: Optional[Dict[str, float]] = None) -> List[Dict]:
+        """株価更新に対してルールを評価し、発火したルールを返す
+
+        quotes は StockPriceFetcher.get_multiple_prices の戻り値と同じ形式。
+        """
+        market = market.upper()
+        acquisition_prices = acquisition_prices or {}
+
+        # 価格が変化した銘柄のみ評価対象にする
+        keys, blocks = [], []
+        current, previous, change_pct, acquisition = [], [], [], []
+        for symbol, quote in quotes.items():
+            key = (market, symbol)
+            block = self.blocks.get(key)
+            if block is None or not quote:
+                continue
+
+            price = quote['current_price']
+            last_price = self.last_prices.get(key)
+            if last_price == price:
+                continue
+
+            keys.append(key)
+            blocks.append(block)
+            current.append(price)
+            previous.append(last_price if last_price is not None else quote.get('previous_close') or price)
+            change_pct.append(quote.get('price_change_pct', 0.0))
+            acquisition.append(acquisition_prices.get(symbol, np.nan))
+            self.last_prices[key] = price
+
+        if not blocks:
+            return []
+
+        # 銘柄単位の値をルール単位に展開して一括評価
+        sizes = np.array([len(b.rules) for b in blocks])
+        kinds = np.concatenate([b.kinds for b in blocks])
+        thresholds = np.concatenate([b.thresholds for b in blocks])
+        directions = np.concatenate([b.directions for b in blocks])
+        was_active = np.concatenate([b.active for b in blocks])
+
+        cur = np.repeat(np.asarray(current, dtype=np.float64), sizes)
+        prev = np.repeat(np.asarray(previous, dtype=np.float64), sizes)
+        pct = np.repeat(np.asarray(change_pct, dtype=np.float64), sizes)
+        acq = np.repeat(np.asarray(acquisition, dtype=np.float64), sizes)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            from_acq = (cur / acq - 1.0) * 100
+
+        # 価格水準のクロスは前回値との比較で判定（エッジ判定不要）
+        crossed = np.where(directions > 0, (prev < thresholds) & (cur >= thresholds),
+                           (prev > thresholds) & (cur <= thresholds))
+        # 閾値系は方向付きで比較（belowは閾値以下）
+        metric = np.where(kinds == RULE_CHANGE_PCT, pct, from_acq)
+        beyond = np.where(directions > 0, metric >= thresholds, metric <= thresholds)
+        beyond &= ~np.isnan(metric)
+
+        is_cross = kinds == RULE_PRICE_CROSS
+        condition = np.where(is_cross, crossed, beyond)
+        fired = np.where(is_cross, crossed, beyond & ~was_active)
+
+        # 状態を書き戻し
+        offsets = np.concatenate([[0], np.cumsum(sizes)])
+        for block, start, end in zip(blocks, offsets[:-1], offsets[1:]):
+            block.active = condition[start:end] & ~is_cross[start:end]
+        self._save_state()
+
+        results = []
+        for idx in np.flatnonzero(fired):
+            block_idx = int(np.searchsorted(offsets, idx, side='right') - 1)
+            rule = blocks[block_idx].rules[idx - offsets[block_idx]]
+            results.append({
+                'rule': rule,
+                'symbol': keys[block_idx][1],
+                'market': market,
+                'current_price': float(cur[idx]),
+                'value': float(cur[idx] if is_cross[idx] else metric[idx]),
+            })
+
+        return results
+
+    @staticmethod
+    def format_alert(alert: Dict) -> str:
+        """発火したアラートをメッセージ用の文字列に変換"""
+        rule = alert['rule']
+        symbol = alert['symbol']
+        arrow = "⬆️" if rule.get('direction', 'above') == 'above' else "⬇️"
+        label = rule.get('label') or ''
+
+        if rule['type'] == 'price_cross':
+            text = f"{arrow} {symbol} 価格が{rule['threshold']}を通過 (現在値 {alert['current_price']:,.2f})"
+        elif rule['type'] == 'change_pct':
+            text = f"{arrow} {symbol} 前日比 {alert['value']:+.2f}% (閾値 {rule['threshold']:+}%)"
+        else:
+            text = f"{arrow} {symbol} 取得単価比 {alert['value']:+.2f}% (閾値 {rule['threshold']:+}%)"
+
+        return f"{text} {label}".rstrip()
@@ -0,0 +1,120 @@
+import logging
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+import pandas as pd
+from libs.alert_rules import DIRECTIONS, RULE_TYPES
+
+logger = logging.getLogger(__name__)
+
+# アラートルールに加えてバックテストで評価できる指標ルール（period で期間を指定）
+INDICATOR_TYPES = {
+    'ma_deviation_pct': 25,   # 移動平均からの乖離（％）
+    'rsi': 14,                # RSI（Wilderの平滑化）
+}
+
+DEFAULT_HORIZONS = (1, 5, 20)
+
+
+def _moving_average_deviation(closes: pd.DataFrame, period: int) -> pd.DataFrame:
+    return (closes / closes.rolling(period, min_periods=period).mean() - 1) * 100
+
+
+def _rsi(closes: pd.DataFrame, period: int) -> pd.DataFrame:
+    delta = closes.diff()
+    gain = delta.clip(lower=0).ewm(alpha=1 / period, min_periods=period, adjust=False).mean()
+    loss = (-delta.clip(upper=0)).ewm(alpha=1 / period, min_periods=period, adjust=False).mean()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 100 - 100 / (1 + gain / loss)
+
+
+_INDICATORS = {
+    'ma_deviation_pct': _moving_average_deviation,
+    'rsi': _rsi,
+}
+
+
+def backtest_rules(rules: List[Dict], closes: pd.DataFrame, market: str = "JP",
+                   acquisition_prices: Optional[Dict[str, float]] = None,
+                   horizons: Sequence[int] = DEFAULT_HORIZONS) -> pd.DataFrame:
+    """日次終値の履歴に対してアラート・指標ルールを一括評価し、ルールごとの集計を返す
+
+    closes は日付×銘柄コードの終値の表（StockPriceFetcher.get_bulk_historical_data の
+    ['終値']）。日付方向のループは行わず、日付×ルールの行列で条件を評価する。
+    発火の判定は AlertRuleEngine と同じく、price_cross は前日終値からのクロス、
+    それ以外は条件が成立した日（前日は不成立）とする。
+    戻り値の列: id, symbol, type, threshold, direction, fires, first_fire, last_fire,
+    および各 horizon の発火後リターン平均（return_{h}d, ％）と勝率（win_rate_{h}d, ％）。
+    """
+    market = market.upper()
+    acquisition_prices = acquisition_prices or {}
+    rules = [dict(rule, id=rule.get('id', f"rule-{i}")) for i, rule in enumerate(rules)
+             if rule.get('market', 'JP').upper() == market and str(rule['symbol']) in closes.columns
+             and (rule.get('type') in RULE_TYPES or rule.get('type') in INDICATOR_TYPES)
+             and rule.get('direction', 'above') in DIRECTIONS]
+    if not rules or closes.empty:
+        return pd.DataFrame()
+
+    columns = {symbol: i for i, symbol in enumerate(closes.columns)}
+    cols = np.array([columns[str(rule['symbol'])] for rule in rules])
+    kinds = np.array([rule['type'] for rule in rules])
+    thresholds = np.array([float(rule['threshold']) for rule in rules])
+    directions = np.array([DIRECTIONS[rule.get('direction', 'above')] for rule in rules])
+
+    # 日付×ルールの行列に展開
+    prices = closes.to_numpy(dtype=np.float64)[:, cols]
+    previous = np.vstack([np.full((1, len(rules)), np.nan), prices[:-1]])
+
+    metric = np.full_like(prices, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        is_change = kinds == 'change_pct'
+        metric[:, is_change] = (prices[:, is_change] / previous[:, is_change] - 1) * 100
+
+        is_acquisition = kinds == 'from_acquisition_pct'
+        acquisition = np.array([acquisition_prices.get(str(rule['symbol']), np.nan) for rule in rules])
+        metric[:, is_acquisition] = (prices[:, is_acquisition] / acquisition[is_acquisition] - 1) * 100
+
+    # 指標は種類・期間ごとに全銘柄分を1回だけ計算
+    for kind, default_period in INDICATOR_TYPES.items():
+        periods = np.array([int(rule.get('period', default_period)) for rule in rules])
+        for period in np.unique(periods[kinds == kind]):
+            selected = (kinds == kind) & (periods == period)
+            values = _INDICATORS[kind](closes, int(period)).to_numpy(dtype=np.float64)
+            metric[:, selected] = values[:, cols[selected]]
+
+    # 価格クロスは前日終値との比較、それ以外は条件成立の立ち上がりで発火
+    is_cross = kinds == 'price_cross'
+    crossed = np.where(directions > 0, (previous < thresholds) & (prices >= thresholds),
+                       (previous > thresholds) & (prices <= thresholds))
+    beyond = np.where(directions > 0, metric >= thresholds, metric <= thresholds) & ~np.isnan(metric)
+    beyond_before = np.vstack([np.zeros((1, len(rules)), dtype=bool), beyond[:-1]])
+    fired = np.where(is_cross, crossed, beyond & ~beyond_before)
+
+    counts = fired.sum(axis=0)
+    dates = closes.index
+    fired_any = counts > 0
+    first = np.where(fired_any, fired.argmax(axis=0), 0)
+    last = np.where(fired_any, len(dates) - 1 - fired[::-1].argmax(axis=0), 0)
+
+    summary = pd.DataFrame({
+        'id': [rule['id'] for rule in rules],
+        'symbol': [str(rule['symbol']) for rule in rules],
+        'type': kinds,
+        'threshold': thresholds,
+        'direction': [rule.get('direction', 'above') for rule in rules],
+        'fires': counts,
+        'first_fire': pd.Series(dates[first]).where(fired_any),
+        'last_fire': pd.Series(dates[last]).where(fired_any),
+    })
+
+    # 発火日の終値で買った場合の h 営業日後のリターン（期間末を超える発火は除く）
+    for h in horizons:
+        future = np.vstack([prices[h:], np.full((min(h, len(prices)), len(rules)), np.nan)])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            forward = np.where(fired, (future / prices - 1) * 100, np.nan)
+        valid = ~np.isnan(forward)
+        n = valid.sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            summary[f'return_{h}d'] = np.where(n > 0, np.nansum(forward, axis=0) / n, np.nan)
+            summary[f'win_rate_{h}d'] = np.where(n > 0, (forward > 0).sum(axis=0) / n * 100, np.nan)
+
+    return summary
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+
+try:
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+except ImportError:  # チャートはオプション（未インストール時は画像を作成しない）
+    plt = None
+
+logger = logging.getLogger(__name__)
+
+# 描画内容を変更した場合に上げる（既存のキャッシュを無効にする）
+RENDER_VERSION = 1
+
+# スパークライン1枚の大きさ（インチ）と解像度
+SPARKLINE_SIZE = (2.4, 0.9)
+SPARKLINE_DPI = 100
+GRID_COLUMNS = 3
+
+UP_COLOR = '#d62728'
+DOWN_COLOR = '#1f77b4'
+
+
+def charts_available() -> bool:
+    """matplotlib がインストールされているか"""
+    return plt is not None
+
+
+class ChartRenderer:
+    """入力データのハッシュをファイル名にしたPNGキャッシュ付きのチャート描画クラス
+
+    同じ入力（種類・データ・RENDER_VERSION）のチャートは描画済みのファイルを返し、再描画しない。
+    銘柄ごとのスパークラインは1銘柄ずつキャッシュし、一覧画像は描画済みの画像を並べて作成する
+    ため、株価の変わった銘柄だけが再描画される。
+    """
+
+    def __init__(self, directory: str = 'data/charts'):
+        self.directory = directory
+        self.rendered = 0
+        self.reused = 0
+
+    def _path(self, kind: str, payload) -> str:
+        source = json.dumps([RENDER_VERSION, kind, payload], ensure_ascii=False, sort_keys=True)
+        digest = hashlib.sha256(source.encode('utf-8')).hexdigest()[:20]
+        return os.path.join(self.directory, f"{kind}-{digest}.png")
+
+    def _cached(self, path: str) -> bool:
+        if os.path.exists(path):
+            # 参照された画像は古い画像の削除対象から外す
+            os.utime(path)
+            self.reused += 1
+            return True
+        return False
+
+    def _save(self, fig, path: str, **kwargs):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{path}.tmp.png"
+        fig.savefig(tmp_path, **kwargs)
+        plt.close(fig)
+        os.replace(tmp_path, path)
+        self.rendered += 1
+
+    def render_sparkline(self, label: str, prices: Sequence[float]) -> Optional[str]:
+        """1銘柄の終値の推移をスパークラインで描画し、画像のパスを返す"""
+        values = [round(float(price), 4) for price in prices if price == price]
+        if plt is None or len(values) < 2:
+            return None
+
+        path = self._path('spark', [label, values])
+        if self._cached(path):
+            return path
+
+        change_pct = (values[-1] / values[0] - 1) * 100 if values[0] else 0.0
+        color = UP_COLOR if values[-1] >= values[0] else DOWN_COLOR
+        fig, ax = plt.subplots(figsize=SPARKLINE_SIZE)
+        ax.plot(values, color=color, linewidth=1.5)
+        ax.fill_between(range(len(values)), values, min(values), color=color, alpha=0.12)
+        ax.set_title(f"{label}  {change_pct:+.1f}%", fontsize=9, loc='left')
+        ax.axis('off')
+        fig.tight_layout(pad=0.3)
+        self._save(fig, path, dpi=SPARKLINE_DPI)
+        return path
+
+    def render_sparkline_grid(self, series: Dict[str, Sequence[float]], name: str = 'sparklines') -> Optional[str]:
+        """銘柄ごとのスパークラインを並べた1枚の画像を作成（各銘柄の画像はキャッシュを利用）"""
+        tiles = [path for path in (self.render_sparkline(label, prices) for label, prices in series.items()) if path]
+        if not tiles:
+            return None
+
+        path = self._path(name, [os.path.basename(tile) for tile in tiles])
+        if self._cached(path):
+            return path
+
+        images = [plt.imread(tile) for tile in tiles]
+        height = max(image.shape[0] for image in images)
+        width = max(image.shape[1] for image in images)
+        blank = np.ones((height, width, images[0].shape[2]), dtype=images[0].dtype)
+        padded = []
+        for image in images:
+            tile = blank.copy()
+            tile[:image.shape[0], :image.shape[1]] = image
+            padded.append(tile)
+        padded.extend([blank] * (-len(padded) % GRID_COLUMNS))
+        rows = [np.hstack(padded[i:i + GRID_COLUMNS]) for i in range(0, len(padded), GRID_COLUMNS)]
+
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{path}.tmp.png"
+        plt.imsave(tmp_path, np.vstack(rows))
+        os.replace(tmp_path, path)
+        self.rendered += 1
+        return path
+
+    def render_allocation_pie(self, values: Dict[str, float], max_slices: int = 8,
+                              name: str = 'allocation') -> Optional[str]:
+        """評価額の構成比を円グラフで描画（上位 max_slices 銘柄以外は Other にまとめる）"""
+        items = sorted(((label, round(float(value))) for label, value in values.items() if value and value > 0),
+                       key=lambda item: item[1], reverse=True)
+        if plt is None or not items:
+            return None
+        if len(items) > max_slices:
+            items = items[:max_slices] + [('Other', sum(value for _, value in items[max_slices:]))]
+
+        path = self._path(name, items)
+        if self._cached(path):
+            return path
+
+        fig, ax = plt.subplots(figsize=(5, 5))
+        ax.pie([value for _, value in items], labels=[label for label, _ in items], autopct='%1.1f%%',
+               startangle=90, counterclock=False, textprops={'fontsize': 9})
+        ax.axis('equal')
+        fig.tight_layout()
+        self._save(fig, path, dpi=120)
+        return path
+
+    def prune(self, max_age_days: float = 30) -> int:
+        """一定期間参照されていない画像を削除し、削除した件数を返す"""
+        if not os.path.isdir(self.directory):
+            return 0
+        cutoff = time.time() - max_age_days * 86400
+        removed = 0
+        for filename in os.listdir(self.directory):
+            path = os.path.join(self.directory, filename)
+            if filename.endswith('.png') and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        return removed
+
+
+def chart_urls(paths: List[str], base_url: str) -> List[str]:
+    """画像のパスを公開URL（base_url/ファイル名）に変換"""
+    return [f"{base_url.rstrip('/')}/{os.path.basename(path)}" for path in paths]
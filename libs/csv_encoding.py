@@ -0,0 +1,17 @@
+from typing import List, Sequence
+
+# SBI証券のCSVの文字コード（UTF-8で保存し直したファイルも読めるよう、UTF-8を先に試す）
+EXPORT_ENCODINGS = ('utf-8-sig', 'cp932')
+
+
+def read_export_lines(csv_path: str, encodings: Sequence[str] = EXPORT_ENCODINGS) -> List[str]:
+    """CSVを行のリストとして読み込み（指定した文字コードを順に試す）"""
+    with open(csv_path, 'rb') as f:
+        data = f.read()
+
+    for encoding in encodings[:-1]:
+        try:
+            return data.decode(encoding).splitlines()
+        except UnicodeDecodeError:
+            continue
+    return data.decode(encodings[-1]).splitlines()
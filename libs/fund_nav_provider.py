@@ -0,0 +1,145 @@
+import json
+import logging
+import os
+from abc import ABC, abstractmethod
+from datetime import datetime, time
+from typing import Dict, List, Optional
+import pytz
+from libs.market_calendar import MarketCalendar
+
+logger = logging.getLogger(__name__)
+
+
+class FundNavProvider(ABC):
+    """投資信託の基準価額を取得するプロバイダの基底クラス
+
+    実装クラスはファンド名から識別子への解決と、識別子のリストに対する
+    基準価額の一括取得を提供する。
+    """
+
+    @abstractmethod
+    def resolve_fund_ids(self, names: List[str]) -> Dict[str, str]:
+        """ファンド名を識別子に変換（解決できない名前は含めない）"""
+
+    @abstractmethod
+    def fetch_navs(self, fund_ids: List[str]) -> Dict[str, Dict]:
+        """基準価額を一括取得（識別子 -> {'nav', 'previous_nav', 'date'}）"""
+
+    def get_navs_by_name(self, names: List[str]) -> Dict[str, Dict]:
+        """ファンド名から基準価額を取得"""
+        ids = self.resolve_fund_ids(names)
+        navs = self.fetch_navs(sorted(set(ids.values())))
+        return {name: navs[fund_id] for name, fund_id in ids.items() if fund_id in navs}
+
+
+class LocalFundNavProvider(FundNavProvider):
+    """ローカルのJSONファイルから基準価額を返すプロバイダ（テスト・障害時用）
+
+    ファイル形式:
+        [{"fund_id": "...", "name": "...", "nav": 25000, "previous_nav": 24900, "date": "2025-01-06"}]
+    """
+
+    def __init__(self, path: str = 'input/fund_nav.json'):
+        self.path = path
+        self._records = None
+
+    def _load(self) -> Dict[str, Dict]:
+        if self._records is None:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._records = {str(record['fund_id']): record for record in json.load(f)}
+        return self._records
+
+    def resolve_fund_ids(self, names: List[str]) -> Dict[str, str]:
+        by_name = {record['name']: fund_id for fund_id, record in self._load().items()}
+        return {name: by_name[name] for name in names if name in by_name}
+
+    def fetch_navs(self, fund_ids: List[str]) -> Dict[str, Dict]:
+        records = self._load()
+        return {
+            fund_id: {
+                'nav': float(records[fund_id]['nav']),
+                'previous_nav': float(records[fund_id].get('previous_nav') or 0),
+                'date': records[fund_id].get('date'),
+            }
+            for fund_id in fund_ids if fund_id in records
+        }
+
+
+class CachedFundNavProvider(FundNavProvider):
+    """基準価額を次回公表時刻までディスクにキャッシュするプロバイダ
+
+    基準価額は営業日ごとに1回公表されるため、取得した値は次の公表時刻
+    （東証営業日の publish_time JST）まで再取得しない。名前から識別子への
+    対応は変化しないため無期限にキャッシュし、解決できなかった名前のみ
+    次の公表時刻まで再問い合わせを控える。
+    """
+
+    def __init__(self, provider: FundNavProvider, cache_path: str = 'data/fund_nav_cache.json',
+                 publish_time: time = time(20, 0)):
+        self.provider = provider
+        self.cache_path = cache_path
+        self.publish_time = publish_time
+        self.calendar = MarketCalendar('JP')
+        self.tz = pytz.timezone('Asia/Tokyo')
+        self._cache = self._load_cache()
+
+    def _load_cache(self) -> Dict:
+        if os.path.exists(self.cache_path):
+            try:
+                with open(self.cache_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning("基準価額キャッシュの読み込みエラー: %s", e)
+        return {'ids': {}, 'navs': {}}
+
+    def _save_cache(self):
+        os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._cache, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self.cache_path)
+
+    def next_publication(self, now: Optional[datetime] = None) -> datetime:
+        """次の基準価額公表時刻を取得"""
+        now = (now or datetime.now(pytz.utc)).astimezone(self.tz)
+        d = now.date()
+        if not (self.calendar.is_trading_day(d) and now.time() < self.publish_time):
+            d = self.calendar.next_trading_day(d)
+        return self.tz.localize(datetime.combine(d, self.publish_time))
+
+    def resolve_fund_ids(self, names: List[str]) -> Dict[str, str]:
+        now = datetime.now(pytz.utc)
+        known = self._cache['ids']
+        misses = self._cache.setdefault('misses', {})
+        missing = [name for name in names
+                   if not known.get(name)
+                   and (name not in misses or datetime.fromisoformat(misses[name]) <= now)]
+        if missing:
+            # 解決できなかった名前は次の公表時刻まで問い合わせない（ファンドの新規登録に追従するため永続化はしない）
+            resolved = self.provider.resolve_fund_ids(missing)
+            expires_at = self.next_publication(now).isoformat()
+            for name in missing:
+                if resolved.get(name):
+                    known[name] = resolved[name]
+                    misses.pop(name, None)
+                else:
+                    known.pop(name, None)
+                    misses[name] = expires_at
+            self._save_cache()
+        return {name: known[name] for name in names if known.get(name)}
+
+    def fetch_navs(self, fund_ids: List[str]) -> Dict[str, Dict]:
+        now = datetime.now(pytz.utc)
+        navs = self._cache['navs']
+        stale = [fund_id for fund_id in fund_ids
+                 if fund_id not in navs or datetime.fromisoformat(navs[fund_id]['expires_at']) <= now]
+
+        if stale:
+            logger.info("基準価額を取得中... (%d/%dファンド)", len(stale), len(fund_ids))
+            expires_at = self.next_publication(now).isoformat()
+            for fund_id, nav in self.provider.fetch_navs(stale).items():
+                navs[fund_id] = {**nav, 'expires_at': expires_at}
+            self._save_cache()
+
+        return {fund_id: {k: v for k, v in navs[fund_id].items() if k != 'expires_at'}
+                for fund_id in fund_ids if fund_id in navs}
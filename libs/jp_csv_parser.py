@@ -1,20 +1,30 @@
+import logging
+import numpy as np
 import pandas as pd
 from typing import Dict, List
+from libs.csv_encoding import read_export_lines
+from libs.lean_dtypes import categorize_text_columns, downcast_numeric, memory_per_row
+
+logger = logging.getLogger(__name__)
 
 
 class JPCSVParser:
-    """SBI証券の保有株情報CSVを解析するクラス"""
+    """SBI証券の保有株情報CSVを解析するクラス
+
+    lean=True の場合、繰り返しの多い文字列列（セクションなど）をカテゴリ型、
+    数値列を値を失わない範囲で小さい型にして、大量の行を保持する際のメモリを抑える。
+    """
     
-    def __init__(self, csv_path: str):
+    def __init__(self, csv_path: str, lean: bool = False):
         self.csv_path = csv_path
+        self.lean = lean
         self.sections = {}
         
     def parse_csv(self) -> Dict[str, pd.DataFrame]:
         """CSVファイルを解析し、セクション別にDataFrameを返す"""
         try:
-            # SJISエンコーディングでCSVを読み込み
-            with open(self.csv_path, 'r', encoding='shift_jis') as f:
-                lines = f.readlines()
+            # Shift-JIS（cp932）またはUTF-8で保存されたCSVを読み込み
+            lines = read_export_lines(self.csv_path)
             
             # セクションを分割
             sections = self._split_sections(lines)
@@ -29,7 +39,7 @@ class JPCSVParser:
             return parsed_sections
             
         except Exception as e:
-            print(f"CSV解析エラー: {e}")
+            logger.error("CSV解析エラー: %s", e)
             return {}
     
     def _split_sections(self, lines: List[str]) -> Dict[str, List[str]]:
@@ -112,7 +122,7 @@ class JPCSVParser:
             return df
             
         except Exception as e:
-            print(f"セクション解析エラー: {e}")
+            logger.error("セクション解析エラー: %s", e)
             return None
     
     def _parse_csv_line(self, line: str) -> List[str]:
@@ -172,42 +182,41 @@ class JPCSVParser:
             # 数値列と思われる列を変換
             if any(keyword in col for keyword in numeric_keywords):
                 df[col] = pd.to_numeric(df[col].astype(str).str.replace(',', '').str.replace('+', ''), errors='coerce')
+                if self.lean:
+                    df[col] = downcast_numeric(df[col], col)
         
         return df
     
-    def get_stock_holdings(self) -> pd.DataFrame:
-        """株式保有情報のみを統合して返す"""
-        all_sections = self.parse_csv()
-        stock_data = []
-        
-        for section_name, df in all_sections.items():
-            if '株式' in section_name:
-                # セクション名を追加
-                df_copy = df.copy()
-                df_copy['セクション'] = section_name
-                stock_data.append(df_copy)
-        
-        if stock_data:
-            return pd.concat(stock_data, ignore_index=True)
-        else:
+    def _combine_sections(self, all_sections: Dict[str, pd.DataFrame], keyword: str) -> pd.DataFrame:
+        """キーワードを含むセクションを1つのDataFrameに統合し、セクション列を追加"""
+        names = [name for name in all_sections if keyword in name]
+        if not names:
             return pd.DataFrame()
-    
-    def get_fund_holdings(self) -> pd.DataFrame:
-        """投資信託保有情報のみを統合して返す"""
-        all_sections = self.parse_csv()
-        fund_data = []
         
-        for section_name, df in all_sections.items():
-            if '投資信託' in section_name:
-                # セクション名を追加
-                df_copy = df.copy()
-                df_copy['セクション'] = section_name
-                fund_data.append(df_copy)
-        
-        if fund_data:
-            return pd.concat(fund_data, ignore_index=True)
+        # セクションごとのコピーは作らず、結合後にセクション列をまとめて設定
+        frames = [all_sections[name] for name in names]
+        df = pd.concat(frames, ignore_index=True)
+        codes = np.repeat(np.arange(len(names)), [len(frame) for frame in frames])
+        if self.lean:
+            df['セクション'] = pd.Categorical.from_codes(codes, categories=names)
+            categorize_text_columns(df)
         else:
-            return pd.DataFrame()
+            df['セクション'] = np.array(names, dtype=object)[codes]
+        
+        logger.debug("%s: %d行 / %.0fバイト/行", keyword, len(df), memory_per_row(df))
+        return df
+    
+    def get_stock_holdings(self, all_sections: Dict[str, pd.DataFrame] = None) -> pd.DataFrame:
+        """株式保有情報のみを統合して返す（解析済みのセクションを渡すと再解析しない）"""
+        if all_sections is None:
+            all_sections = self.parse_csv()
+        return self._combine_sections(all_sections, '株式')
+    
+    def get_fund_holdings(self, all_sections: Dict[str, pd.DataFrame] = None) -> pd.DataFrame:
+        """投資信託保有情報のみを統合して返す（解析済みのセクションを渡すと再解析しない）"""
+        if all_sections is None:
+            all_sections = self.parse_csv()
+        return self._combine_sections(all_sections, '投資信託')
 
 
 def main():
@@ -1,21 +1,32 @@
 import re
 from typing import Dict, List, Tuple
+import pandas as pd
 from libs.jp_csv_parser import JPCSVParser
 
 
 class JPStockData:
     """株式データを管理するクラス"""
     
-    def __init__(self, csv_path: str):
-        self.parser = JPCSVParser(csv_path)
+    def __init__(self, csv_path: str, lean: bool = False):
+        self.parser = JPCSVParser(csv_path, lean=lean)
         self.stock_df = None
         self.fund_df = None
         self._load_data()
     
+    @classmethod
+    def from_dataframes(cls, stock_df: pd.DataFrame, fund_df: pd.DataFrame) -> 'JPStockData':
+        """解析済みのDataFrameから作成（複数口座の統合ポートフォリオ用）"""
+        instance = cls.__new__(cls)
+        instance.parser = None
+        instance.stock_df = stock_df
+        instance.fund_df = fund_df
+        return instance
+    
     def _load_data(self):
         """データを読み込み"""
-        self.stock_df = self.parser.get_stock_holdings()
-        self.fund_df = self.parser.get_fund_holdings()
+        sections = self.parser.parse_csv()
+        self.stock_df = self.parser.get_stock_holdings(sections)
+        self.fund_df = self.parser.get_fund_holdings(sections)
     
     def get_stock_codes(self) -> List[str]:
         """保有株式の銘柄コードを取得"""
@@ -69,28 +80,109 @@ class JPStockData:
         return summary
     
     def get_stock_details(self, code: str) -> Dict:
-        """特定銘柄の詳細情報を取得"""
+        """特定銘柄の詳細情報を取得
+
+        同じ銘柄を複数のセクション・口座で保有している場合は、数量・評価額・損益を合算し、
+        取得単価は数量で加重平均する。
+        """
         if self.stock_df.empty:
             return {}
         
+        details = {}
         for _, row in self.stock_df.iterrows():
             stock_name = row['銘柄（コード）']
             if code in stock_name:
-                return {
-                    'code': code,
-                    'name': stock_name.replace(f'{code} ', ''),
+                acquisition_price = row.get('取得単価', row.get('参考単価', 0))
+                if not details:
+                    details = {
+                        'code': code,
+                        'name': stock_name.replace(f'{code} ', ''),
+                        'quantity': row['数量'],
+                        'acquisition_price': acquisition_price,
+                        'current_price': row['現在値'],
+                        'evaluation': row['評価額'],
+                        'profit_loss': row['損益'],
+                        'profit_loss_pct': row['損益（％）'],
+                        'previous_day_change': row['前日比'],
+                        'previous_day_change_pct': row['前日比（％）'],
+                        'section': row['セクション']
+                    }
+                    continue
+                
+                # 2件目以降は合算
+                total_quantity = details['quantity'] + row['数量']
+                if total_quantity:
+                    details['acquisition_price'] = (details['acquisition_price'] * details['quantity']
+                                                    + acquisition_price * row['数量']) / total_quantity
+                details['quantity'] = total_quantity
+                details['evaluation'] += row['評価額']
+                details['profit_loss'] += row['損益']
+                cost = details['evaluation'] - details['profit_loss']
+                details['profit_loss_pct'] = details['profit_loss'] / cost * 100 if cost else 0
+        
+        return details
+    
+    def get_account_breakdown(self, code: str) -> List[Dict]:
+        """特定銘柄の口座・セクション別の保有内訳を取得"""
+        if self.stock_df.empty:
+            return []
+        
+        breakdown = []
+        for _, row in self.stock_df.iterrows():
+            if code in row['銘柄（コード）']:
+                breakdown.append({
+                    'account': row.get('口座', ''),
+                    'section': row['セクション'],
+                    'quantity': row['数量'],
+                    'evaluation': row['評価額']
+                })
+        
+        return breakdown
+
+    def get_fund_names(self) -> List[str]:
+        """保有投資信託のファンド名を取得（複数のセクション・口座で保有しているファンドは1件）"""
+        if self.fund_df.empty:
+            return []
+        
+        return list(dict.fromkeys(self.fund_df['ファンド名'].tolist()))
+    
+    def get_fund_details(self, name: str) -> Dict:
+        """特定ファンドの詳細情報を取得
+
+        同じファンドを複数のセクション・口座で保有している場合は、数量・評価額・損益を合算し、
+        取得単価は数量で加重平均する。
+        """
+        if self.fund_df.empty:
+            return {}
+        
+        details = {}
+        for _, row in self.fund_df.iterrows():
+            if row['ファンド名'] != name:
+                continue
+            acquisition_price = row.get('取得単価', 0)
+            if not details:
+                details = {
+                    'name': name,
                     'quantity': row['数量'],
-                    'acquisition_price': row.get('取得単価', row.get('参考単価', 0)),
+                    'acquisition_price': acquisition_price,
                     'current_price': row['現在値'],
                     'evaluation': row['評価額'],
-                    'profit_loss': row['損益'],
-                    'profit_loss_pct': row['損益（％）'],
+                    'profit_loss': row.get('損益', 0),
                     'previous_day_change': row['前日比'],
-                    'previous_day_change_pct': row['前日比（％）'],
                     'section': row['セクション']
                 }
+                continue
+            
+            # 2件目以降は合算
+            total_quantity = details['quantity'] + row['数量']
+            if total_quantity:
+                details['acquisition_price'] = (details['acquisition_price'] * details['quantity']
+                                                + acquisition_price * row['数量']) / total_quantity
+            details['quantity'] = total_quantity
+            details['evaluation'] += row['評価額']
+            details['profit_loss'] += row.get('損益', 0)
         
-        return {}
+        return details
 
 
 def main():
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+# この割合以下の種類数しかない文字列列はカテゴリ型にする（セクション・口座・通貨など）
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+
+# 整数型に縮小する列（金額・％の列は64ビットのまま維持する）
+INTEGER_COLUMN_KEYWORDS = ('数量',)
+
+
+def downcast_numeric(series: pd.Series, column: str) -> pd.Series:
+    """数量の列を値を失わない範囲で小さい型に変換
+
+    整数値のみの数量列は int32 以上に縮小する（数量×単価などの演算でのオーバーフローを
+    避けるため int8/int16 にはしない）。金額（評価額・損益・取得単価・現在値・前日比）と
+    ％の列は変換せず、読み込んだ64ビットの型（int64/float64）のまま維持する。
+    """
+    if not any(keyword in column for keyword in INTEGER_COLUMN_KEYWORDS):
+        return series
+    if series.isna().any() or not np.array_equal(series, series.round()):
+        return series
+    downcast = pd.to_numeric(series, downcast='integer')
+    return downcast.astype('int32') if downcast.dtype.itemsize < 4 else downcast
+
+
+def categorize_text_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """繰り返しの多い文字列列をカテゴリ型に変換（元のDataFrameを書き換える）"""
+    for column in df.columns:
+        series = df[column]
+        if (pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)) \
+                and not isinstance(series.dtype, pd.CategoricalDtype) \
+                and series.nunique() <= len(series) * CATEGORY_MAX_UNIQUE_RATIO:
+            df[column] = series.astype('category')
+    return df
+
+
+def memory_per_row(df: pd.DataFrame) -> float:
+    """1行あたりのメモリ使用量（バイト、文字列の実体を含む）を計算"""
+    if df.empty:
+        return 0.0
+    return df.memory_usage(deep=True).sum() / len(df)
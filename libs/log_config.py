@@ -0,0 +1,56 @@
+import json
+import logging
+import sys
+from datetime import datetime, timezone
+
+# 銘柄ごとの進捗ログを出力するロガー名（quietモードで抑制される）
+PROGRESS_LOGGER_NAME = "smartkabuka.progress"
+
+# LogRecordの標準属性（JSON出力時にextraと区別するため）
+_RESERVED_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JSONFormatter(logging.Formatter):
+    """1イベント1行のJSONでログを出力するフォーマッタ"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            'time': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+
+        # extra={...} で渡された構造化フィールドを追加
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS and not key.startswith('_'):
+                payload[key] = value
+
+        if record.exc_info:
+            payload['exc_info'] = self.formatException(record.exc_info)
+
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def get_progress_logger() -> logging.Logger:
+    """銘柄ごとの進捗ログ用ロガーを取得"""
+    return logging.getLogger(PROGRESS_LOGGER_NAME)
+
+
+def setup_logging(level: str = "INFO", quiet: bool = False, json_format: bool = False) -> None:
+    """ルートロガーを設定
+
+    quiet=True の場合は銘柄ごとの進捗ログを抑制し、警告以上のみ出力する。
+    """
+    handler = logging.StreamHandler(sys.stderr)
+    if json_format:
+        handler.setFormatter(JSONFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    root = logging.getLogger()
+    root.handlers.clear()
+    root.addHandler(handler)
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+
+    get_progress_logger().setLevel(logging.WARNING if quiet else logging.NOTSET)
@@ -0,0 +1,93 @@
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+import pytz
+
+try:
+    import holidays
+except ImportError:  # 祝日判定はオプション（未インストール時は土日のみ休場とみなす）
+    holidays = None
+
+logger = logging.getLogger(__name__)
+
+# 市場ごとのタイムゾーンと取引時間（東証は2024/11/5から15:30まで）
+MARKET_HOURS = {
+    'JP': {'tz': 'Asia/Tokyo', 'open': time(9, 0), 'close': time(15, 30)},
+    'US': {'tz': 'America/New_York', 'open': time(9, 30), 'close': time(16, 0)},
+}
+
+
+class MarketCalendar:
+    """東証・NYSEの営業日と取引時間を判定するクラス"""
+
+    def __init__(self, market: str = "JP"):
+        if market not in MARKET_HOURS:
+            raise ValueError(f"未対応の市場です: {market}")
+
+        self.market = market
+        self.tz = pytz.timezone(MARKET_HOURS[market]['tz'])
+        self.open_time = MARKET_HOURS[market]['open']
+        self.close_time = MARKET_HOURS[market]['close']
+        self._holidays = self._build_holidays()
+
+    def _build_holidays(self):
+        """祝日カレンダーを作成"""
+        if holidays is None:
+            logger.warning("holidaysパッケージが見つかりません。%s市場は土日のみ休場として扱います", self.market)
+            return None
+
+        if self.market == 'JP':
+            return holidays.country_holidays('JP')
+        return holidays.financial_holidays('NYSE')
+
+    def is_trading_day(self, d: date) -> bool:
+        """営業日かどうかを判定"""
+        if d.weekday() >= 5:
+            return False
+
+        # 東証は年末年始（12/31〜1/3）が休場
+        if self.market == 'JP' and ((d.month == 12 and d.day == 31) or (d.month == 1 and d.day <= 3)):
+            return False
+
+        if self._holidays is not None and d in self._holidays:
+            return False
+
+        return True
+
+    def next_trading_day(self, d: date) -> date:
+        """指定日の翌営業日を取得"""
+        d += timedelta(days=1)
+        while not self.is_trading_day(d):
+            d += timedelta(days=1)
+        return d
+
+    def previous_trading_day(self, d: date) -> date:
+        """指定日の前営業日を取得"""
+        d -= timedelta(days=1)
+        while not self.is_trading_day(d):
+            d -= timedelta(days=1)
+        return d
+
+    def local_date(self, dt: Optional[datetime] = None) -> date:
+        """市場のローカル日付を取得"""
+        dt = dt or datetime.now(pytz.utc)
+        return dt.astimezone(self.tz).date()
+
+    def is_open(self, dt: Optional[datetime] = None) -> bool:
+        """取引時間中かどうかを判定"""
+        dt = (dt or datetime.now(pytz.utc)).astimezone(self.tz)
+        if not self.is_trading_day(dt.date()):
+            return False
+        return self.open_time <= dt.time() < self.close_time
+
+    def next_open(self, dt: Optional[datetime] = None) -> datetime:
+        """次の取引開始時刻を取得（取引時間中は指定時刻をそのまま返す）"""
+        dt = dt or datetime.now(pytz.utc)
+        if self.is_open(dt):
+            return dt
+
+        local = dt.astimezone(self.tz)
+        d = local.date()
+        if not (self.is_trading_day(d) and local.time() < self.open_time):
+            d = self.next_trading_day(d)
+        return self.tz.localize(datetime.combine(d, self.open_time))
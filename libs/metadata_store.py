@@ -0,0 +1,126 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class CompanyMetadataStore:
+    """企業情報（セクター・業種・従業員数など）をディスクに保存するクラス
+
+    企業情報は数ヶ月単位でしか変化しないため、参照はローカルのファイルから行い、
+    ネットワークアクセスは一括プリフェッチとバックグラウンド更新に限定する。
+    """
+
+    def __init__(self, fetch_fn: Callable[[str, str], Optional[Dict]],
+                 path: str = 'data/company_info.json', max_age_days: float = 7, max_workers: int = 8):
+        self.fetch_fn = fetch_fn
+        self.path = path
+        self.max_age = max_age_days * 86400
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._refresh_thread = None
+        self._entries = self._load()
+
+    @staticmethod
+    def _key(code: str, market: str) -> str:
+        return f"{market.upper()}:{code}"
+
+    def _load(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("企業情報ストアの読み込みエラー: %s", e)
+            return {}
+
+    def _save(self):
+        with self._lock:
+            entries = dict(self._entries)
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+    def get(self, code: str, market: str = "JP") -> Optional[Dict]:
+        """企業情報をローカルから取得（ネットワークアクセスなし）"""
+        entry = self._entries.get(self._key(code, market))
+        return entry['info'] if entry else None
+
+    def _is_stale(self, key: str, now: float) -> bool:
+        entry = self._entries.get(key)
+        return entry is None or now - entry['fetched_at'] >= self.max_age
+
+    def _fetch_batch(self, symbols: List[Tuple[str, str]]) -> int:
+        """指定銘柄を並列取得してストアに保存し、取得できた件数を返す"""
+        if not symbols:
+            return 0
+
+        logger.info("企業情報を取得中... (%d銘柄)", len(symbols))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = list(executor.map(lambda item: self.fetch_fn(*item), symbols))
+
+        now = time.time()
+        fetched = 0
+        with self._lock:
+            for (code, market), info in zip(symbols, results):
+                if info:
+                    self._entries[self._key(code, market)] = {'info': info, 'fetched_at': now}
+                    fetched += 1
+
+        if fetched:
+            self._save()
+        return fetched
+
+    def prefetch(self, symbols: List[Tuple[str, str]]) -> int:
+        """未取得の銘柄のみ一括で取得（(コード, 市場) のリスト）"""
+        missing = [(code, market) for code, market in symbols if self._key(code, market) not in self._entries]
+        return self._fetch_batch(missing)
+
+    def refresh_stale(self) -> int:
+        """保存済みの銘柄のうち期限切れのものを再取得"""
+        now = time.time()
+        with self._lock:
+            stale = [tuple(key.split(':', 1)[::-1]) for key in self._entries if self._is_stale(key, now)]
+        return self._fetch_batch(stale)
+
+    def start_background_refresh(self, check_interval: float = 3600):
+        """期限切れの企業情報を定期的に再取得するバックグラウンドスレッドを開始"""
+        if self._refresh_thread and self._refresh_thread.is_alive():
+            return
+
+        def _run():
+            while not self._stop_event.wait(check_interval):
+                try:
+                    self.refresh_stale()
+                except Exception:
+                    logger.exception("企業情報のバックグラウンド更新エラー")
+
+        self._refresh_thread = threading.Thread(target=_run, name='metadata-refresh', daemon=True)
+        self._refresh_thread.start()
+
+    def stop(self):
+        """バックグラウンド更新を停止"""
+        self._stop_event.set()
+
+    def get_sector_breakdown(self, weights: Dict[Tuple[str, str], float]) -> Dict[str, float]:
+        """評価額などの重みからセクター別の構成比（％）を計算"""
+        breakdown: Dict[str, float] = {}
+        total = sum(weights.values())
+        if not total:
+            return breakdown
+
+        for (code, market), weight in weights.items():
+            info = self.get(code, market)
+            sector = (info or {}).get('sector') or '不明'
+            breakdown[sector] = breakdown.get(sector, 0) + weight / total * 100
+
+        return dict(sorted(breakdown.items(), key=lambda item: item[1], reverse=True))
@@ -0,0 +1,118 @@
+import json
+import logging
+import os
+import struct
+import time
+import zlib
+from typing import Dict
+import pandas as pd
+from libs.portfolio_loader import load_jp_exports, load_us_exports, resolve_export_paths
+
+logger = logging.getLogger(__name__)
+
+# ファイル形式: マジック(4バイト) + 形式バージョン(uint16) + zlib圧縮した列指向JSON
+MAGIC = b'SKPF'
+FORMAT_VERSION = 1
+_HEADER = struct.Struct('>4sH')
+
+# 読み込み時に必須の列（欠けている場合は形式エラー）
+REQUIRED_COLUMNS = {
+    'jp_stock': ['銘柄（コード）', '数量', '現在値', '前日比', '前日比（％）', '損益', '損益（％）', '評価額', 'セクション'],
+    'jp_fund': ['ファンド名', '数量', '現在値', '評価額', 'セクション'],
+    'us_stock': ['銘柄シンボル', '数量', '取得単価（ドル）', 'セクション'],
+}
+
+
+class PortfolioArtifactError(ValueError):
+    """ポートフォリオアーティファクトの形式が不正であることを示す例外"""
+
+
+def _encode_frame(df: pd.DataFrame) -> Dict:
+    """DataFrameを列ごとの値リストとdtypeに変換"""
+    return {
+        'columns': list(df.columns),
+        'dtypes': [str(dtype) for dtype in df.dtypes],
+        'values': [df[column].tolist() for column in df.columns],
+    }
+
+
+def _decode_frame(frame: Dict) -> pd.DataFrame:
+    data = {}
+    for column, dtype, values in zip(frame['columns'], frame['dtypes'], frame['values']):
+        data[column] = pd.Series(values, dtype=None if dtype == 'object' else dtype)
+    return pd.DataFrame(data, columns=frame['columns'])
+
+
+def _validate(frames: Dict[str, pd.DataFrame]):
+    for name, columns in REQUIRED_COLUMNS.items():
+        df = frames.get(name)
+        if df is None:
+            raise PortfolioArtifactError(f"{name} がありません")
+        missing = [column for column in columns if column not in df.columns]
+        if not df.empty and missing:
+            raise PortfolioArtifactError(f"{name} に必須列がありません: {', '.join(missing)}")
+
+
+def write_portfolio_artifact(path: str, frames: Dict[str, pd.DataFrame], source_mtime: float = None):
+    """解析済みのDataFrameをアーティファクトとして保存"""
+    _validate(frames)
+    payload = {
+        'created_at': time.time(),
+        'source_mtime': source_mtime,
+        'frames': {name: _encode_frame(frames[name]) for name in REQUIRED_COLUMNS},
+    }
+    body = zlib.compress(json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), 9)
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION))
+        f.write(body)
+    os.replace(tmp_path, path)
+
+
+def read_portfolio_artifact(path: str) -> Dict:
+    """アーティファクトを読み込み、DataFrameと作成情報を返す
+
+    戻り値: {'jp_stock', 'jp_fund', 'us_stock'（DataFrame）, 'created_at', 'source_mtime'}
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    if len(data) < _HEADER.size:
+        raise PortfolioArtifactError("ファイルが短すぎます")
+    magic, version = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise PortfolioArtifactError("ポートフォリオアーティファクトではありません")
+    if version != FORMAT_VERSION:
+        raise PortfolioArtifactError(f"未対応の形式バージョンです: {version}（対応: {FORMAT_VERSION}）")
+
+    try:
+        payload = json.loads(zlib.decompress(data[_HEADER.size:]).decode('utf-8'))
+        frames = {name: _decode_frame(frame) for name, frame in payload['frames'].items()}
+    except (zlib.error, ValueError, KeyError, TypeError) as e:
+        raise PortfolioArtifactError(f"内容を読み込めません: {e}") from e
+
+    _validate(frames)
+    return {**frames, 'created_at': payload.get('created_at'), 'source_mtime': payload.get('source_mtime')}
+
+
+def compile_portfolio_artifact(jp_path: str, us_path: str, output_path: str, lean: bool = False) -> Dict[str, int]:
+    """SBI証券のCSVを解析してアーティファクトを作成し、各DataFrameの行数を返す
+
+    jp_path / us_path には単一ファイル・ディレクトリ・globパターンを指定できる。
+    lean=True の場合はカテゴリ型・縮小した数値型のまま保存し、読み込み時も同じ型で復元する。
+    """
+    jp_stock_df, jp_fund_df = load_jp_exports(jp_path, lean=lean)
+    frames = {
+        'jp_stock': jp_stock_df,
+        'jp_fund': jp_fund_df,
+        'us_stock': load_us_exports(us_path, lean=lean),
+    }
+
+    sources = resolve_export_paths(jp_path) + resolve_export_paths(us_path)
+    source_mtime = max((os.path.getmtime(source) for source in sources), default=None)
+    write_portfolio_artifact(output_path, frames, source_mtime)
+
+    logger.info("ポートフォリオアーティファクトを作成しました: %s (%dバイト)", output_path, os.path.getsize(output_path))
+    return {name: len(df) for name, df in frames.items()}
@@ -0,0 +1,85 @@
+import glob
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import List, Tuple
+import pandas as pd
+from libs.jp_csv_parser import JPCSVParser
+from libs.us_csv_parser import USCSVParser
+from libs.lean_dtypes import categorize_text_columns, memory_per_row
+
+logger = logging.getLogger(__name__)
+
+ACCOUNT_COLUMN = '口座'
+
+
+def resolve_export_paths(path_or_pattern: str) -> List[str]:
+    """ディレクトリ・globパターン・単一ファイルからCSVファイルのリストを取得"""
+    if os.path.isdir(path_or_pattern):
+        return sorted(glob.glob(os.path.join(path_or_pattern, '*.csv')))
+    return sorted(glob.glob(path_or_pattern))
+
+
+def _account_name(csv_path: str) -> str:
+    """ファイル名から口座名を取得（例: input/jp/nisa.csv -> nisa）"""
+    return os.path.splitext(os.path.basename(csv_path))[0]
+
+
+def _parse_jp_export(csv_path: str, lean: bool = False) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """日本株CSVを1ファイル解析（プロセスプールのワーカーで実行）"""
+    parser = JPCSVParser(csv_path, lean=lean)
+    sections = parser.parse_csv()
+    stock_df = parser.get_stock_holdings(sections)
+    fund_df = parser.get_fund_holdings(sections)
+    for df in (stock_df, fund_df):
+        if not df.empty:
+            df[ACCOUNT_COLUMN] = _account_name(csv_path)
+    return stock_df, fund_df
+
+
+def _parse_us_export(csv_path: str, lean: bool = False) -> pd.DataFrame:
+    """米国株CSVを1ファイル解析（プロセスプールのワーカーで実行）"""
+    stock_df = USCSVParser(csv_path, lean=lean).get_us_stock_holdings()
+    if not stock_df.empty:
+        stock_df[ACCOUNT_COLUMN] = _account_name(csv_path)
+    return stock_df
+
+
+def _concat(frames: List[pd.DataFrame], lean: bool = False) -> pd.DataFrame:
+    frames = [df for df in frames if not df.empty]
+    if not frames:
+        return pd.DataFrame()
+    df = pd.concat(frames, ignore_index=True)
+    if lean:
+        # カテゴリの異なる列の結合は文字列に戻るため、口座列を含めて再度カテゴリ化
+        categorize_text_columns(df)
+    logger.info("統合: %d行 / %.0fバイト/行", len(df), memory_per_row(df))
+    return df
+
+
+def _map_exports(func, paths: List[str], max_workers: int = None) -> list:
+    """複数ファイルをプロセスプールで並列解析（1ファイルの場合はプロセスを起動しない）"""
+    if len(paths) <= 1:
+        return [func(path) for path in paths]
+    with ProcessPoolExecutor(max_workers=max_workers or min(len(paths), os.cpu_count() or 1)) as executor:
+        return list(executor.map(func, paths))
+
+
+def load_jp_exports(path_or_pattern: str, max_workers: int = None,
+                    lean: bool = False) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """複数口座の日本株CSVを並列解析し、口座列付きの株式・投資信託DataFrameに統合"""
+    paths = resolve_export_paths(path_or_pattern)
+    logger.info("日本株CSVを解析中... (%dファイル)", len(paths))
+
+    results = _map_exports(partial(_parse_jp_export, lean=lean), paths, max_workers)
+    return (_concat([stock_df for stock_df, _ in results], lean),
+            _concat([fund_df for _, fund_df in results], lean))
+
+
+def load_us_exports(path_or_pattern: str, max_workers: int = None, lean: bool = False) -> pd.DataFrame:
+    """複数口座の米国株CSVを並列解析し、口座列付きのDataFrameに統合"""
+    paths = resolve_export_paths(path_or_pattern)
+    logger.info("米国株CSVを解析中... (%dファイル)", len(paths))
+
+    return _concat(_map_exports(partial(_parse_us_export, lean=lean), paths, max_workers), lean)
@@ -0,0 +1,236 @@
+import logging
+import os
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import pandas as pd
+import yfinance as yf
+from libs.rate_control import AdaptiveLimiter, CircuitBreaker, is_throttle_error
+
+logger = logging.getLogger(__name__)
+
+# (コード, 市場)
+Symbol = Tuple[str, str]
+
+DEFAULT_CURRENCIES = {'JP': 'JPY', 'US': 'USD'}
+
+
+def yahoo_symbol(code: str, market: str = "JP") -> str:
+    """株式コードをYahoo Finance形式に変換"""
+    if market == "JP":
+        return f"{code}.T"  # 日本株
+    return code  # 米国株はそのまま（例：AAPL, GOOGL）
+
+
+def make_quote(code: str, market: str, symbol: str, current_price: float, previous_close: float,
+               provider: str, **extra) -> Dict:
+    """get_current_price と同じ形式の株価データを作成（前日比はここで計算）"""
+    price_change = current_price - previous_close if previous_close else 0
+    quote = {
+        'code': code,
+        'symbol': symbol,
+        'market': market,
+        'current_price': current_price,
+        'previous_close': previous_close,
+        'price_change': price_change,
+        'price_change_pct': (price_change / previous_close * 100) if previous_close else 0,
+        'market_cap': None,
+        'volume': None,
+        'currency': DEFAULT_CURRENCIES.get(market),
+        'last_update': datetime.now().isoformat(),
+        'provider': provider,
+    }
+    quote.update({key: value for key, value in extra.items() if value is not None})
+    return quote
+
+
+class YahooDownloadError(Exception):
+    """yf.download で1銘柄も取得できなかったことを示す例外（yfinanceが出力したエラー内容を含む）"""
+
+
+class _ThreadErrorCapture(logging.Handler):
+    """呼び出し元のスレッドで yfinance が出力したエラーログを集めるハンドラ"""
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.thread = threading.get_ident()
+        self.messages: List[str] = []
+
+    def emit(self, record: logging.LogRecord):
+        if record.thread == self.thread:
+            self.messages.append(record.getMessage())
+
+
+def download_yahoo(tickers: List[str], **kwargs) -> pd.DataFrame:
+    """yf.download を呼び出し、1銘柄も取得できなかった場合は YahooDownloadError を送出
+
+    yf.download は銘柄ごとの失敗（レート制限を含む）を例外にせず、ログに出力して空のデータを返す。
+    そのままでは呼び出し元のレート制御・サーキットブレーカーに成功として記録されるため、
+    ログを集めて例外のメッセージにし、is_throttle_error などで判定できるようにする。
+    """
+    capture = _ThreadErrorCapture()
+    yf_logger = logging.getLogger('yfinance')
+    yf_logger.addHandler(capture)
+    try:
+        raw = yf.download(tickers, **kwargs)
+    finally:
+        yf_logger.removeHandler(capture)
+
+    if raw is not None and not raw.empty and 'Close' in raw.columns.get_level_values(0) \
+            and raw['Close'].notna().any().any():
+        return raw
+    # レート制限と存在しない銘柄が混在する場合はレート制限として扱う
+    throttled = [message for message in capture.messages if is_throttle_error(Exception(message))]
+    detail = '; '.join(throttled or capture.messages) or 'no data returned'
+    raise YahooDownloadError(f"{len(tickers)}銘柄を取得できませんでした: {detail}")
+
+
+class PriceProvider(ABC):
+    """株価の取得元の基底クラス
+
+    各プロバイダーは対応市場（markets）、1回の取得でまとめられる銘柄数（batch_size）と
+    レート制限（同時実行数・リクエスト間隔）を宣言する。レート制限とサーキットブレーカーは
+    プロバイダーごとに持ち、同じ上流（Yahoo Financeなど）のプロバイダー間では共有できる。
+    fetch_batch は取得できた銘柄のみを返し、取得できなかった銘柄は次のプロバイダーで取得される。
+    """
+
+    name = 'base'
+    markets: Tuple[str, ...] = ('JP', 'US')
+    batch_size = 1
+    max_concurrency = 8
+    min_interval = 0.1
+
+    def __init__(self, limiter: AdaptiveLimiter = None, breaker: CircuitBreaker = None):
+        self.limiter = limiter or AdaptiveLimiter(max_concurrency=self.max_concurrency, min_interval=self.min_interval)
+        self.breaker = breaker or CircuitBreaker()
+        # レート制限を共有する場合もプロバイダー自身の同時実行数の上限は守る
+        self.slots = threading.BoundedSemaphore(self.max_concurrency)
+
+    def supports(self, market: str) -> bool:
+        return market in self.markets
+
+    def is_available(self) -> bool:
+        """サーキットブレーカーが開いていない（呼び出せる見込みがある）か"""
+        return self.breaker.is_available()
+
+    @abstractmethod
+    def fetch_batch(self, symbols: List[Symbol], timeout: float = None) -> Dict[Symbol, Dict]:
+        """batch_size 以下の銘柄をまとめて取得し、(コード, 市場) -> 株価データを返す"""
+
+
+class YahooInfoProvider(PriceProvider):
+    """Yahoo Financeの銘柄情報（Ticker.info）から1銘柄ずつ取得（時価総額・出来高を含む）"""
+
+    name = 'yahoo'
+    batch_size = 1
+
+    def fetch_batch(self, symbols: List[Symbol], timeout: float = None) -> Dict[Symbol, Dict]:
+        quotes = {}
+        for code, market in symbols:
+            symbol = yahoo_symbol(code, market)
+            info = yf.Ticker(symbol).info
+            if 'currentPrice' not in info and 'regularMarketPrice' not in info:
+                continue
+            quotes[(code, market)] = make_quote(
+                code, market, symbol,
+                info.get('currentPrice', info.get('regularMarketPrice', 0)),
+                info.get('previousClose', info.get('regularMarketPreviousClose', 0)),
+                self.name,
+                market_cap=info.get('marketCap'),
+                volume=info.get('volume', info.get('regularMarketVolume')),
+                currency=info.get('currency'),
+            )
+        return quotes
+
+
+class YahooDownloadProvider(PriceProvider):
+    """Yahoo Financeの日足（yf.download）から複数銘柄をまとめて取得
+
+    直近の終値（場中は当日の値）を現在値、その前の終値を前日終値とする。
+    """
+
+    name = 'yahoo-batch'
+    batch_size = 100
+    max_concurrency = 2
+
+    def fetch_batch(self, symbols: List[Symbol], timeout: float = None) -> Dict[Symbol, Dict]:
+        codes = {yahoo_symbol(code, market): (code, market) for code, market in symbols}
+        # 1銘柄も取得できなかった場合（レート制限など）は例外になり、失敗として記録される
+        raw = download_yahoo(list(codes), period='5d', interval='1d', group_by='column', auto_adjust=False,
+                             progress=False, threads=False, timeout=timeout or 10, multi_level_index=True)
+        closes, volumes = raw['Close'], raw.get('Volume')
+        quotes = {}
+        for symbol, (code, market) in codes.items():
+            if symbol not in closes.columns:
+                continue
+            series = closes[symbol].dropna()
+            if series.empty:
+                continue
+            previous = float(series.iloc[-2]) if len(series) > 1 else 0
+            volume = volumes[symbol].iloc[-1] if volumes is not None and symbol in volumes.columns else None
+            quotes[(code, market)] = make_quote(
+                code, market, symbol, float(series.iloc[-1]), previous, self.name,
+                volume=None if volume is None or pd.isna(volume) else int(volume),
+            )
+        return quotes
+
+
+class LocalPriceProvider(PriceProvider):
+    """ローカルのCSV（code,market,price,previous_close）から取得（テスト・障害時の代替用）
+
+    ファイルは更新時刻が変わったときだけ読み直す。
+    """
+
+    name = 'local'
+    batch_size = 10000
+    min_interval = 0.0
+
+    def __init__(self, path: str = 'input/prices.csv', limiter: AdaptiveLimiter = None,
+                 breaker: CircuitBreaker = None):
+        super().__init__(limiter, breaker)
+        self.path = path
+        self._prices: Dict[Symbol, Tuple[float, float]] = {}
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[Symbol, Tuple[float, float]]:
+        mtime = os.path.getmtime(self.path)
+        with self._lock:
+            if mtime != self._mtime:
+                df = pd.read_csv(self.path, dtype={'code': str, 'market': str})
+                previous = df['previous_close'] if 'previous_close' in df.columns else pd.Series(0.0, index=df.index)
+                self._prices = {
+                    (code, market.upper()): (float(price), float(prev) if pd.notna(prev) else 0.0)
+                    for code, market, price, prev in zip(df['code'], df['market'], df['price'], previous)
+                    if pd.notna(price)
+                }
+                self._mtime = mtime
+                logger.info("ローカル株価ファイルを読み込みました: %s (%d銘柄)", self.path, len(self._prices))
+            return self._prices
+
+    def is_available(self) -> bool:
+        return os.path.exists(self.path) and super().is_available()
+
+    def fetch_batch(self, symbols: List[Symbol], timeout: float = None) -> Dict[Symbol, Dict]:
+        prices = self._load()
+        # as_of: ファイルの更新時刻（株価の鮮度の表示用）
+        return {
+            (code, market): make_quote(code, market, code, *prices[(code, market)], self.name, as_of=self._mtime)
+            for code, market in symbols if (code, market) in prices
+        }
+
+
+def default_providers(limiter: AdaptiveLimiter, breaker: CircuitBreaker,
+                      local_path: Optional[str] = 'input/prices.csv') -> List[PriceProvider]:
+    """既定のプロバイダー（優先順）: Yahoo Finance一括取得 → 銘柄情報 → ローカルCSV
+
+    Yahoo Financeの2つのプロバイダーは同じ上流のため、レート制限とサーキットブレーカーを共有する。
+    """
+    providers = [
+        YahooDownloadProvider(limiter, breaker),
+        YahooInfoProvider(limiter, breaker),
+    ]
+    if local_path:
+        providers.append(LocalPriceProvider(local_path))
+    return providers
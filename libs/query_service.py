@@ -0,0 +1,259 @@
+import hashlib
+import json
+import logging
+import math
+import threading
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Hashable, Tuple
+from urllib.parse import parse_qs, urlparse
+from libs.market_calendar import MarketCalendar
+from libs.top_movers import select_top_movers
+
+logger = logging.getLogger(__name__)
+
+MARKETS = ('jp', 'us')
+
+
+class QueryError(ValueError):
+    """リクエストのパラメータが不正"""
+
+
+class ResponseCache:
+    """データのバージョンに紐づけてJSONレスポンスを保持するキャッシュ
+
+    version_fn の値が変わると（株価の更新・評価額の追記）全エントリが無効になる。
+    同じキーの再計算が同時に要求された場合は1回だけ計算し、他の要求はその結果を使う。
+    ETagはレスポンス本文のハッシュで、再計算しても内容が同じなら変わらない。
+    """
+
+    def __init__(self, version_fn: Callable[[], Hashable], max_entries: int = 256):
+        self.version_fn = version_fn
+        self.max_entries = max_entries
+        self._entries: Dict[str, Tuple[Hashable, bytes, str]] = {}
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, build_fn: Callable[[], object]) -> Tuple[bytes, str]:
+        """キーのレスポンス本文とETagを取得（無効なら build_fn で再計算）"""
+        version = self.version_fn()
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            self.hits += 1
+            return entry[1], entry[2]
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            # 待っている間に他のリクエストが再計算した場合はその結果を使う
+            version = self.version_fn()
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self.hits += 1
+                return entry[1], entry[2]
+
+            self.misses += 1
+            try:
+                body = json.dumps(_to_json(build_fn()), ensure_ascii=False).encode('utf-8')
+            except Exception:
+                # 不正なパラメータなどでエントリを作らない場合はキーのロックも残さない
+                with self._lock:
+                    if key not in self._entries:
+                        self._key_locks.pop(key, None)
+                raise
+            etag = f'"{hashlib.sha1(body).hexdigest()[:20]}"'
+            with self._lock:
+                if key not in self._entries and len(self._entries) >= self.max_entries:
+                    evicted = next(iter(self._entries))
+                    del self._entries[evicted]
+                    self._key_locks.pop(evicted, None)
+                self._entries[key] = (version, body, etag)
+            return body, etag
+
+
+def _to_json(value):
+    """NaN・NumPy型などをJSONで表現できる値に変換"""
+    if isinstance(value, dict):
+        return {str(k): _to_json(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_json(v) for v in value]
+    if hasattr(value, 'item'):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+class PortfolioQueryService:
+    """StockNotifier が保持しているポートフォリオの数値をJSONで返すローカルHTTPサービス
+
+    株価は取得せず、株価ボード・評価額ストアなどプロセス内の状態のみを参照する。
+    レスポンスは株価ボードと評価額ストアのバージョンが変わるまでキャッシュし、
+    If-None-Match が現在のETagと一致する場合は 304 を返す。
+
+    エンドポイント:
+      GET /holdings?market=jp|us   保有銘柄ごとの数量・株価・評価額・損益
+      GET /valuation               市場別・合計の評価額・損益・前日比と期間騰落率
+      GET /movers?market=jp&k=5    値上がり・値下がり・評価額の上位銘柄
+      GET /history?market=jp&days=90  市場合計の評価額の日次推移
+      GET /health                  状態確認（キャッシュしない）
+    """
+
+    def __init__(self, notifier, host: str = '127.0.0.1', port: int = 8765):
+        self.notifier = notifier
+        self.host = host
+        self.port = port
+        # 騰落率・推移の基準日は市場ごとのローカル日付（米国株は米国東部時間の日付）
+        self.calendars = {market: MarketCalendar(market.upper()) for market in MARKETS}
+        self.cache = ResponseCache(
+            lambda: (notifier.quote_board.version, notifier.valuation_store.version,
+                     tuple(calendar.local_date() for calendar in self.calendars.values()))
+        )
+        # パス -> (処理, 受け付けるパラメータ)。それ以外のパラメータは無視し、キャッシュのキーにも含めない
+        self.routes = {
+            '/holdings': (self._holdings, ('market',)),
+            '/valuation': (self._valuation, ()),
+            '/movers': (self._movers, ('market', 'k')),
+            '/history': (self._history, ('market', 'days')),
+        }
+        self._server = None
+        self._thread = None
+
+    @staticmethod
+    def _get_market(params: Dict, default: str = None) -> str:
+        market = params.get('market', default)
+        if market not in MARKETS:
+            raise QueryError(f"market は {' / '.join(MARKETS)} のいずれかを指定してください")
+        return market
+
+    @staticmethod
+    def _get_int(params: Dict, name: str, default: int, maximum: int) -> int:
+        try:
+            value = int(params.get(name, default))
+        except ValueError:
+            raise QueryError(f"{name} は整数で指定してください")
+        if not 1 <= value <= maximum:
+            raise QueryError(f"{name} は 1〜{maximum} で指定してください")
+        return value
+
+    def _positions(self, market: str) -> list:
+        positions = self.notifier.quote_board.get_positions(market)
+        if market == 'jp' and self.notifier.jp_stock_data:
+            names = self.notifier.jp_stock_data.get_stock_names()
+            for position in positions:
+                position['name'] = names.get(position['code'])
+        return positions
+
+    def _holdings(self, params: Dict) -> Dict:
+        markets = [self._get_market(params)] if 'market' in params else list(MARKETS)
+        return {market: self._positions(market) for market in markets}
+
+    def _valuation(self, params: Dict) -> Dict:
+        totals = self.notifier.quote_board.revalue()
+        returns = {market: self.notifier.valuation_store.get_returns(market, self.calendars[market].local_date())
+                   for market in MARKETS}
+        return {
+            'jp': dict(totals['JP'], returns=returns['jp']),
+            'us': dict(totals['US'], returns=returns['us']),
+            'total': totals['total'],
+        }
+
+    def _movers(self, params: Dict) -> Dict:
+        market = self._get_market(params, 'jp')
+        k = self._get_int(params, 'k', 5, 100)
+        positions = [position for position in self._positions(market) if position['current_price'] is not None]
+        for position in positions:
+            position['price_change_pct'] = position['price_change_pct'] or 0
+        movers = select_top_movers(positions, k, lambda position: position['value_jpy'])
+        movers['largest'] = [dict(position, weight_pct=weight) for position, weight in movers['largest']]
+        return movers
+
+    def _history(self, params: Dict) -> Dict:
+        market = self._get_market(params, 'jp')
+        days = self._get_int(params, 'days', 90, 3660)
+        today = self.calendars[market].local_date()
+        series = self.notifier.valuation_store.get_total_series(market, today - timedelta(days=days), today)
+        return {
+            'market': market,
+            'values': [{'date': day.date().isoformat(), 'value': value} for day, value in series.items()],
+        }
+
+    def _health(self) -> Dict:
+        return {
+            'status': 'ok',
+            'quote_version': self.notifier.quote_board.version,
+            'cache': {'hits': self.cache.hits, 'misses': self.cache.misses},
+        }
+
+    def handle(self, path: str, query: str, if_none_match: str = None) -> Tuple[int, bytes, str]:
+        """リクエストを処理して (ステータス, 本文, ETag) を返す"""
+        params = {name: values[-1] for name, values in parse_qs(query).items()}
+        if path == '/health':
+            return 200, json.dumps(self._health()).encode('utf-8'), None
+
+        if path not in self.routes:
+            return 404, json.dumps({'error': f"not found: {path}"}).encode('utf-8'), None
+
+        route, accepted = self.routes[path]
+        params = {name: params[name] for name in accepted if name in params}
+        key = f"{path}?{'&'.join(f'{name}={params[name]}' for name in accepted if name in params)}"
+        try:
+            body, etag = self.cache.get(key, lambda: route(params))
+        except QueryError as e:
+            return 400, json.dumps({'error': str(e)}, ensure_ascii=False).encode('utf-8'), None
+
+        if if_none_match and etag in [tag.strip() for tag in if_none_match.split(',')]:
+            return 304, b'', etag
+        return 200, body, etag
+
+    def _make_handler(self):
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                try:
+                    status, body, etag = service.handle(url.path.rstrip('/') or '/', url.query,
+                                                        self.headers.get('If-None-Match'))
+                except Exception:
+                    logger.exception("クエリサービスのエラー: %s", self.path)
+                    status, body, etag = 500, b'{"error": "internal error"}', None
+
+                self.send_response(status)
+                if etag:
+                    self.send_header('ETag', etag)
+                    self.send_header('Cache-Control', 'no-cache')
+                if status != 304:
+                    self.send_header('Content-Type', 'application/json; charset=utf-8')
+                    self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if status != 304:
+                    self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug("%s - %s", self.address_string(), format % args)
+
+        return Handler
+
+    def start(self) -> threading.Thread:
+        """バックグラウンドのスレッドでHTTPサービスを開始"""
+        self._server = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name='query-service', daemon=True)
+        self._thread.start()
+        logger.info("🌐 クエリサービスを開始しました: http://%s:%d", self.host, self.port)
+        return self._thread
+
+    def stop(self):
+        """HTTPサービスを停止"""
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+        logger.info("🌐 クエリサービスを停止しました")
@@ -0,0 +1,271 @@
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+# 市場コード（配列上の表現）
+MARKET_CODES = {'JP': 0, 'US': 1}
+
+
+class QuoteBoardView:
+    """QuoteBoard の配列の読み取り専用ビュー（コピーなし）
+
+    read() のコールバック内でのみ有効。コールバックの外に配列を持ち出す場合はコピーすること。
+    """
+
+    __slots__ = ('symbols', 'markets', 'price', 'previous_close', 'change', 'quantity', 'cost', 'fx', 'updated_at')
+
+    def __init__(self, board: 'QuoteBoard'):
+        n = len(board._symbols)
+        self.symbols = board._symbols
+        for name in ('markets', 'price', 'previous_close', 'change', 'quantity', 'cost', 'fx', 'updated_at'):
+            view = getattr(board, f"_{name}")[:n].view()
+            view.flags.writeable = False
+            setattr(self, name, view)
+
+
+class QuoteBoard:
+    """銘柄ごとのスロットに株価・保有数量を保持する配列ベースの株価ボード
+
+    (市場, 銘柄) -> スロット番号の辞書と、事前に確保したNumPy配列（株価・前日終値・前日比・
+    数量・取得単価・為替レート）で構成する。ティックごとの更新は O(1)、評価額・損益の
+    再計算は配列演算で行う。
+
+    書き込みはロックで直列化し、書き込み中はバージョン番号を奇数にする（シーケンスロック）。
+    読み取り側はロックを取らずに配列のビューを参照し、読み取り中にバージョンが変わった
+    場合はやり直すことで、コピーせずに一貫したスナップショットを得る。
+    """
+
+    def __init__(self, capacity: int = 256):
+        self._slots: Dict[Tuple[str, str], int] = {}
+        self._symbols: List[str] = []
+        self._lock = threading.Lock()
+        self._version = 0
+        self._fx_rates: Dict[str, float] = {}
+        self._allocate(capacity)
+
+    def _allocate(self, capacity: int):
+        n = len(self._symbols)
+
+        def grow(name: str, dtype, fill):
+            array = np.full(capacity, fill, dtype=dtype)
+            old = getattr(self, name, None)
+            if old is not None:
+                array[:n] = old[:n]
+            setattr(self, name, array)
+
+        grow('_markets', np.int8, -1)
+        grow('_price', np.float64, np.nan)
+        grow('_previous_close', np.float64, np.nan)
+        grow('_change', np.float64, np.nan)
+        grow('_quantity', np.float64, 0.0)
+        grow('_cost', np.float64, np.nan)
+        grow('_fx', np.float64, 1.0)
+        grow('_updated_at', np.float64, 0.0)
+        self._capacity = capacity
+
+    def _begin_write(self):
+        self._lock.acquire()
+        self._version += 1
+
+    def _end_write(self):
+        self._version += 1
+        self._lock.release()
+
+    def __len__(self) -> int:
+        return len(self._symbols)
+
+    @property
+    def version(self) -> int:
+        """書き込みごとに増えるバージョン番号（株価・保有数量の変更検知用）"""
+        return self._version
+
+    def slot(self, symbol: str, market: str = "JP") -> Optional[int]:
+        return self._slots.get((market.upper(), str(symbol)))
+
+    def set_holdings(self, market: str, holdings: Dict[str, Tuple[float, float]]):
+        """保有銘柄の (数量, 取得単価) を登録（未登録の銘柄はスロットを追加、保有しなくなった銘柄は数量0）"""
+        market = market.upper()
+        self._begin_write()
+        try:
+            for (slot_market, _), slot in self._slots.items():
+                if slot_market == market:
+                    self._quantity[slot] = 0.0
+            for symbol, (quantity, cost) in holdings.items():
+                slot = self._get_or_add_slot(str(symbol), market)
+                self._quantity[slot] = quantity
+                self._cost[slot] = cost
+        finally:
+            self._end_write()
+
+    def _get_or_add_slot(self, symbol: str, market: str) -> int:
+        key = (market, symbol)
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = len(self._symbols)
+            if slot >= self._capacity:
+                self._allocate(self._capacity * 2)
+            self._symbols.append(symbol)
+            self._markets[slot] = MARKET_CODES[market]
+            self._fx[slot] = self._fx_rates.get(market, 1.0)
+            self._slots[key] = slot
+        return slot
+
+    def set_fx_rate(self, market: str, rate: float):
+        """市場の為替レート（1単位あたりの円）を設定"""
+        market = market.upper()
+        self._begin_write()
+        try:
+            self._fx[self._markets == MARKET_CODES[market]] = rate
+            self._fx_rates[market] = rate
+        finally:
+            self._end_write()
+
+    def update(self, symbol: str, market: str, price: float, previous_close: float = None,
+               timestamp: float = None) -> bool:
+        """1銘柄の株価を更新（O(1)）。未登録の銘柄は無視してFalseを返す"""
+        slot = self._slots.get((market.upper(), str(symbol)))
+        if slot is None:
+            return False
+
+        self._begin_write()
+        try:
+            if previous_close is not None:
+                self._previous_close[slot] = previous_close
+            self._price[slot] = price
+            self._change[slot] = price - self._previous_close[slot]
+            self._updated_at[slot] = timestamp if timestamp is not None else time.time()
+        finally:
+            self._end_write()
+        return True
+
+    def update_many(self, quotes: Dict[str, Dict], market: str = "JP") -> int:
+        """get_multiple_prices 形式の株価をまとめて更新し、更新した銘柄数を返す
+
+        キャッシュ・CSVの株価（price_age 付き）は、その経過秒数だけ前の時刻を更新時刻とする。
+        """
+        market = market.upper()
+        now = time.time()
+        slots, prices, previous, updated_at = [], [], [], []
+        for symbol, quote in quotes.items():
+            slot = self._slots.get((market, str(symbol)))
+            if slot is not None and quote:
+                slots.append(slot)
+                prices.append(quote['current_price'])
+                previous.append(quote.get('previous_close', np.nan))
+                updated_at.append(now - (quote.get('price_age') or 0.0))
+        if not slots:
+            return 0
+
+        index = np.array(slots)
+        previous = np.array(previous, dtype=np.float64)
+        self._begin_write()
+        try:
+            self._previous_close[index] = np.where(np.isnan(previous), self._previous_close[index], previous)
+            self._price[index] = prices
+            self._change[index] = self._price[index] - self._previous_close[index]
+            self._updated_at[index] = updated_at
+        finally:
+            self._end_write()
+        return len(slots)
+
+    def read(self, fn: Callable[[QuoteBoardView], object]):
+        """一貫したスナップショットに対して fn を実行し、その結果を返す
+
+        fn は書き込みと並行して実行され、途中で書き込みがあった場合は再実行される。
+        fn は副作用を持たず、ビューの配列を戻り値に含めないこと。
+        """
+        while True:
+            version = self._version
+            if version % 2 == 0:
+                result = fn(QuoteBoardView(self))
+                if self._version == version:
+                    return result
+            time.sleep(0)
+
+    def revalue(self) -> Dict:
+        """評価額・損益・前日比を配列演算で再計算（市場別と合計、円建て）"""
+        def compute(view: QuoteBoardView) -> Dict:
+            held = (view.quantity > 0) & ~np.isnan(view.price)
+            value = np.where(held, view.price * view.quantity * view.fx, 0.0)
+            cost = np.where(held & ~np.isnan(view.cost), view.cost * view.quantity * view.fx, 0.0)
+            change = np.where(held & ~np.isnan(view.change), view.change * view.quantity * view.fx, 0.0)
+
+            result = {}
+            for market, code in MARKET_CODES.items():
+                mask = view.markets == code
+                result[market] = _summarize(value[mask].sum(), cost[mask].sum(), change[mask].sum(),
+                                            int((held & mask).sum()))
+            result['total'] = _summarize(value.sum(), cost.sum(), change.sum(), int(held.sum()))
+            return result
+
+        return self.read(compute)
+
+    def get_quotes(self, market: str = "JP", symbols: Iterable[str] = None,
+                   max_age: float = None) -> Dict[str, Dict]:
+        """get_multiple_prices と同じ形式で株価を取得（アラート評価用）
+
+        max_age を指定した場合は、更新から max_age 秒以内の株価のみを返す。
+        """
+        code = MARKET_CODES[market.upper()]
+        wanted = None if symbols is None else {str(symbol) for symbol in symbols}
+        oldest = -np.inf if max_age is None else time.time() - max_age
+
+        def collect(view: QuoteBoardView) -> Dict[str, Dict]:
+            quotes = {}
+            fresh = (view.markets == code) & ~np.isnan(view.price) & (view.updated_at >= oldest)
+            for slot in np.flatnonzero(fresh):
+                symbol = view.symbols[slot]
+                if wanted is not None and symbol not in wanted:
+                    continue
+                price, previous = float(view.price[slot]), float(view.previous_close[slot])
+                quotes[symbol] = {
+                    'code': symbol,
+                    'current_price': price,
+                    'previous_close': previous,
+                    'price_change': float(view.change[slot]),
+                    'price_change_pct': float(view.change[slot] / previous * 100) if previous else 0.0,
+                    'updated_at': float(view.updated_at[slot]),
+                }
+            return quotes
+
+        return self.read(collect)
+
+    def get_positions(self, market: str = "JP") -> List[Dict]:
+        """保有銘柄ごとの数量・取得単価・株価・評価額（現地通貨と円）を取得"""
+        code = MARKET_CODES[market.upper()]
+
+        def collect(view: QuoteBoardView) -> List[Dict]:
+            positions = []
+            for slot in np.flatnonzero((view.markets == code) & (view.quantity > 0)):
+                price, previous = float(view.price[slot]), float(view.previous_close[slot])
+                quantity, cost, fx = float(view.quantity[slot]), float(view.cost[slot]), float(view.fx[slot])
+                priced = not np.isnan(price)
+                positions.append({
+                    'code': view.symbols[slot],
+                    'quantity': quantity,
+                    'acquisition_price': None if np.isnan(cost) else cost,
+                    'current_price': price if priced else None,
+                    'price_change_pct': (float(view.change[slot] / previous * 100)
+                                         if priced and previous and not np.isnan(previous) else None),
+                    'value': price * quantity if priced else None,
+                    'value_jpy': price * quantity * fx if priced else None,
+                    'profit_loss': (price - cost) * quantity if priced and not np.isnan(cost) else None,
+                    'updated_at': float(view.updated_at[slot]) or None,
+                })
+            return positions
+
+        return self.read(collect)
+
+
+def _summarize(value: float, cost: float, change: float, count: int) -> Dict:
+    previous = value - change
+    return {
+        'count': count,
+        'value': float(value),
+        'cost': float(cost),
+        'profit_loss': float(value - cost),
+        'profit_loss_pct': float((value / cost - 1) * 100) if cost else 0.0,
+        'day_change': float(change),
+        'day_change_pct': float(change / previous * 100) if previous else 0.0,
+    }
@@ -0,0 +1,264 @@
+import logging
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+from libs.rate_control import jittered_backoff
+
+logger = logging.getLogger(__name__)
+
+# ティック: {'symbol', 'market', 'price', 'previous_close', 'timestamp'}
+TickHandler = Callable[[str, float, Optional[float], Optional[float]], None]
+
+
+class QuoteFeed(ABC):
+    """プッシュ型の株価フィードの基底クラス
+
+    実装クラスは subscribe で購読銘柄（Yahoo Finance形式のシンボル）を受け取り、
+    run で接続中のティックを on_tick(シンボル, 株価, 前日終値, 時刻) に渡し続ける。
+    run は切断時に戻る（または例外を送出する）。再接続は QuoteStreamer が行う。
+    """
+
+    @abstractmethod
+    def subscribe(self, symbols: List[str]):
+        """購読する銘柄を設定（次の run から有効）"""
+
+    @abstractmethod
+    def run(self, on_tick: TickHandler):
+        """接続してティックを on_tick に渡し続ける（切断時に戻る）"""
+
+    def close(self):
+        """run を終了させる（別スレッドから呼ばれる）"""
+
+
+class YahooQuoteFeed(QuoteFeed):
+    """Yahoo FinanceのWebSocketストリーミングによるフィード"""
+
+    def __init__(self):
+        import yfinance as yf
+        self._ws = yf.WebSocket(verbose=False)
+        self._symbols: List[str] = []
+
+    def subscribe(self, symbols: List[str]):
+        self._symbols = list(symbols)
+
+    def run(self, on_tick: TickHandler):
+        def handle(message: Dict):
+            price = message.get('price')
+            if message.get('id') and price:
+                timestamp = message.get('time')
+                on_tick(message['id'], float(price), message.get('previous_close'),
+                        int(timestamp) / 1000 if timestamp else None)
+
+        self._ws.subscribe(self._symbols)
+        self._ws.listen(handle)
+
+    def close(self):
+        self._ws.close()
+
+
+class SimulatedQuoteFeed(QuoteFeed):
+    """ランダムウォークでティックを生成するローカルフィード（テスト用）
+
+    disconnect_after 秒ごとに切断を模擬し、再接続処理を確認できる。
+    """
+
+    def __init__(self, initial_prices: Dict[str, float], ticks_per_second: float = 50.0,
+                 volatility: float = 0.001, disconnect_after: float = None, seed: int = None):
+        self.prices = dict(initial_prices)
+        self.previous_close = dict(initial_prices)
+        self.ticks_per_second = ticks_per_second
+        self.volatility = volatility
+        self.disconnect_after = disconnect_after
+        self._random = random.Random(seed)
+        self._symbols: List[str] = []
+        self._stop_event = threading.Event()
+
+    def subscribe(self, symbols: List[str]):
+        self._symbols = [symbol for symbol in symbols if symbol in self.prices]
+
+    def run(self, on_tick: TickHandler):
+        if not self._symbols:
+            self._stop_event.wait()
+            return
+
+        started = time.monotonic()
+        interval = 1.0 / self.ticks_per_second
+        while not self._stop_event.wait(interval):
+            if self.disconnect_after and time.monotonic() - started >= self.disconnect_after:
+                raise ConnectionError("simulated disconnect")
+            symbol = self._random.choice(self._symbols)
+            self.prices[symbol] *= 1 + self._random.gauss(0, self.volatility)
+            on_tick(symbol, self.prices[symbol], self.previous_close[symbol], time.time())
+
+    def close(self):
+        self._stop_event.set()
+
+
+class ConflatingBuffer:
+    """銘柄ごとに最新のティックだけを保持する上限付きバッファ
+
+    受信側は待たされない（同じ銘柄の未処理ティックは最新値で上書きする）。
+    未処理の銘柄数が max_pending を超えた場合は最も古い銘柄のティックを捨てる。
+    """
+
+    def __init__(self, max_pending: int = 10000):
+        self.max_pending = max_pending
+        self._pending: 'OrderedDict[str, Dict]' = OrderedDict()
+        self._cond = threading.Condition()
+        self.conflated = 0
+        self.dropped = 0
+
+    def put(self, key: str, tick: Dict):
+        with self._cond:
+            if key in self._pending:
+                self.conflated += 1
+            elif len(self._pending) >= self.max_pending:
+                self._pending.popitem(last=False)
+                self.dropped += 1
+            self._pending[key] = tick
+            self._cond.notify()
+
+    def drain(self, timeout: float) -> List[Dict]:
+        """未処理のティックをすべて取り出す（空の場合は timeout 秒まで待つ）"""
+        with self._cond:
+            if not self._pending:
+                self._cond.wait(timeout)
+            ticks = list(self._pending.values())
+            self._pending.clear()
+        return ticks
+
+
+class QuoteStreamer:
+    """株価フィードを購読し、受信したティックをまとめて sink に書き込むクラス
+
+    受信スレッドはフィードの接続を維持し、切断時はジッター付き指数バックオフで再接続する。
+    書き込みスレッドは batch_interval ごとにバッファを取り出して sink(ティックのリスト) を呼ぶ。
+    sink が遅い場合もバッファは銘柄ごとに最新値へまとめられるため、メモリは銘柄数で抑えられる。
+    """
+
+    def __init__(self, feed_factory: Callable[[], QuoteFeed], symbols: Dict[str, Tuple[str, str]],
+                 sink: Callable[[List[Dict]], None], batch_interval: float = 0.5, max_pending: int = 10000,
+                 reconnect_base: float = 1.0, reconnect_cap: float = 60.0):
+        self.feed_factory = feed_factory
+        # Yahoo Finance形式のシンボル -> (コード, 市場)
+        self.symbols = dict(symbols)
+        self.sink = sink
+        self.batch_interval = batch_interval
+        self.buffer = ConflatingBuffer(max_pending)
+        self.reconnect_base = reconnect_base
+        self.reconnect_cap = reconnect_cap
+        self.received = 0
+        self.delivered = 0
+        self.reconnects = 0
+        self._feed: Optional[QuoteFeed] = None
+        self._stop_event = threading.Event()
+        self._resubscribe = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def _on_tick(self, symbol: str, price: float, previous_close: Optional[float], timestamp: Optional[float]):
+        mapped = self.symbols.get(symbol)
+        if mapped is None:
+            return
+        self.received += 1
+        code, market = mapped
+        self.buffer.put(symbol, {
+            'symbol': code,
+            'market': market,
+            'price': price,
+            'previous_close': previous_close,
+            'timestamp': timestamp or time.time(),
+        })
+
+    def _receive_loop(self):
+        attempt = 0
+        while not self._stop_event.is_set():
+            received_before = self.received
+            try:
+                self._feed = self.feed_factory()
+                self._feed.subscribe(list(self.symbols))
+                logger.info("株価フィードに接続しました (%d銘柄)", len(self.symbols))
+                self._feed.run(self._on_tick)
+            except Exception as e:
+                logger.warning("株価フィードが切断されました: %s", e)
+            finally:
+                if self._feed is not None:
+                    try:
+                        self._feed.close()
+                    except Exception:
+                        pass
+
+            if self._stop_event.is_set():
+                break
+            if self._resubscribe.is_set():
+                # 購読銘柄の変更による切断はすぐに接続し直す
+                self._resubscribe.clear()
+                attempt = 0
+                continue
+            # ティックを受信できていた接続の後はバックオフをリセット
+            attempt = 0 if self.received > received_before else attempt + 1
+            delay = jittered_backoff(attempt, base=self.reconnect_base, cap=self.reconnect_cap)
+            self.reconnects += 1
+            logger.info("%.1f秒後に株価フィードへ再接続します", delay)
+            self._stop_event.wait(delay)
+
+    def _deliver_loop(self):
+        while not self._stop_event.is_set():
+            ticks = self.buffer.drain(self.batch_interval)
+            if not ticks:
+                continue
+            try:
+                self.sink(ticks)
+                self.delivered += len(ticks)
+            except Exception:
+                logger.exception("ティックの書き込みエラー")
+
+    def start(self):
+        """受信・書き込みスレッドを開始"""
+        self._stop_event.clear()
+        self._threads = [
+            threading.Thread(target=self._receive_loop, name='quote-stream-receive', daemon=True),
+            threading.Thread(target=self._deliver_loop, name='quote-stream-deliver', daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def update_symbols(self, symbols: Dict[str, Tuple[str, str]]) -> bool:
+        """購読銘柄を置き換え、変更があればフィードに接続し直して購読し直す"""
+        symbols = dict(symbols)
+        if symbols == self.symbols:
+            return False
+        self.symbols = symbols
+        feed = self._feed
+        if feed is not None and self._threads:
+            self._resubscribe.set()
+            try:
+                feed.close()
+            except Exception:
+                pass
+        logger.info("購読銘柄を更新しました (%d銘柄)", len(symbols))
+        return True
+
+    def stop(self, timeout: float = 5.0):
+        """ストリーミングを停止"""
+        self._stop_event.set()
+        if self._feed is not None:
+            try:
+                self._feed.close()
+            except Exception:
+                pass
+        with self.buffer._cond:
+            self.buffer._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'received': self.received,
+            'delivered': self.delivered,
+            'conflated': self.buffer.conflated,
+            'dropped': self.buffer.dropped,
+            'reconnects': self.reconnects,
+        }
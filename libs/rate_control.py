@@ -0,0 +1,173 @@
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+# スロットリングと判定する例外クラス名・メッセージ
+_THROTTLE_MARKERS = ('429', 'too many requests', 'rate limit', 'ratelimit')
+# 上流の障害ではなく要求側の問題（存在しない銘柄など）と判定するメッセージ
+_CLIENT_ERROR_MARKERS = ('404', 'not found', 'delisted')
+
+
+class CircuitOpenError(Exception):
+    """サーキットブレーカーが開いているため呼び出しを行わなかったことを示す例外"""
+
+
+def is_throttle_error(error: Exception) -> bool:
+    """例外がレート制限（HTTP 429など）によるものか判定"""
+    text = f"{type(error).__name__} {error}".lower()
+    return any(marker in text for marker in _THROTTLE_MARKERS)
+
+
+def is_client_error(error: Exception) -> bool:
+    """例外が存在しない銘柄など要求側の問題によるものか判定（リトライ・障害判定の対象外）"""
+    text = str(error).lower()
+    return any(marker in text for marker in _CLIENT_ERROR_MARKERS)
+
+
+def jittered_backoff(attempt: int, base: float = 1.0, cap: float = 60.0) -> float:
+    """指数バックオフにジッターを加えた待機秒数を計算"""
+    return min(cap, base * (2 ** attempt)) * random.uniform(0.5, 1.5)
+
+
+class AdaptiveLimiter:
+    """AIMD方式で同時実行数とリクエスト間隔を自動調整するリミッタ
+
+    成功時は同時実行数を加算的に増やし間隔を縮め、スロットリング時は
+    同時実行数を半減・間隔を倍にする。一般的な失敗（タイムアウト等）では
+    同時実行数のみを減らす。
+    """
+
+    def __init__(self, initial_concurrency: float = 2, max_concurrency: int = 8,
+                 min_interval: float = 0.1, max_interval: float = 10.0, initial_interval: float = 0.3):
+        self.concurrency = float(initial_concurrency)
+        self.max_concurrency = max_concurrency
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = initial_interval
+        self._in_flight = 0
+        self._next_start = 0.0
+        self._floors: List[float] = []
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def slot(self):
+        """同時実行数とリクエスト間隔の制限内で実行枠を確保"""
+        with self._cond:
+            while self._in_flight >= max(1, int(self.concurrency)):
+                self._cond.wait()
+            self._in_flight += 1
+            now = time.monotonic()
+            wait = self._next_start - now
+            self._next_start = max(now, self._next_start) + max([self.interval] + self._floors)
+
+        try:
+            if wait > 0:
+                time.sleep(wait)
+            yield
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self._cond.notify_all()
+
+    @contextmanager
+    def interval_floor(self, interval: float):
+        """ブロック内でのみリクエスト間隔の下限を設定（自動調整された間隔は変更しない）"""
+        with self._cond:
+            self._floors.append(interval)
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._floors.remove(interval)
+
+    def on_success(self):
+        """成功時: 加算的に増加"""
+        with self._cond:
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1.0 / max(1.0, self.concurrency))
+            self.interval = max(self.min_interval, self.interval * 0.9)
+            self._cond.notify_all()
+
+    def on_throttle(self):
+        """スロットリング時: 乗算的に減少"""
+        with self._cond:
+            self.concurrency = max(1.0, self.concurrency / 2)
+            self.interval = min(self.max_interval, self.interval * 2)
+        logger.warning("レート制限を検知しました。同時実行数 %.1f / 間隔 %.2f秒に調整", self.concurrency, self.interval)
+
+    def on_failure(self):
+        """失敗時: 同時実行数のみ減少"""
+        with self._cond:
+            self.concurrency = max(1.0, self.concurrency * 0.75)
+
+
+class CircuitBreaker:
+    """連続失敗時に上流への呼び出しを停止するサーキットブレーカー
+
+    failure_threshold 回連続で失敗するとオープンになり、ジッター付きの
+    待機時間が経過するまで呼び出しを拒否する。待機後は1件だけ試行し
+    （ハーフオープン）、成功すればクローズ、失敗すれば待機時間を延ばして再オープンする。
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, max_reset_timeout: float = 600.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._open_count = 0
+        self._retry_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """呼び出しを許可するか判定"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() >= self._retry_at:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def is_available(self) -> bool:
+        """呼び出しが許可される見込みがあるか（状態を変えずに判定。振り分け先の選択用）"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                return time.monotonic() >= self._retry_at
+            return not self._trial_in_flight
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("サーキットブレーカーをクローズしました")
+            self.state = self.CLOSED
+            self._failures = 0
+            self._open_count = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.OPEN:
+                return
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._open_count += 1
+                delay = jittered_backoff(self._open_count - 1, base=self.reset_timeout, cap=self.max_reset_timeout)
+                self._retry_at = time.monotonic() + delay
+                self.state = self.OPEN
+                self._trial_in_flight = False
+                logger.warning("サーキットブレーカーをオープンしました（%.0f秒後に再試行）", delay)
@@ -0,0 +1,289 @@
+import logging
+import os
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+import pytz
+from libs.market_calendar import MARKET_HOURS
+
+logger = logging.getLogger(__name__)
+
+TRADING_DAYS = 252
+
+# ベータの比較対象（TOPIXはETF 1306で代用）
+BENCHMARKS = {
+    'TOPIX': ('1306', 'JP'),
+    'S&P500': ('^GSPC', 'US'),
+}
+
+# 米国株を円建てに換算する為替レート
+FX_SYMBOL = ('USDJPY=X', 'FX')
+
+
+def _key(code: str, market: str) -> str:
+    return f"{market}:{code}"
+
+
+class RollingCovariance:
+    """直近 window 本のリターンの共分散をスライディングウィンドウで更新するクラス
+
+    合計ベクトルと外積の合計を保持し、新しいバーを加えて最も古いバーを除くことで
+    1本あたり O(N^2) で更新する（全履歴からの再計算は不要）。
+    誤差の蓄積を避けるため、window 本ごとにバッファから合計を再計算する。
+    欠損値（上場前など）はリターン0として扱う。
+    """
+
+    def __init__(self, size: int, window: int = TRADING_DAYS):
+        self.window = window
+        self.buffer = np.zeros((window, size))
+        self.count = 0
+        self.pos = 0
+        self.sum = np.zeros(size)
+        self.outer = np.zeros((size, size))
+        self._updates_since_rebuild = 0
+
+    @classmethod
+    def from_returns(cls, returns: np.ndarray, window: int = TRADING_DAYS) -> 'RollingCovariance':
+        """リターン行列（行: 日付, 列: 銘柄）の直近 window 本から作成"""
+        cov = cls(returns.shape[1], window)
+        recent = np.nan_to_num(returns[-window:])
+        cov.count = len(recent)
+        cov.buffer[:cov.count] = recent
+        cov.pos = cov.count % window
+        cov._rebuild()
+        return cov
+
+    def _rebuild(self):
+        data = self.buffer[:self.count]
+        self.sum = data.sum(axis=0)
+        self.outer = data.T @ data
+        self._updates_since_rebuild = 0
+
+    def update(self, returns: np.ndarray):
+        """新しいバーのリターンを追加（ウィンドウが満杯なら最も古いバーを除く）"""
+        x = np.nan_to_num(returns)
+        if self.count == self.window:
+            old = self.buffer[self.pos]
+            self.sum -= old
+            self.outer -= np.outer(old, old)
+        else:
+            self.count += 1
+        self.buffer[self.pos] = x
+        self.sum += x
+        self.outer += np.outer(x, x)
+        self.pos = (self.pos + 1) % self.window
+
+        self._updates_since_rebuild += 1
+        if self._updates_since_rebuild >= self.window:
+            self._rebuild()
+
+    def observations(self) -> np.ndarray:
+        """ウィンドウ内のリターンを古い順に取得"""
+        if self.count < self.window:
+            return self.buffer[:self.count]
+        return np.roll(self.buffer, -self.pos, axis=0)
+
+    def covariance(self) -> np.ndarray:
+        """標本共分散行列"""
+        n = self.count
+        if n < 2:
+            return np.zeros_like(self.outer)
+        mean = self.sum / n
+        return (self.outer - n * np.outer(mean, mean)) / (n - 1)
+
+
+class PortfolioRiskModel:
+    """保有銘柄・ベンチマークの日次リターンの共分散を保持し、リスク指標を計算するクラス
+
+    価格は円建て（米国株は USDJPY で換算）で扱う。状態は data/risk_state.npz に保存し、
+    次回は保存時点より新しい日次バーのみを追加する。
+    """
+
+    def __init__(self, symbols: List[str], window: int = TRADING_DAYS):
+        self.symbols = list(symbols)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.cov = RollingCovariance(len(self.symbols), window)
+        self.last_prices = np.full(len(self.symbols), np.nan)
+        self.last_date: Optional[date] = None
+
+    @classmethod
+    def from_prices(cls, prices: pd.DataFrame, window: int = TRADING_DAYS) -> 'PortfolioRiskModel':
+        """日次価格の表（行: 日付, 列: 銘柄キー）から作成"""
+        model = cls(list(prices.columns), window)
+        model._load_prices(prices)
+        return model
+
+    def _load_prices(self, prices: pd.DataFrame):
+        # 休場日（他市場のみ営業）は前日の値で埋め、翌営業日のリターンを休場前の終値と比べる
+        returns = prices.ffill().pct_change(fill_method=None).to_numpy()[1:]
+        self.cov = RollingCovariance.from_returns(returns, self.cov.window)
+        self.last_prices = prices.ffill().to_numpy()[-1]
+        self.last_date = prices.index[-1].date()
+
+    def update(self, day: date, prices: np.ndarray):
+        """1日分の価格でリターンを計算して共分散を更新（保存済みの日付以前は無視）"""
+        if self.last_date is not None and day <= self.last_date:
+            return
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = prices / self.last_prices - 1
+        self.cov.update(returns)
+        self.last_prices = np.where(np.isnan(prices), self.last_prices, prices)
+        self.last_date = day
+
+    def update_from_prices(self, prices: pd.DataFrame) -> int:
+        """日次価格の表のうち保存済みの日付より新しいバーを順に追加し、追加した本数を返す"""
+        prices = prices.reindex(columns=self.symbols)
+        added = 0
+        for day, row in zip(prices.index, prices.to_numpy()):
+            if self.last_date is None or day.date() > self.last_date:
+                self.update(day.date(), row)
+                added += 1
+        return added
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, symbols=np.array(self.symbols), buffer=self.cov.buffer,
+                 state=np.array([self.cov.count, self.cov.pos]), last_prices=self.last_prices,
+                 last_date=np.array(str(self.last_date)))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional['PortfolioRiskModel']:
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                buffer = data['buffer']
+                model = cls(data['symbols'].tolist(), len(buffer))
+                model.cov.buffer[:] = buffer
+                model.cov.count, model.cov.pos = (int(value) for value in data['state'])
+                model.cov._rebuild()
+                model.last_prices = data['last_prices']
+                model.last_date = date.fromisoformat(str(data['last_date']))
+            return model
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("リスクモデルの読み込みエラー: %s", e)
+            return None
+
+    def metrics(self, values: Dict[str, float], benchmarks: Dict[str, str] = None,
+                var_level: float = 0.95) -> Dict:
+        """保有評価額（銘柄キー -> 円）からリスク指標を計算
+
+        戻り値: volatility（年率％）, var（1日のヒストリカルVaR、円）, var_pct,
+        betas（ベンチマーク名 -> ベータ）, hhi, effective_count, max_weight（(銘柄キー, ％)）
+        """
+        weights = np.zeros(len(self.symbols))
+        for symbol, value in values.items():
+            if symbol in self.index:
+                weights[self.index[symbol]] = value
+        total = weights.sum()
+        if total <= 0 or self.cov.count < 2:
+            return {}
+        weights /= total
+
+        cov = self.cov.covariance()
+        cov_with_portfolio = cov @ weights
+        variance = float(weights @ cov_with_portfolio)
+        portfolio_returns = self.cov.observations() @ weights
+        var_pct = max(0.0, -float(np.percentile(portfolio_returns, (1 - var_level) * 100)))
+
+        betas = {}
+        for label, symbol in (benchmarks or {}).items():
+            i = self.index.get(symbol)
+            if i is not None and cov[i, i] > 0:
+                betas[label] = float(cov_with_portfolio[i] / cov[i, i])
+
+        hhi = float((weights ** 2).sum())
+        top = int(weights.argmax())
+        return {
+            'volatility': float(np.sqrt(max(variance, 0.0) * TRADING_DAYS) * 100),
+            'var': var_pct * total,
+            'var_pct': var_pct * 100,
+            'var_level': var_level,
+            'betas': betas,
+            'hhi': hhi,
+            'effective_count': 1 / hhi,
+            'max_weight': (self.symbols[top], float(weights[top] * 100)),
+            'observations': self.cov.count,
+        }
+
+
+def build_price_table(history: pd.DataFrame, symbols: List[Tuple[str, str]]) -> pd.DataFrame:
+    """一括取得した履歴データから円建ての終値の表（列: 銘柄キー）を作成"""
+    closes = history['終値']
+    fx = closes[FX_SYMBOL[0]].ffill() if FX_SYMBOL[0] in closes.columns else None
+
+    table = {}
+    for code, market in symbols:
+        if code not in closes.columns:
+            continue
+        series = closes[code]
+        # ベンチマーク（指数）は現地通貨のまま、米国株の保有銘柄は円換算
+        if market == 'US' and fx is not None and (code, market) not in BENCHMARKS.values():
+            series = series * fx
+        table[_key(code, market)] = series
+    return pd.DataFrame(table).dropna(how='all')
+
+
+def settled_prices(prices: pd.DataFrame, now: Optional[datetime] = None) -> pd.DataFrame:
+    """全市場の終値が確定している日までのバーに絞り込む
+
+    市場ごとに「取引終了済みの最新日」と「データのある最新日」の早い方を求め、その最小値までを返す。
+    一方の市場だけが引けた時点のバーを追加すると、他方の市場のリターンが0として確定し
+    （後から修正されない）、市場間の相関・ベータがずれるため。
+    """
+    now = now or datetime.now(pytz.utc)
+    cutoff = None
+    for market, hours in MARKET_HOURS.items():
+        columns = [column for column in prices.columns if column.startswith(f"{market}:")]
+        if not columns:
+            continue
+        local = now.astimezone(pytz.timezone(hours['tz']))
+        closed = local.date() if local.time() >= hours['close'] else local.date() - timedelta(days=1)
+        available = prices[columns].dropna(how='all').index
+        if len(available):
+            closed = min(closed, available[-1].date())
+        cutoff = closed if cutoff is None else min(cutoff, closed)
+    if cutoff is None:
+        return prices
+    return prices[prices.index.date <= cutoff]
+
+
+def refresh_risk_model(path: str, holdings: List[Tuple[str, str]],
+                       fetch_history: Callable[[List[Tuple[str, str]], str], Optional[pd.DataFrame]],
+                       window: int = TRADING_DAYS) -> Optional[PortfolioRiskModel]:
+    """保存済みのリスクモデルに新しい日次バーを追加（保有銘柄が変わった場合は作り直す）
+
+    fetch_history は StockPriceFetcher.get_bulk_historical_data と同じ引数（銘柄リスト, 期間, fill_gaps）をとる。
+    他市場の営業日を前日の値で埋めないよう fill_gaps=False で取得し、全市場の終値が確定した日のバーのみ追加する。
+    """
+    symbols = list(dict.fromkeys(list(holdings) + list(BENCHMARKS.values())))
+    fetch_symbols = symbols + [FX_SYMBOL]
+    keys = [_key(code, market) for code, market in symbols]
+
+    model = PortfolioRiskModel.load(path)
+    if model is not None and model.symbols == keys and model.last_date is not None:
+        age = (date.today() - model.last_date).days
+        if age <= 20:
+            history = fetch_history(fetch_symbols, '1mo', fill_gaps=False)
+            if history is None:
+                return model
+            added = model.update_from_prices(settled_prices(build_price_table(history, symbols)))
+            logger.info("リスクモデルを更新しました: %d本追加", added)
+            model.save(path)
+            return model
+
+    history = fetch_history(fetch_symbols, '2y', fill_gaps=False)
+    if history is None:
+        # 保有銘柄が変わった場合、古いモデルは使えない
+        return model if model is not None and model.symbols == keys else None
+    prices = settled_prices(build_price_table(history, symbols)).reindex(columns=keys)
+    if len(prices) < 2:
+        logger.warning("リスクモデルを作成できる履歴データがありません")
+        return None
+    model = PortfolioRiskModel.from_prices(prices, window)
+    logger.info("リスクモデルを作成しました: %d銘柄 / %d本", len(keys), model.cov.count)
+    model.save(path)
+    return model
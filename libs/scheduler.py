@@ -0,0 +1,128 @@
+import logging
+import threading
+from datetime import datetime, time, timedelta
+from typing import Callable, List, Optional
+import pytz
+from libs.market_calendar import MarketCalendar
+
+logger = logging.getLogger(__name__)
+
+
+class ScheduledJob:
+    """スケジューラに登録されたジョブ"""
+
+    def __init__(self, name: str, market: str, callback: Callable[[], object],
+                 at: Optional[time] = None, interval_minutes: Optional[int] = None):
+        self.name = name
+        self.market = market
+        self.callback = callback
+        self.at = at
+        self.interval_minutes = interval_minutes
+        self.next_run = None
+
+
+class MarketScheduler:
+    """東証・NYSEの営業日に合わせてジョブを実行するスケジューラ
+
+    日次ジョブは指定時刻（スケジューラのタイムゾーン）に、その時点の市場ローカル日付が
+    営業日の場合のみ実行する。例えば06:00 JSTの米国株ジョブはNY時間の前日が営業日なら実行される。
+    間隔ジョブは対象市場の取引時間中のみ実行する。
+    """
+
+    def __init__(self, tz: str = "Asia/Tokyo"):
+        self.tz = pytz.timezone(tz)
+        self.jobs: List[ScheduledJob] = []
+        self.calendars = {}
+        self._stop_event = threading.Event()
+
+    def _get_calendar(self, market: str) -> MarketCalendar:
+        if market not in self.calendars:
+            self.calendars[market] = MarketCalendar(market)
+        return self.calendars[market]
+
+    def add_daily_job(self, name: str, at: time, market: str, callback: Callable[[], object]) -> ScheduledJob:
+        """営業日の指定時刻に実行するジョブを追加"""
+        job = ScheduledJob(name, market, callback, at=at)
+        self._get_calendar(market)
+        self.jobs.append(job)
+        return job
+
+    def add_interval_job(self, name: str, interval_minutes: int, market: str,
+                         callback: Callable[[], object]) -> ScheduledJob:
+        """取引時間中に一定間隔で実行するジョブを追加"""
+        if interval_minutes <= 0:
+            raise ValueError("interval_minutesは1以上を指定してください")
+        job = ScheduledJob(name, market, callback, interval_minutes=interval_minutes)
+        self._get_calendar(market)
+        self.jobs.append(job)
+        return job
+
+    def _compute_next_run(self, job: ScheduledJob, now: datetime) -> datetime:
+        """ジョブの次回実行時刻を計算"""
+        calendar = self._get_calendar(job.market)
+
+        if job.interval_minutes:
+            candidate = now + timedelta(minutes=job.interval_minutes)
+            return calendar.next_open(candidate)
+
+        local_now = now.astimezone(self.tz)
+        day = local_now.date()
+        for _ in range(30):
+            candidate = self.tz.localize(datetime.combine(day, job.at))
+            if candidate > now and calendar.is_trading_day(calendar.local_date(candidate)):
+                return candidate
+            day += timedelta(days=1)
+
+        raise RuntimeError(f"30日以内に実行可能な日が見つかりません: {job.name}")
+
+    def _run_job(self, job: ScheduledJob):
+        logger.info("⏱️ ジョブ実行: %s", job.name, extra={'job': job.name, 'market': job.market})
+        try:
+            job.callback()
+        except Exception:
+            logger.exception("ジョブ実行エラー: %s", job.name, extra={'job': job.name, 'market': job.market})
+
+    def run_pending(self, now: Optional[datetime] = None) -> int:
+        """実行時刻に達したジョブを実行し、実行数を返す"""
+        now = now or datetime.now(pytz.utc)
+        executed = 0
+
+        for job in self.jobs:
+            if job.next_run is None:
+                # 間隔ジョブは取引時間中なら即時に初回実行する
+                if job.interval_minutes:
+                    job.next_run = self._get_calendar(job.market).next_open(now)
+                else:
+                    job.next_run = self._compute_next_run(job, now)
+            if job.next_run <= now:
+                self._run_job(job)
+                job.next_run = self._compute_next_run(job, datetime.now(pytz.utc))
+                executed += 1
+
+        return executed
+
+    def seconds_until_next(self, now: Optional[datetime] = None) -> Optional[float]:
+        """次のジョブまでの待機秒数を取得"""
+        pending = [job.next_run for job in self.jobs if job.next_run is not None]
+        if not pending:
+            return None
+        now = now or datetime.now(pytz.utc)
+        return max(0.0, (min(pending) - now).total_seconds())
+
+    def run_forever(self, max_sleep: float = 300.0):
+        """stop()が呼ばれるまでジョブを実行し続ける"""
+        logger.info("🕒 スケジューラを開始しました (%d件のジョブ)", len(self.jobs))
+        while not self._stop_event.is_set():
+            self.run_pending()
+            for job in self.jobs:
+                logger.debug("次回実行: %s -> %s", job.name, job.next_run.astimezone(self.tz).isoformat())
+
+            wait = self.seconds_until_next()
+            # 時計のずれ・スリープ復帰に備えて待機時間に上限を設ける
+            self._stop_event.wait(min(wait if wait is not None else max_sleep, max_sleep))
+
+        logger.info("🛑 スケジューラを停止しました")
+
+    def stop(self):
+        """スケジューラを停止"""
+        self._stop_event.set()
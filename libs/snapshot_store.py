@@ -0,0 +1,85 @@
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotStore:
+    """最後に送信したレポートの株価・評価額を保存するクラス"""
+
+    def __init__(self, directory: str = 'data/snapshots'):
+        self.directory = directory
+
+    def _get_path(self, market: str) -> str:
+        return os.path.join(self.directory, f"{market.lower()}.json")
+
+    def load(self, market: str) -> Dict[str, List[float]]:
+        """スナップショットを読み込み（銘柄 -> [株価, 評価額]）"""
+        path = self._get_path(market)
+        if not os.path.exists(path):
+            return {}
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('holdings', {})
+        except (OSError, ValueError) as e:
+            logger.warning("スナップショットの読み込みエラー (%s): %s", market, e)
+            return {}
+
+    def save(self, market: str, holdings: Dict[str, List[float]]):
+        """スナップショットを保存（一時ファイル経由で置き換え）"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._get_path(market)
+        tmp_path = f"{path}.tmp"
+
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'updated_at': datetime.now().isoformat(), 'holdings': holdings},
+                      f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def to_holdings(stocks: List[Dict], key: str) -> Dict[str, List[float]]:
+        """レポート用の銘柄リストをスナップショット形式に変換"""
+        return {
+            str(stock[key]): [float(stock['current_price']), float(stock['current_price'] * stock['quantity'])]
+            for stock in stocks
+        }
+
+    def diff(self, market: str, stocks: List[Dict], key: str, threshold_pct: float) -> List[Dict]:
+        """前回送信時から閾値以上変動した銘柄（および新規銘柄）のみを返す
+
+        戻り値の各銘柄には前回比（snapshot_change_pct、新規銘柄はNone）を追加する。
+        """
+        previous = self.load(market)
+        changed = []
+
+        for stock in stocks:
+            snapshot = previous.get(str(stock[key]))
+            if snapshot is None:
+                changed.append({**stock, 'snapshot_change_pct': None})
+                continue
+
+            previous_price = snapshot[0]
+            if not previous_price:
+                continue
+
+            change_pct = (stock['current_price'] / previous_price - 1) * 100
+            if abs(change_pct) >= threshold_pct:
+                changed.append({**stock, 'snapshot_change_pct': change_pct})
+
+        return changed
+
+    def update(self, market: str, stocks: List[Dict], key: str, held_symbols: List[str] = None):
+        """送信した銘柄のみスナップショットを更新（未送信銘柄は前回値を維持）
+
+        held_symbols を指定した場合、保有していない銘柄はスナップショットから削除する。
+        """
+        holdings = self.load(market)
+        if held_symbols is not None:
+            held = {str(symbol) for symbol in held_symbols}
+            holdings = {symbol: values for symbol, values in holdings.items() if symbol in held}
+        holdings.update(self.to_holdings(stocks, key))
+        self.save(market, holdings)
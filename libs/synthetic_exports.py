@@ -0,0 +1,195 @@
+import logging
+import os
+import random
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+JP_STOCK_SECTIONS = [
+    '株式（現物/一般預り）',
+    '株式（現物/特定預り）',
+    '株式（現物/NISA預り（成長投資枠））',
+    '株式（現物/旧NISA預り）',
+    '株式（信用/特定預り）',
+]
+
+JP_FUND_SECTIONS = [
+    '投資信託（金額/特定預り）',
+    '投資信託（金額/NISA預り（つみたて投資枠））',
+    '投資信託（金額/NISA預り（成長投資枠））',
+    '投資信託（口数/一般預り）',
+]
+
+US_SECTIONS = [
+    '米国株式（特定預り）',
+    '米国株式（一般預り）',
+    '米国株式（NISA預り（成長投資枠））',
+]
+
+JP_HEADER = ['銘柄（コード）', '買付日', '数量', '取得単価', '現在値', '前日比', '前日比（％）', '損益', '損益（％）', '評価額']
+FUND_HEADER = ['ファンド名'] + JP_HEADER[1:]
+US_HEADER = ['銘柄シンボル', '銘柄名', '数量', '取得単価（ドル）']
+
+_JP_NAME_PARTS = ['日本', '東京', '大和', '三菱', '住友', '中央', '北海道', '九州', 'アジア', 'グローバル']
+_JP_NAME_SUFFIXES = ['製作所', '電機', '化学', '商事', '建設', '銀行', '不動産', '薬品', '食品', 'ホールディングス']
+_FUND_NAMES = ['eMAXIS Slim 全世界株式（オール・カントリー）', 'eMAXIS Slim 米国株式（S&P500）',
+               'ニッセイ外国株式インデックスファンド', 'SBI・V・S&P500インデックス・ファンド',
+               '楽天・全米株式インデックス・ファンド', 'たわらノーロード 先進国株式']
+_US_NAMES = ['Apple', 'Microsoft', 'Alphabet Class A', 'Amazon.com', 'NVIDIA', 'Tesla', 'Visa Class A']
+
+# 解析で除外される行・表記揺れ（件数の期待値には含めない）
+_JP_DESCRIPTION_LINE = '"※ 評価額は前営業日の終値で計算しています"'
+
+
+def _sections(names: List[str], count: int) -> List[str]:
+    """セクション名を count 個作成（定義済みの名前が足りない場合は番号付きの口座を追加）"""
+    sections = names[:count]
+    for i in range(len(sections), count):
+        base = names[i % len(names)]
+        sections.append(f"{base[:-1]}{i // len(names) + 1}）")
+    return sections
+
+
+def _split_rows(rows: int, parts: int) -> List[int]:
+    base, extra = divmod(rows, parts)
+    return [base + (1 if i < extra else 0) for i in range(parts)]
+
+
+def _quote(fields: List[str]) -> str:
+    return ','.join('"' + field.replace('"', '""') + '"' for field in fields)
+
+
+def _number(value: float, decimals: int = 0, sign: bool = False) -> str:
+    return f"{value:+,.{decimals}f}" if sign else f"{value:,.{decimals}f}"
+
+
+def _jp_name(rng: random.Random, edge_cases: bool) -> str:
+    name = rng.choice(_JP_NAME_PARTS) + rng.choice(_JP_NAME_SUFFIXES)
+    if edge_cases:
+        roll = rng.random()
+        if roll < 0.05:
+            name += '，ｸﾞﾙｰﾌﾟ'                # 全角カンマ・半角カナ
+        elif roll < 0.10:
+            name = f'{name},"新"'            # 引用符内のカンマとエスケープされた引用符
+    return name
+
+
+def _jp_values(rng: random.Random, fund: bool) -> List[str]:
+    quantity = rng.choice([1000, 5000, 10000, 100000, 250000]) if fund else rng.choice([1, 10, 100, 200, 500, 1000])
+    cost = rng.uniform(5000, 30000) if fund else rng.uniform(100, 20000)
+    price = cost * rng.uniform(0.6, 1.8)
+    change = price * rng.gauss(0, 0.015)
+    unit = 10000 if fund else 1
+    value = price * quantity / unit
+    profit = (price - cost) * quantity / unit
+    decimals = 0 if fund or price >= 1000 else 1
+    return [
+        _number(quantity),
+        _number(cost, decimals),
+        _number(price, decimals),
+        _number(change, decimals, sign=True),
+        _number(change / (price - change) * 100, 2, sign=True),
+        _number(profit, 0, sign=True),
+        _number((price / cost - 1) * 100, 2, sign=True),
+        _number(value),
+    ]
+
+
+def generate_jp_export(path: str, rows: int = 1000, sections: int = 4, fund_ratio: float = 0.2,
+                       encoding: str = 'cp932', edge_cases: bool = True, seed: int = 0) -> Dict[str, int]:
+    """SBI証券の保有株CSV（ポートフォリオ一覧）と同じ形式の合成データを作成
+
+    株式と投資信託のセクションに rows 行を振り分け、合計行・説明行・空行・引用符やカンマを
+    含む銘柄名（edge_cases=True の場合）を混ぜる。
+    戻り値は解析後に得られるはずの行数 {'stock_rows', 'fund_rows', 'sections'}。
+    """
+    rng = random.Random(seed)
+    fund_rows = int(rows * fund_ratio) if sections > 1 else 0
+    stock_sections = max(1, sections - (1 if fund_rows else 0) - sections // 4)
+    fund_sections = sections - stock_sections if fund_rows else 0
+
+    lines = ['"ポートフォリオ一覧"', _quote(['評価額合計', _number(rng.uniform(1e6, 1e9))]), '']
+    for section, count in zip(_sections(JP_STOCK_SECTIONS, stock_sections),
+                              _split_rows(rows - fund_rows, stock_sections)):
+        lines.append(_quote([section]))
+        lines.append(_quote(JP_HEADER))
+        for _ in range(count):
+            code = rng.randint(1301, 9997)
+            purchased = f"{rng.randint(2005, 2025)}/{rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}"
+            lines.append(_quote([f"{code} {_jp_name(rng, edge_cases)}", purchased] + _jp_values(rng, fund=False)))
+        lines.append(_quote(['合計', '', '', '', '', '', '', '', '', _number(rng.uniform(1e5, 1e8))]))
+        if edge_cases and rng.random() < 0.5:
+            lines.append(_JP_DESCRIPTION_LINE)
+        lines.append('')
+
+    for section, count in zip(_sections(JP_FUND_SECTIONS, fund_sections), _split_rows(fund_rows, max(1, fund_sections))):
+        lines.append(_quote([section]))
+        lines.append(_quote(FUND_HEADER))
+        for i in range(count):
+            name = f"{rng.choice(_FUND_NAMES)} #{i}"
+            lines.append(_quote([name, '--'] + _jp_values(rng, fund=True)))
+        lines.append('')
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding=encoding, newline='\r\n') as f:
+        f.write('\n'.join(lines) + '\n')
+    return {'stock_rows': rows - fund_rows, 'fund_rows': fund_rows, 'sections': stock_sections + fund_sections}
+
+
+def generate_us_export(path: str, rows: int = 1000, sections: int = 2, encoding: str = 'utf-8',
+                       edge_cases: bool = True, seed: int = 0) -> Dict[str, int]:
+    """米国株式CSVと同じ形式の合成データを作成（戻り値は解析後に得られるはずの行数）"""
+    rng = random.Random(seed)
+    letters = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+    lines = []
+    for section, count in zip(_sections(US_SECTIONS, sections), _split_rows(rows, sections)):
+        lines.append(section)
+        lines.append(','.join(US_HEADER))
+        for _ in range(count):
+            symbol = ''.join(rng.choice(letters) for _ in range(rng.randint(1, 4)))
+            name = rng.choice(_US_NAMES)
+            if edge_cases:
+                roll = rng.random()
+                if roll < 0.05:
+                    symbol += '.B'                         # 種類株
+                elif roll < 0.10:
+                    name = f'"{name}, Inc."'               # カンマを含む銘柄名
+            lines.append(f"{symbol},{name},{rng.randint(1, 500)},{rng.uniform(5, 900):.2f}")
+        lines.append('')
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding=encoding, newline='\r\n') as f:
+        f.write('\n'.join(lines) + '\n')
+    return {'stock_rows': rows, 'sections': sections}
+
+
+def main():
+    """合成データを作成するコマンド"""
+    import argparse
+    from libs.log_config import setup_logging
+
+    parser = argparse.ArgumentParser(description='Generate synthetic SBI-format portfolio exports')
+    parser.add_argument('--output-dir', default='input/synthetic', help='Output directory (default: input/synthetic)')
+    parser.add_argument('--rows', type=int, default=20000, help='Rows per file (default: 20000)')
+    parser.add_argument('--sections', type=int, default=6, help='JP sections per file (default: 6)')
+    parser.add_argument('--files', type=int, default=1, help='Number of account files per market (default: 1)')
+    parser.add_argument('--encoding', choices=['cp932', 'utf-8'], default='cp932',
+                        help='Encoding of the JP export (default: cp932, as downloaded from SBI)')
+    parser.add_argument('--no-edge-cases', action='store_true', help='Omit quoting and half-width edge cases')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    setup_logging()
+    for i in range(args.files):
+        jp_path = os.path.join(args.output_dir, 'jp', f"account{i + 1}.csv")
+        us_path = os.path.join(args.output_dir, 'us', f"account{i + 1}.csv")
+        jp = generate_jp_export(jp_path, args.rows, args.sections, encoding=args.encoding,
+                                edge_cases=not args.no_edge_cases, seed=args.seed + i)
+        us = generate_us_export(us_path, args.rows, edge_cases=not args.no_edge_cases, seed=args.seed + i)
+        logger.info("作成しました: %s (株式 %d行 / 投信 %d行), %s (%d行)",
+                    jp_path, jp['stock_rows'], jp['fund_rows'], us_path, us['stock_rows'])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import heapq
+from typing import Callable, Dict, List
+
+
+def select_top_movers(stocks: List[Dict], k: int, value_fn: Callable[[Dict], float]) -> Dict:
+    """値上がり・値下がり・評価額の上位K銘柄をヒープで部分選択する
+
+    全件ソートは行わず、heapq.nlargest / nsmallest で O(N log K) で選択する。
+    選ばれなかった銘柄は件数・評価額・前日比の集計値にまとめる。
+    """
+    indexed = list(enumerate(stocks))
+    pct = lambda item: item[1].get('price_change_pct', 0)
+    value = lambda item: value_fn(item[1])
+
+    gainers = [item for item in heapq.nlargest(k, indexed, key=pct) if pct(item) > 0]
+    losers = [item for item in heapq.nsmallest(k, indexed, key=pct) if pct(item) < 0]
+    largest = heapq.nlargest(k, indexed, key=value)
+
+    selected = {i for i, _ in gainers} | {i for i, _ in losers} | {i for i, _ in largest}
+
+    # 全体と残り銘柄の集計（1パス）
+    total_value = 0.0
+    rest_count = 0
+    rest_value = 0.0
+    rest_change = 0.0
+    for i, stock in indexed:
+        stock_value = value_fn(stock)
+        total_value += stock_value
+        if i not in selected:
+            rest_count += 1
+            rest_value += stock_value
+            rest_change += _value_change(stock, stock_value)
+
+    rest_previous = rest_value - rest_change
+    return {
+        'gainers': [stock for _, stock in gainers],
+        'losers': [stock for _, stock in losers],
+        'largest': [(stock, value_fn(stock) / total_value * 100 if total_value else 0) for _, stock in largest],
+        'total_value': total_value,
+        'rest_count': rest_count,
+        'rest_value': rest_value,
+        'rest_change_pct': rest_change / rest_previous * 100 if rest_previous else 0,
+    }
+
+
+def _value_change(stock: Dict, stock_value: float) -> float:
+    """評価額ベースの前日比（変化額）を計算"""
+    current_price = stock.get('current_price', 0)
+    if not current_price:
+        return 0.0
+    return stock_value * stock.get('price_change', 0) / current_price
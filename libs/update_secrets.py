@@ -1,9 +1,10 @@
 #!/usr/bin/env python3
 """
 CSV Secrets Updater for GitHub Actions
-Encodes CSV files to Base64 and updates GitHub repository secrets.
+Encodes CSV files (or the pre-parsed portfolio artifact) to Base64 and updates GitHub repository secrets.
 """
 
+import argparse
 import os
 import base64
 import subprocess
@@ -74,6 +75,11 @@ def check_gh_auth():
         return False
 
 def main():
+    parser = argparse.ArgumentParser(description='Update GitHub Actions secrets with portfolio data')
+    parser.add_argument('--artifact', action='store_true',
+                        help='Upload input/portfolio.skpf (created by stock_notifier.py --compile-artifact) instead of the raw CSVs')
+    args = parser.parse_args()
+    
     print("🔐 CSV Secrets Updater for GitHub Actions")
     print("=" * 50)
     
@@ -91,10 +97,16 @@ def main():
         sys.exit(1)
     
     # CSVファイルの処理
-    csv_files = {
-        "jp_data.csv": "JP_DATA_CSV_BASE64",
-        "us_data.csv": "US_DATA_CSV_BASE64"
-    }
+    if args.artifact:
+        # 解析済みのアーティファクトのみを登録（Actions側でのCSV解析が不要になる）
+        csv_files = {
+            "portfolio.skpf": "PORTFOLIO_ARTIFACT_BASE64"
+        }
+    else:
+        csv_files = {
+            "jp_data.csv": "JP_DATA_CSV_BASE64",
+            "us_data.csv": "US_DATA_CSV_BASE64"
+        }
     
     success_count = 0
     
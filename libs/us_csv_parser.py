@@ -1,18 +1,25 @@
+import csv
+import logging
+import numpy as np
 import pandas as pd
 from typing import Dict, List
+from libs.csv_encoding import read_export_lines
+from libs.lean_dtypes import categorize_text_columns, downcast_numeric, memory_per_row
+
+logger = logging.getLogger(__name__)
 
 
 class USCSVParser:
-    """米国株式CSVを解析するクラス"""
+    """米国株式CSVを解析するクラス（lean=True でカテゴリ型・縮小した数値型を使用）"""
     
-    def __init__(self, csv_path: str):
+    def __init__(self, csv_path: str, lean: bool = False):
         self.csv_path = csv_path
+        self.lean = lean
         
     def parse_csv(self) -> Dict[str, pd.DataFrame]:
         """CSVファイルを解析し、セクション別にDataFrameを返す"""
         try:
-            with open(self.csv_path, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
+            lines = read_export_lines(self.csv_path)
             
             sections = self._split_sections(lines)
             
@@ -25,7 +32,7 @@ class USCSVParser:
             return parsed_sections
             
         except Exception as e:
-            print(f"米国株CSV解析エラー: {e}")
+            logger.error("米国株CSV解析エラー: %s", e)
             return {}
     
     def _split_sections(self, lines: List[str]) -> Dict[str, List[str]]:
@@ -71,12 +78,12 @@ class USCSVParser:
         
         try:
             # ヘッダーを解析
-            headers = [col.strip() for col in header_line.split(',')]
+            headers = [col.strip() for col in next(csv.reader([header_line]))]
             
-            # データ行を解析
+            # データ行を解析（銘柄名のカンマはダブルクォートで囲まれている）
             parsed_data = []
-            for line in data_lines:
-                fields = [field.strip() for field in line.split(',')]
+            for fields in csv.reader(data_lines):
+                fields = [field.strip() for field in fields]
                 if len(fields) == len(headers):
                     parsed_data.append(fields)
             
@@ -92,7 +99,7 @@ class USCSVParser:
             return df
             
         except Exception as e:
-            print(f"米国株セクション解析エラー: {e}")
+            logger.error("米国株セクション解析エラー: %s", e)
             return None
     
     def _convert_numeric_columns(self, df: pd.DataFrame) -> pd.DataFrame:
@@ -102,25 +109,30 @@ class USCSVParser:
         for col in df.columns:
             if any(keyword in col for keyword in numeric_columns):
                 df[col] = pd.to_numeric(df[col], errors='coerce')
+                if self.lean:
+                    df[col] = downcast_numeric(df[col], col)
         
         return df
     
     def get_us_stock_holdings(self) -> pd.DataFrame:
         """米国株保有情報のみを統合して返す"""
         all_sections = self.parse_csv()
-        stock_data = []
-        
-        for section_name, df in all_sections.items():
-            if '米国株式' in section_name:
-                # セクション名を追加
-                df_copy = df.copy()
-                df_copy['セクション'] = section_name
-                stock_data.append(df_copy)
+        names = [name for name in all_sections if '米国株式' in name]
+        if not names:
+            return pd.DataFrame()
         
-        if stock_data:
-            return pd.concat(stock_data, ignore_index=True)
+        # セクションごとのコピーは作らず、結合後にセクション列をまとめて設定
+        frames = [all_sections[name] for name in names]
+        df = pd.concat(frames, ignore_index=True)
+        codes = np.repeat(np.arange(len(names)), [len(frame) for frame in frames])
+        if self.lean:
+            df['セクション'] = pd.Categorical.from_codes(codes, categories=names)
+            categorize_text_columns(df)
         else:
-            return pd.DataFrame()
+            df['セクション'] = np.array(names, dtype=object)[codes]
+        
+        logger.debug("米国株式: %d行 / %.0fバイト/行", len(df), memory_per_row(df))
+        return df
 
 
 def main():
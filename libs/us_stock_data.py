@@ -1,15 +1,24 @@
 from typing import Dict, List
+import pandas as pd
 from libs.us_csv_parser import USCSVParser
 
 
 class USStockData:
     """米国株式データを管理するクラス"""
     
-    def __init__(self, csv_path: str):
-        self.parser = USCSVParser(csv_path)
+    def __init__(self, csv_path: str, lean: bool = False):
+        self.parser = USCSVParser(csv_path, lean=lean)
         self.stock_df = None
         self._load_data()
     
+    @classmethod
+    def from_dataframe(cls, stock_df: pd.DataFrame) -> 'USStockData':
+        """解析済みのDataFrameから作成（複数口座の統合ポートフォリオ用）"""
+        instance = cls.__new__(cls)
+        instance.parser = None
+        instance.stock_df = stock_df
+        return instance
+    
     def _load_data(self):
         """データを読み込み"""
         self.stock_df = self.parser.get_us_stock_holdings()
@@ -40,17 +49,27 @@ class USStockData:
         if self.stock_df.empty:
             return {}
         
+        details = {}
         for _, row in self.stock_df.iterrows():
             if row['銘柄シンボル'] == symbol:
-                return {
-                    'symbol': symbol,
-                    'quantity': row['数量'],
-                    'acquisition_price_usd': row['取得単価（ドル）'],
-                    'acquisition_cost_usd': row['数量'] * row['取得単価（ドル）'],
-                    'section': row['セクション']
-                }
+                cost = row['数量'] * row['取得単価（ドル）']
+                if not details:
+                    details = {
+                        'symbol': symbol,
+                        'quantity': row['数量'],
+                        'acquisition_price_usd': row['取得単価（ドル）'],
+                        'acquisition_cost_usd': cost,
+                        'section': row['セクション']
+                    }
+                    continue
+                
+                # 複数のセクション・口座で保有している場合は合算
+                details['quantity'] += row['数量']
+                details['acquisition_cost_usd'] += cost
+                if details['quantity']:
+                    details['acquisition_price_usd'] = details['acquisition_cost_usd'] / details['quantity']
         
-        return {}
+        return details
 
 
 def main():
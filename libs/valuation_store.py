@@ -0,0 +1,193 @@
+import glob
+import json
+import logging
+import os
+import threading
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# 1レコード = 1銘柄の1日分の評価（固定長・パディングなし）
+RECORD_DTYPE = np.dtype([
+    ('date', 'datetime64[D]'),
+    ('symbol', '<i4'),
+    ('price', '<f8'),
+    ('quantity', '<f8'),
+    ('value', '<f8'),
+])
+
+# 市場全体の評価額を記録する銘柄名
+TOTAL_SYMBOL = '__TOTAL__'
+
+# 基準日として採用する記録の最大の遅れ（休場日の連続を考慮）
+MAX_BASE_LAG = timedelta(days=10)
+
+# レポートに表示する期間（ラベル -> 基準日を求める関数）
+RETURN_PERIODS = {
+    '1W': lambda d: d - timedelta(days=7),
+    '1M': lambda d: (pd.Timestamp(d) - pd.DateOffset(months=1)).date(),
+    'YTD': lambda d: date(d.year - 1, 12, 31),
+}
+
+
+class ValuationStore:
+    """銘柄別・市場合計の日次評価額を月別パーティションに追記する時系列ストア
+
+    data/valuations/<market>/YYYY-MM.bin に固定長レコードを追記のみで書き込み、
+    読み込みは np.memmap で行う。銘柄名は symbols.json の辞書で整数IDに変換する。
+    同じ日に複数回記録した場合は最後の記録を採用する。
+    """
+
+    def __init__(self, directory: str = 'data/valuations'):
+        self.directory = directory
+        self._symbols: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+        self._appends = 0
+
+    @property
+    def version(self) -> int:
+        """このインスタンスで追記した回数（集計結果のキャッシュの無効化用）"""
+        return self._appends
+
+    def _market_dir(self, market: str) -> str:
+        return os.path.join(self.directory, market.lower())
+
+    def _partition_path(self, market: str, month: str) -> str:
+        return os.path.join(self._market_dir(market), f"{month}.bin")
+
+    def _get_symbols(self, market: str) -> List[str]:
+        """銘柄辞書（IDの順の銘柄名リスト）を取得"""
+        if market not in self._symbols:
+            path = os.path.join(self._market_dir(market), 'symbols.json')
+            symbols = []
+            if os.path.exists(path):
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        symbols = json.load(f)
+                except (OSError, ValueError) as e:
+                    logger.warning("評価額ストアの銘柄辞書の読み込みエラー (%s): %s", market, e)
+            self._symbols[market] = symbols
+        return self._symbols[market]
+
+    def _save_symbols(self, market: str):
+        path = os.path.join(self._market_dir(market), 'symbols.json')
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._symbols[market], f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def append(self, market: str, day: date, valuations: Dict[str, Tuple[float, float]]) -> int:
+        """銘柄別の (株価, 数量) と市場合計を追記し、書き込んだレコード数を返す"""
+        if not valuations:
+            return 0
+
+        with self._lock:
+            os.makedirs(self._market_dir(market), exist_ok=True)
+            symbols = self._get_symbols(market)
+            ids = {symbol: i for i, symbol in enumerate(symbols)}
+            names = list(valuations) + [TOTAL_SYMBOL]
+            new_symbols = [name for name in names if name not in ids]
+            if new_symbols:
+                # 辞書を先に保存する（レコードから未知のIDを参照しないように）
+                for name in new_symbols:
+                    ids[name] = len(symbols)
+                    symbols.append(name)
+                self._save_symbols(market)
+
+            records = np.zeros(len(names), dtype=RECORD_DTYPE)
+            records['date'] = np.datetime64(day, 'D')
+            records['symbol'] = [ids[name] for name in names]
+            values = np.array(list(valuations.values()), dtype='f8').reshape(-1, 2)
+            records['price'][:-1] = values[:, 0]
+            records['quantity'][:-1] = values[:, 1]
+            records['value'][:-1] = values[:, 0] * values[:, 1]
+            records['price'][-1] = np.nan
+            records['quantity'][-1] = np.nan
+            records['value'][-1] = records['value'][:-1].sum()
+
+            with open(self._partition_path(market, day.strftime('%Y-%m')), 'ab') as f:
+                f.write(records.tobytes())
+            self._appends += 1
+
+        return len(records)
+
+    def _read_partition(self, path: str) -> np.ndarray:
+        """パーティションをメモリマップで読み込み（書き込み途中の末尾レコードは無視）"""
+        count = os.path.getsize(path) // RECORD_DTYPE.itemsize
+        if count == 0:
+            return np.zeros(0, dtype=RECORD_DTYPE)
+        return np.memmap(path, dtype=RECORD_DTYPE, mode='r', shape=(count,))
+
+    def query(self, market: str, start: date, end: date, symbols: List[str] = None) -> pd.DataFrame:
+        """期間内のレコードを取得（列: date, symbol, price, quantity, value）
+
+        期間に重なる月のパーティションのみを読み込む。同じ日・銘柄の記録は最後のものを採用する。
+        """
+        first_month, last_month = start.strftime('%Y-%m'), end.strftime('%Y-%m')
+        paths = [path for path in sorted(glob.glob(os.path.join(self._market_dir(market), '*.bin')))
+                 if first_month <= os.path.splitext(os.path.basename(path))[0] <= last_month]
+
+        start64, end64 = np.datetime64(start, 'D'), np.datetime64(end, 'D')
+        names = self._get_symbols(market)
+        ids = None
+        if symbols is not None:
+            known = {symbol: i for i, symbol in enumerate(names)}
+            ids = np.array([known[symbol] for symbol in symbols if symbol in known], dtype='i4')
+
+        chunks = []
+        for path in paths:
+            records = self._read_partition(path)
+            mask = (records['date'] >= start64) & (records['date'] <= end64)
+            if ids is not None:
+                mask &= np.isin(records['symbol'], ids)
+            chunks.append(records[mask])
+
+        records = np.concatenate(chunks) if chunks else np.zeros(0, dtype=RECORD_DTYPE)
+        df = pd.DataFrame({
+            'date': records['date'],
+            'symbol': pd.Categorical.from_codes(records['symbol'], categories=names) if names else [],
+            'price': records['price'],
+            'quantity': records['quantity'],
+            'value': records['value'],
+        })
+        return df.drop_duplicates(subset=['date', 'symbol'], keep='last').reset_index(drop=True)
+
+    def get_total_series(self, market: str, start: date, end: date) -> pd.Series:
+        """市場合計の評価額の日次系列を取得"""
+        df = self.query(market, start, end, symbols=[TOTAL_SYMBOL])
+        return pd.Series(df['value'].to_numpy(), index=pd.DatetimeIndex(df['date']), name=market)
+
+    def get_returns(self, market: str, as_of: date) -> Dict[str, Optional[float]]:
+        """1W/1M/YTDの騰落率（％）を計算
+
+        入出金・売買の影響を除くため、最新日の保有数量を固定して基準日の株価と比較する。
+        基準日は各期間の開始日以前で記録のある最後の日とし、開始日の前 MAX_BASE_LAG 以内に
+        記録がない期間はNoneとする。
+        """
+        targets = {label: fn(as_of) for label, fn in RETURN_PERIODS.items()}
+        df = self.query(market, min(targets.values()) - MAX_BASE_LAG, as_of)
+        df = df[df['symbol'] != TOTAL_SYMBOL]
+        if df.empty:
+            return {label: None for label in targets}
+
+        dates = np.sort(df['date'].unique())
+        latest = df[df['date'] == dates[-1]].set_index('symbol')
+        returns = {}
+        for label, target in targets.items():
+            base_dates = dates[(dates <= np.datetime64(target, 'D'))
+                               & (dates >= np.datetime64(target - MAX_BASE_LAG, 'D'))]
+            if len(base_dates) == 0:
+                returns[label] = None
+                continue
+
+            base = df[df['date'] == base_dates[-1]].set_index('symbol')['price']
+            common = latest.index.intersection(base.index)
+            quantity = latest.loc[common, 'quantity']
+            base_value = (quantity * base.loc[common]).sum()
+            current_value = (quantity * latest.loc[common, 'price']).sum()
+            returns[label] = float((current_value / base_value - 1) * 100) if base_value else None
+
+        return returns
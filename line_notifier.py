@@ -1,7 +1,8 @@
+import logging
 import os
 from dotenv import load_dotenv
 from linebot import LineBotApi
-from linebot.models import TextSendMessage
+from linebot.models import ImageSendMessage, TextSendMessage
 from linebot.exceptions import LineBotApiError
 
 """
@@ -9,6 +10,8 @@ see : Line bot api documentation
 https://github.com/line/line-bot-sdk-python/blob/master/linebot/v3/messaging/docs/MessagingApi.md
 """
 
+logger = logging.getLogger(__name__)
+
 class LineNotifier:
     """LINE APIを使用した通知機能"""
     
@@ -19,7 +22,7 @@ class LineNotifier:
         self.user_id = os.getenv('LINE_USER_ID')
         
         if not self.token or not self.user_id:
-            print("警告: LINE_MESSAGING_API_TOKENまたはLINE_USER_IDが設定されていません。")
+            logger.warning("LINE_MESSAGING_API_TOKENまたはLINE_USER_IDが設定されていません。")
             self.line_bot_api = None
         else:
             self.line_bot_api = LineBotApi(self.token)
@@ -27,28 +30,51 @@ class LineNotifier:
     def send_message(self, message: str, isbroadcast: bool = False) -> bool:
         """LINE Messaging APIでメッセージを送信"""
         if not self.line_bot_api:
-            print(f"[LINE通知（テスト）] {message}")
+            logger.info("[LINE通知（テスト）] %s", message)
             return False
         
         try:
             if isbroadcast:
                 # ブロードキャストメッセージ
                 self.line_bot_api.broadcast(TextSendMessage(text=message))
-                print("LINEブロードキャスト通知送信成功")
+                logger.info("LINEブロードキャスト通知送信成功")
             else:
                 # 個別メッセージ
                 self.line_bot_api.push_message(
                     to=self.user_id,
                     messages=TextSendMessage(text=message)
                 )
-            print("LINE通知送信成功")
+            logger.info("LINE通知送信成功")
+            return True
+            
+        except LineBotApiError as e:
+            logger.error("LINE API エラー: %s - %s", e.status_code, e.error.message)
+            return False
+        except Exception as e:
+            logger.error("LINE通知送信エラー: %s", e)
+            return False
+    
+    def send_images(self, image_urls: list) -> bool:
+        """画像メッセージを送信（URLはHTTPSで公開されている必要がある。1回の送信は5件まで）"""
+        if not image_urls:
+            return False
+        if not self.line_bot_api:
+            logger.info("[LINE画像通知（テスト）] %s", ", ".join(image_urls))
+            return False
+        
+        try:
+            for i in range(0, len(image_urls), 5):
+                messages = [ImageSendMessage(original_content_url=url, preview_image_url=url)
+                            for url in image_urls[i:i + 5]]
+                self.line_bot_api.push_message(to=self.user_id, messages=messages)
+            logger.info("LINE画像通知送信成功: %d件", len(image_urls))
             return True
             
         except LineBotApiError as e:
-            print(f"LINE API エラー: {e.status_code} - {e.error.message}")
+            logger.error("LINE API エラー: %s - %s", e.status_code, e.error.message)
             return False
         except Exception as e:
-            print(f"LINE通知送信エラー: {e}")
+            logger.error("LINE画像通知送信エラー: %s", e)
             return False
     
     def get_usage(self) -> str:
@@ -58,13 +84,13 @@ class LineNotifier:
             quota = self.line_bot_api.get_message_quota()
             consumption = self.line_bot_api.get_message_quota_consumption()
             message = f"上限:{quota.value} - 使用済み:{consumption.total_usage}"
-            print(message)
+            logger.info(message)
             return message
         except LineBotApiError as e:
-            print(f"LINE API エラー: {e.status_code} - {e.error.message}")
+            logger.error("LINE API エラー: %s - %s", e.status_code, e.error.message)
             return None
         except Exception as e:
-            print(f"メッセージ利用情報取得エラー: {e}")
+            logger.error("メッセージ利用情報取得エラー: %s", e)
             return None
 
     def test_connection(self) -> bool:
@@ -76,6 +102,9 @@ class LineNotifier:
 
 def main():
     """テスト用のメイン関数"""
+    from libs.log_config import setup_logging
+
+    setup_logging()
     notifier = LineNotifier()
     
     print("=== LINE Messaging API接続テスト ===")
@@ -1,45 +1,264 @@
+import glob
+import hashlib
+import json
+import logging
 import os
-from datetime import datetime
+import signal
+import threading
+import time as time_module
+from datetime import datetime, time
 from libs.jp_stock_data import JPStockData
 from libs.us_stock_data import USStockData
 from stock_price_fetcher import StockPriceFetcher
 from line_notifier import LineNotifier
+from libs.log_config import setup_logging
+from libs.scheduler import MarketScheduler
+from libs.alert_rules import AlertRuleEngine
+from libs.snapshot_store import SnapshotStore
+from libs.top_movers import select_top_movers
+from libs.fund_nav_provider import CachedFundNavProvider, LocalFundNavProvider
+from libs.metadata_store import CompanyMetadataStore
+from libs.portfolio_loader import load_jp_exports, load_us_exports, resolve_export_paths
+from libs.market_calendar import MarketCalendar
+from libs.valuation_store import ValuationStore
+from libs.risk_metrics import BENCHMARKS, refresh_risk_model
+from libs.backtest import backtest_rules
+from libs.quote_board import QuoteBoard
+from libs.quote_stream import QuoteStreamer, SimulatedQuoteFeed, YahooQuoteFeed
+from libs.query_service import PortfolioQueryService
+from libs.chart_renderer import ChartRenderer, chart_urls, charts_available
+from libs.portfolio_artifact import PortfolioArtifactError, compile_portfolio_artifact, read_portfolio_artifact
 import yfinance as yf
 import pytz
 
+logger = logging.getLogger(__name__)
+
+MARKET_NAMES = {'jp': '日本株', 'us': '米国株'}
+
 
 class StockNotifier:
     """朝のポートフォリオ通知システム"""
     
-    def __init__(self):
+    def __init__(self, delta_threshold: float = None, top_k: int = None, quote_policy: str = 'fresh',
+                 fetch_deadline: float = None, portfolio_paths: dict = None,
+                 artifact_path: str = 'input/portfolio.skpf', lean_parse: bool = False,
+                 risk_metrics: bool = False, charts: bool = False):
         self.jp_stock_data = None
         self.us_stock_data = None
         self.price_fetcher = StockPriceFetcher()
         self.line_notifier = LineNotifier()
+        self.alert_engine = None
+        self.fund_nav_provider = None
+        self.snapshot_store = SnapshotStore()
+        self.valuation_store = ValuationStore()
+        # 保有銘柄の株価・数量を配列で保持する株価ボード（場中の再評価・アラート用）
+        self.quote_board = QuoteBoard()
+        # プッシュ型フィードからの株価ストリーミング（デーモンの --stream 指定時）
+        self.quote_streamer = None
+        # ストリーミング中にアラートを評価する間隔（秒）
+        self.stream_alert_interval = 60
+        self._stream_alert_checked = {}
+        self._stream_markets = ()
+        self._stream_prices = None
+        # アラートの評価はスケジューラとストリーミングのスレッドから呼ばれるため直列化する
+        self._alert_lock = threading.Lock()
+        # リスク指標（ボラティリティ・VaR・ベータ・集中度）をレポートに追加するか
+        self.risk_metrics = risk_metrics
+        self.risk_state_path = 'data/risk_state.npz'
+        # レポートの後にスパークライン・構成比のチャート画像を送信するか（要matplotlib）
+        self.charts = charts
+        self.chart_renderer = ChartRenderer()
+        # チャート画像を公開しているURL（data/charts/ の配信先。LINEの画像はHTTPSのURLが必要）
+        self.chart_base_url = os.getenv('CHART_BASE_URL')
+        self.metadata_store = CompanyMetadataStore(self.price_fetcher.get_company_info)
+        # 評価額の記録日などに使う市場カレンダー（祝日表の構築を避けるため市場ごとに1つを使い回す）
+        self.calendars = {'jp': MarketCalendar('JP'), 'us': MarketCalendar('US')}
+        # 差分モードの閾値（％）。Noneの場合は全銘柄を送信
+        self.delta_threshold = delta_threshold
+        # 上位銘柄モードの表示件数。Noneの場合は全銘柄を表示
+        self.top_k = top_k
+        # 株価の取得方針（fresh: 取得を待つ / swr: キャッシュ・CSV値で即答し裏で更新）
+        self.quote_policy = quote_policy
+        # 株価取得全体の期限（秒）。期限を過ぎた銘柄は取得不可として送信する
+        self.fetch_deadline = fetch_deadline
+        # 市場ごとのCSV（単一ファイル・複数口座のディレクトリ・globパターン）
+        self.portfolio_paths = {'jp': 'input/jp_data.csv', 'us': 'input/us_data.csv'}
+        self.portfolio_paths.update(portfolio_paths or {})
+        # CSVがない市場はコンパイル済みのアーティファクトから読み込む（GitHub Actions用）
+        self.artifact_path = artifact_path
+        # カテゴリ型・縮小した数値型で解析（大量の口座・履歴を保持する場合のメモリ削減）
+        self.lean_parse = lean_parse
+        self._file_signatures = {}
+        # ポートフォリオデータの時点（CSVの現在値を補完に使う際の経過時間計算用）
+        self._data_mtimes = {}
         
         # データファイルの存在確認と読み込み
         self._load_portfolio_data()
+        self._load_alert_rules()
+        self._load_fund_nav_provider()
     
     def _load_portfolio_data(self):
         """ポートフォリオデータを読み込み"""
-        jp_csv_path = 'input/jp_data.csv'
-        us_csv_path = 'input/us_data.csv'
+        missing = []
+        for market in self.portfolio_paths:
+            if self._get_portfolio_files(market):
+                self._load_market_data(market)
+            else:
+                missing.append(market)
         
-        # 日本株データ
-        if os.path.exists(jp_csv_path):
-            try:
-                self.jp_stock_data = JPStockData(jp_csv_path)
-                print(f"✅ 日本株データを読み込みました: {len(self.jp_stock_data.get_stock_codes())}銘柄")
-            except Exception as e:
-                print(f"❌ 日本株データの読み込みエラー: {e}")
+        if missing and self.artifact_path and os.path.exists(self.artifact_path):
+            self._load_artifact(missing)
+    
+    def _load_artifact(self, markets: list):
+        """コンパイル済みのアーティファクトから指定市場のデータを読み込み"""
+        try:
+            artifact = read_portfolio_artifact(self.artifact_path)
+        except (OSError, PortfolioArtifactError) as e:
+            logger.error("❌ ポートフォリオアーティファクトの読み込みエラー: %s", e)
+            return
+        
+        data_mtime = artifact['source_mtime'] or artifact['created_at']
+        for market in markets:
+            if market == 'jp':
+                self.jp_stock_data = JPStockData.from_dataframes(artifact['jp_stock'], artifact['jp_fund'])
+                count = len(set(self.jp_stock_data.get_stock_codes()))
+            else:
+                self.us_stock_data = USStockData.from_dataframe(artifact['us_stock'])
+                count = len(set(self.us_stock_data.get_stock_symbols()))
+            self._data_mtimes[market] = data_mtime
+            self._sync_quote_board(market)
+            logger.info("✅ %sデータをアーティファクトから読み込みました: %d銘柄", MARKET_NAMES[market], count)
+    
+    def _sync_quote_board(self, market: str):
+        """株価ボードの保有数量・取得単価をポートフォリオデータに合わせる"""
+        holdings = {}
+        if market == 'jp' and self.jp_stock_data:
+            for code in dict.fromkeys(self.jp_stock_data.get_stock_codes()):
+                details = self.jp_stock_data.get_stock_details(code)
+                holdings[code] = (details['quantity'], details['acquisition_price'])
+        elif market == 'us' and self.us_stock_data:
+            for symbol in dict.fromkeys(self.us_stock_data.get_stock_symbols()):
+                details = self.us_stock_data.get_stock_details(symbol)
+                holdings[symbol] = (details['quantity'], details['acquisition_price_usd'])
+        self.quote_board.set_holdings(market, holdings)
+    
+    def _get_portfolio_files(self, market: str) -> list:
+        """指定市場のCSVファイル一覧を取得（存在しない場合は空）"""
+        return resolve_export_paths(self.portfolio_paths[market])
+    
+    def _is_multi_account(self, market: str) -> bool:
+        """複数口座のCSV（ディレクトリまたはglobパターン）が指定されているか"""
+        path = self.portfolio_paths[market]
+        return os.path.isdir(path) or glob.has_magic(path)
+    
+    def _load_market_data(self, market: str) -> bool:
+        """指定市場のポートフォリオデータを読み込み、保有モデルを差し替え"""
+        csv_path = self.portfolio_paths[market]
+        paths = self._get_portfolio_files(market)
+        signature = self._get_file_signature(paths)
+        
+        try:
+            if market == 'jp':
+                if self._is_multi_account(market):
+                    stock_data = JPStockData.from_dataframes(*load_jp_exports(csv_path, lean=self.lean_parse))
+                else:
+                    stock_data = JPStockData(csv_path, lean=self.lean_parse)
+                count = len(set(stock_data.get_stock_codes()))
+            else:
+                if self._is_multi_account(market):
+                    stock_data = USStockData.from_dataframe(load_us_exports(csv_path, lean=self.lean_parse))
+                else:
+                    stock_data = USStockData(csv_path, lean=self.lean_parse)
+                count = len(set(stock_data.get_stock_symbols()))
+        except Exception as e:
+            logger.error("❌ %sデータの読み込みエラー: %s", MARKET_NAMES[market], e)
+            return False
+        
+        # 書き込み途中のファイルなどで銘柄が消えた場合は旧データを維持
+        current = self.jp_stock_data if market == 'jp' else self.us_stock_data
+        if count == 0 and current is not None:
+            logger.warning("⚠️ %sデータに銘柄がないため再読み込みを見送りました: %s", MARKET_NAMES[market], csv_path)
+            return False
+        
+        # 参照の差し替えは1回の代入で行う（読み取り側は常に新旧どちらかの完全なモデルを参照する）
+        if market == 'jp':
+            self.jp_stock_data = stock_data
+        else:
+            self.us_stock_data = stock_data
+        self._file_signatures[market] = signature
+        self._data_mtimes[market] = max(os.path.getmtime(path) for path in paths)
+        self._sync_quote_board(market)
+        
+        logger.info("✅ %sデータを読み込みました: %d銘柄", MARKET_NAMES[market], count)
+        return True
+    
+    @staticmethod
+    def _get_file_stats(paths: list) -> tuple:
+        """ファイル一覧のパス・mtime・サイズを取得（ファイルの追加・削除も検知できる）"""
+        stats = []
+        for path in paths:
+            stat = os.stat(path)
+            stats.append((path, stat.st_mtime_ns, stat.st_size))
+        return tuple(stats)
+    
+    @classmethod
+    def _get_file_signature(cls, paths: list) -> tuple:
+        """ファイルの更新検知用シグネチャ（各ファイルのmtime・サイズと内容ハッシュ）を取得"""
+        digest = hashlib.sha256()
+        for path in paths:
+            with open(path, 'rb') as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+        return (cls._get_file_stats(paths), digest.hexdigest())
+    
+    def reload_portfolio_if_changed(self) -> list:
+        """CSVが更新された市場のみ再読み込みし、再読み込みした市場を返す"""
+        reloaded = []
+        
+        for market, csv_path in self.portfolio_paths.items():
+            paths = self._get_portfolio_files(market)
+            if not paths:
+                continue
+            
+            previous = self._file_signatures.get(market)
+            # mtimeとサイズが同じなら内容の読み込みも省略
+            if previous and previous[0] == self._get_file_stats(paths):
+                continue
+            
+            # 内容が同じ（touchのみ等）ならシグネチャだけ更新
+            signature = self._get_file_signature(paths)
+            if previous and signature[1] == previous[1]:
+                self._file_signatures[market] = signature
+                continue
+            
+            logger.info("🔄 %sデータの更新を検知しました: %s", MARKET_NAMES[market], csv_path)
+            if self._load_market_data(market):
+                reloaded.append(market)
+                # 保有を続ける銘柄の株価キャッシュは維持し、売却済み銘柄のみ削除
+                if market == 'jp':
+                    self.price_fetcher.prune_cache("JP", self.jp_stock_data.get_stock_codes())
+                else:
+                    self.price_fetcher.prune_cache("US", self.us_stock_data.get_stock_symbols())
+        
+        if reloaded and self.quote_streamer is not None:
+            self.quote_streamer.update_symbols(self._get_stream_symbols(self._stream_markets))
+        return reloaded
+    
+    def _load_alert_rules(self):
+        """アラートルールを読み込み"""
+        rules_path = 'input/alert_rules.json'
         
-        # 米国株データ
-        if os.path.exists(us_csv_path):
+        if os.path.exists(rules_path):
             try:
-                self.us_stock_data = USStockData(us_csv_path)
-                print(f"✅ 米国株データを読み込みました: {len(self.us_stock_data.get_stock_symbols())}銘柄")
+                self.alert_engine = AlertRuleEngine.from_json(rules_path, state_path='data/alert_state.json')
             except Exception as e:
-                print(f"❌ 米国株データの読み込みエラー: {e}")
+                logger.error("❌ アラートルールの読み込みエラー: %s", e)
+    
+    def _load_fund_nav_provider(self):
+        """投資信託の基準価額プロバイダを設定"""
+        nav_path = 'input/fund_nav.json'
+        
+        if os.path.exists(nav_path):
+            self.fund_nav_provider = CachedFundNavProvider(LocalFundNavProvider(nav_path))
     
     def get_exchange_rate(self) -> float:
         """USD/JPYの為替レートを取得"""
@@ -47,24 +266,123 @@ class StockNotifier:
             ticker = yf.Ticker("USDJPY=X")
             data = ticker.history(period="1d")
             if not data.empty:
-                return data['Close'].iloc[-1]
+                rate = data['Close'].iloc[-1]
+                self.quote_board.set_fx_rate('US', rate)
+                return rate
         except Exception as e:
-            print(f"為替レート取得エラー: {e}")
+            logger.error("為替レート取得エラー: %s", e)
         
         # デフォルト値（手動更新が必要）
         return 150.0
     
+    def _get_quotes(self, codes: list, market: str) -> dict:
+        """株価を取得し、取得できない銘柄はキャッシュ・CSVの値で補完する
+
+        swrモードでは取得を待たずにキャッシュ・CSVの値を返し、バックグラウンドで更新する。
+        各株価には取得元（live / local / cache / csv）と経過秒数を付与する。
+        """
+        quotes = {}
+        if self.quote_policy == 'swr':
+            self.price_fetcher.refresh_prices_in_background(codes, market=market.upper())
+        else:
+            quotes.update(self._fetch_live_quotes(codes, market))
+        
+        fallback_count = 0
+        for code in codes:
+            if code not in quotes:
+                fallback = self._get_fallback_quote(code, market)
+                if fallback:
+                    quotes[code] = fallback
+                    fallback_count += 1
+        
+        # swrモードでも補完値のない銘柄（キャッシュが空でCSVの現在値もない米国株など）は取得を待つ
+        if self.quote_policy == 'swr':
+            unresolved = [code for code in codes if code not in quotes]
+            if unresolved:
+                quotes.update(self._fetch_live_quotes(unresolved, market))
+        
+        if fallback_count:
+            logger.info("⏳ %d銘柄はキャッシュ・CSVの株価を使用しました (%s)", fallback_count, market)
+        self.quote_board.update_many(quotes, market=market)
+        return quotes
+    
+    def _fetch_live_quotes(self, codes: list, market: str) -> dict:
+        """株価を期限内で取得し、取得元（live / local）と経過秒数を付与する"""
+        prices, _ = self.price_fetcher.get_multiple_prices_within(
+            codes, market=market.upper(), deadline=self.fetch_deadline, delay=0.3
+        )
+        quotes = {}
+        now = time_module.time()
+        for code, price_data in prices.items():
+            if price_data.get('provider') == 'local':
+                # ローカルファイルの株価は取得元・経過時間を注記し、評価額の履歴にも残さない
+                quotes[code] = {**price_data, 'price_source': 'local',
+                                'price_age': now - price_data.get('as_of', now)}
+            else:
+                quotes[code] = {**price_data, 'price_source': 'live', 'price_age': 0.0}
+        return quotes
+    
+    def _get_fallback_quote(self, code: str, market: str) -> dict:
+        """キャッシュ済みの株価とCSVの現在値のうち新しい方を取得"""
+        candidates = []
+        
+        cached = self.price_fetcher.get_cached_price(code, market=market.upper())
+        if cached:
+            price_data, age = cached
+            candidates.append({**price_data, 'price_source': 'cache', 'price_age': age})
+        
+        # SBI証券CSVの現在値・前日比（日本株のみ）
+        if market == 'jp' and self.jp_stock_data:
+            details = self.jp_stock_data.get_stock_details(code)
+            price = details.get('current_price')
+            if price is not None and price == price:
+                change = details.get('previous_day_change')
+                change = change if change == change and change is not None else 0
+                change_pct = details.get('previous_day_change_pct')
+                change_pct = change_pct if change_pct == change_pct and change_pct is not None else 0
+                csv_age = time_module.time() - self._data_mtimes.get('jp', time_module.time())
+                candidates.append({
+                    'code': code,
+                    'current_price': price,
+                    'previous_close': price - change,
+                    'price_change': change,
+                    'price_change_pct': change_pct,
+                    'price_source': 'csv',
+                    'price_age': csv_age
+                })
+        
+        if not candidates:
+            return None
+        return min(candidates, key=lambda quote: quote['price_age'])
+    
+    def _format_price_source(self, stock: dict) -> str:
+        """キャッシュ・CSVの株価を使用した場合の注記を作成"""
+        source = stock.get('price_source', 'live')
+        age = stock.get('price_age', 0)
+        if source == 'live' or (source == 'cache' and age < self.price_fetcher.cache_ttl):
+            return ""
+        
+        if age < 3600:
+            age_text = f"{age / 60:.0f}分前"
+        elif age < 86400:
+            age_text = f"{age / 3600:.0f}時間前"
+        else:
+            age_text = f"{age / 86400:.0f}日前"
+        
+        label = {'csv': "CSV値", 'local': "ローカル値"}.get(source, "キャッシュ")
+        return f" ⏳{label}・{age_text}"
+    
     def collect_jp_stock_data(self) -> dict:
         """日本株の現在価格を取得"""
         if not self.jp_stock_data:
             return {}
         
-        codes = self.jp_stock_data.get_stock_codes()
+        codes = list(dict.fromkeys(self.jp_stock_data.get_stock_codes()))
         if not codes:
             return {}
         
-        print("📈 日本株価格を取得中...")
-        current_prices = self.price_fetcher.get_multiple_prices(codes, market="JP", delay=0.3)
+        logger.info("📈 日本株価格を取得中... (%d銘柄)", len(codes))
+        current_prices = self._get_quotes(codes, 'jp')
         
         stocks = []
         for code in codes:
@@ -78,13 +396,21 @@ class StockNotifier:
                     'current_price': price_data['current_price'],
                     'price_change': price_data['price_change'],
                     'price_change_pct': price_data['price_change_pct'],
+                    'price_source': price_data['price_source'],
+                    'price_age': price_data['price_age'],
                     'quantity': stock_details['quantity'],
                     'acquisition_price': stock_details['acquisition_price']
                 })
         
+        # 株価を取得できなかった銘柄（レポートでは取得不可として表示）
+        names = self.jp_stock_data.get_stock_names()
+        unavailable = [f"{code} {names.get(code, '')}".rstrip()
+                       for code in codes if code not in current_prices]
+        
         return {
             'count': len(stocks),
-            'stocks': stocks
+            'stocks': stocks,
+            'unavailable': unavailable
         }
     
     def collect_us_stock_data(self) -> dict:
@@ -92,12 +418,12 @@ class StockNotifier:
         if not self.us_stock_data:
             return {}
         
-        symbols = self.us_stock_data.get_stock_symbols()
+        symbols = list(dict.fromkeys(self.us_stock_data.get_stock_symbols()))
         if not symbols:
             return {}
         
-        print("📈 米国株価格を取得中...")
-        current_prices = self.price_fetcher.get_multiple_prices(symbols, market="US", delay=0.3)
+        logger.info("📈 米国株価格を取得中... (%d銘柄)", len(symbols))
+        current_prices = self._get_quotes(symbols, 'us')
         
         stocks = []
         for symbol in symbols:
@@ -110,65 +436,90 @@ class StockNotifier:
                     'current_price': price_data['current_price'],
                     'price_change': price_data['price_change'],
                     'price_change_pct': price_data['price_change_pct'],
+                    'price_source': price_data['price_source'],
+                    'price_age': price_data['price_age'],
                     'quantity': stock_details['quantity'],
                     'acquisition_price_usd': stock_details['acquisition_price_usd']
                 })
         
+        # 株価を取得できなかった銘柄（レポートでは取得不可として表示）
+        unavailable = [symbol for symbol in dict.fromkeys(symbols) if symbol not in current_prices]
+        
         return {
             'count': len(stocks),
-            'stocks': stocks
+            'stocks': stocks,
+            'unavailable': unavailable
+        }
+    
+    def collect_fund_data(self) -> dict:
+        """投資信託の基準価額を取得"""
+        if not self.jp_stock_data or not self.fund_nav_provider:
+            return {}
+        
+        names = self.jp_stock_data.get_fund_names()
+        if not names:
+            return {}
+        
+        try:
+            navs = self.fund_nav_provider.get_navs_by_name(names)
+        except Exception as e:
+            logger.error("基準価額取得エラー: %s", e)
+            return {}
+        
+        funds = []
+        for name in names:
+            nav_data = navs.get(name)
+            fund_details = self.jp_stock_data.get_fund_details(name)
+            
+            if nav_data and fund_details:
+                nav = nav_data['nav']
+                previous_nav = nav_data['previous_nav']
+                change = nav - previous_nav if previous_nav else 0
+                funds.append({
+                    'name': name,
+                    'nav': nav,
+                    'nav_change': change,
+                    'nav_change_pct': (change / previous_nav * 100) if previous_nav else 0,
+                    'nav_date': nav_data.get('date'),
+                    # 基準価額は1万口あたり
+                    'evaluation': nav * fund_details['quantity'] / 10000,
+                })
+        
+        return {
+            'count': len(funds),
+            'funds': funds
         }
     
-    def create_portfolio_message(self, jp_data: dict, us_data: dict = None, exchange_rate: float = None) -> str:
+    def create_portfolio_message(self, jp_data: dict, us_data: dict = None, exchange_rate: float = None,
+                                 fund_data: dict = None, sector_breakdown: dict = None) -> str:
         """ポートフォリオレポートメッセージを作成"""
         message_lines = ["📊 朝のポートフォリオレポート"]
         message_lines.append("=" * 30)
         
         # 日本株情報
         if jp_data:
-            message_lines.append("🇯🇵 日本株")
-            message_lines.append(f"銘柄数: {jp_data.get('count', 0)}銘柄")
-            
-            for stock in jp_data.get('stocks', []):
-                code = stock.get('code', '')
-                name = stock.get('name', '')
-                current_price = stock.get('current_price', 0)
-                change = stock.get('price_change', 0)
-                change_pct = stock.get('price_change_pct', 0)
-                
-                # 変動の矢印表示
-                arrow = "📈" if change > 0 else "📉" if change < 0 else "➡️"
-                
-                message_lines.append(f"{arrow} {code} {name}")
-                message_lines.append(f"   {current_price:.0f}円 ({change:+.0f}円 {change_pct:+.2f}%)")
-            
+            message_lines.extend(self._create_jp_stock_section(jp_data))
             message_lines.append("")
         
         # 米国株情報
         if us_data:
-            message_lines.append("🇺🇸 米国株")
-            message_lines.append(f"銘柄数: {us_data.get('count', 0)}銘柄")
-            
-            if exchange_rate:
-                message_lines.append(f"USD/JPY: {exchange_rate:.2f}")
-            
-            for stock in us_data.get('stocks', []):
-                symbol = stock.get('symbol', '')
-                current_price = stock.get('current_price', 0)
-                change = stock.get('price_change', 0)
-                change_pct = stock.get('price_change_pct', 0)
-                
-                # 変動の矢印表示
-                arrow = "📈" if change > 0 else "📉" if change < 0 else "➡️"
-                
-                message_lines.append(f"{arrow} {symbol}")
-                message_lines.append(f"   ${current_price:.2f} (${change:+.2f} {change_pct:+.2f}%)")
-                
-                # 円換算表示（為替レートがある場合）
-                if exchange_rate:
-                    jpy_price = current_price * exchange_rate
-                    message_lines.append(f"   ≈{jpy_price:.0f}円")
-            
+            message_lines.extend(self._create_us_stock_section(us_data, exchange_rate))
+            message_lines.append("")
+        
+        # 投資信託情報
+        if fund_data:
+            message_lines.extend(self._create_fund_section(fund_data))
+            message_lines.append("")
+        
+        # セクター構成
+        if sector_breakdown:
+            message_lines.extend(self._create_sector_lines(sector_breakdown))
+            message_lines.append("")
+        
+        # リスク指標
+        risk_lines = self._create_risk_lines()
+        if risk_lines:
+            message_lines.extend(risk_lines)
             message_lines.append("")
         
         # 送信時刻
@@ -179,24 +530,189 @@ class StockNotifier:
         
         return "\n".join(message_lines)
     
+    def _create_delta_lines(self, stock: dict) -> list:
+        """差分モードの前回送信比の行を作成"""
+        if 'snapshot_change_pct' not in stock:
+            return []
+        if stock['snapshot_change_pct'] is None:
+            return ["   🆕 新規銘柄"]
+        return [f"   前回送信比 {stock['snapshot_change_pct']:+.2f}%"]
+    
+    def _format_jp_stock_lines(self, stock: dict) -> list:
+        """日本株1銘柄分の行を作成"""
+        code = stock.get('code', '')
+        name = stock.get('name', '')
+        current_price = stock.get('current_price', 0)
+        change = stock.get('price_change', 0)
+        change_pct = stock.get('price_change_pct', 0)
+        
+        # 変動の矢印表示
+        arrow = "📈" if change > 0 else "📉" if change < 0 else "➡️"
+        
+        lines = [f"{arrow} {code} {name}"]
+        lines.append(f"   {current_price:.0f}円 ({change:+.0f}円 {change_pct:+.2f}%){self._format_price_source(stock)}")
+        lines.extend(self._create_delta_lines(stock))
+        return lines
+    
+    def _format_us_stock_lines(self, stock: dict, exchange_rate: float = None) -> list:
+        """米国株1銘柄分の行を作成"""
+        symbol = stock.get('symbol', '')
+        current_price = stock.get('current_price', 0)
+        change = stock.get('price_change', 0)
+        change_pct = stock.get('price_change_pct', 0)
+        
+        # 変動の矢印表示
+        arrow = "📈" if change > 0 else "📉" if change < 0 else "➡️"
+        
+        lines = [f"{arrow} {symbol}"]
+        lines.append(f"   ${current_price:.2f} (${change:+.2f} {change_pct:+.2f}%){self._format_price_source(stock)}")
+        
+        # 円換算表示（為替レートがある場合）
+        if exchange_rate:
+            jpy_price = current_price * exchange_rate
+            lines.append(f"   ≈{jpy_price:.0f}円")
+        lines.extend(self._create_delta_lines(stock))
+        return lines
+    
+    def _create_top_movers_lines(self, stocks: list, format_fn, value_fn, unit: str) -> list:
+        """上位銘柄のみを表示し、残りを集計行にまとめる"""
+        movers = select_top_movers(stocks, self.top_k, value_fn)
+        lines = [f"評価額合計: {movers['total_value']:,.0f}{unit}"]
+        
+        if movers['gainers']:
+            lines.append(f"🏆 値上がり上位{len(movers['gainers'])}")
+            for stock in movers['gainers']:
+                lines.extend(format_fn(stock))
+        
+        if movers['losers']:
+            lines.append(f"💧 値下がり上位{len(movers['losers'])}")
+            for stock in movers['losers']:
+                lines.extend(format_fn(stock))
+        
+        if movers['largest']:
+            lines.append(f"💰 評価額上位{len(movers['largest'])}")
+            for stock, weight in movers['largest']:
+                label = stock.get('code') or stock.get('symbol', '')
+                lines.append(f"   {label} {value_fn(stock):,.0f}{unit} ({weight:.1f}%)")
+        
+        if movers['rest_count']:
+            lines.append(f"📦 その他 {movers['rest_count']}銘柄: "
+                         f"{movers['rest_value']:,.0f}{unit} ({movers['rest_change_pct']:+.2f}%)")
+        
+        return lines
+    
+    def _create_returns_lines(self, data: dict) -> list:
+        """評価額ストアから計算した期間騰落率の行を作成"""
+        returns = {label: pct for label, pct in data.get('returns', {}).items() if pct is not None}
+        if not returns:
+            return []
+        return ["📅 騰落率 " + " / ".join(f"{label} {pct:+.2f}%" for label, pct in returns.items())]
+    
+    def _compute_risk_metrics(self) -> dict:
+        """保有銘柄全体（日本株・米国株）のリスク指標を計算"""
+        holdings = {}
+        if self.jp_stock_data:
+            for code in dict.fromkeys(self.jp_stock_data.get_stock_codes()):
+                holdings[(code, 'JP')] = self.jp_stock_data.get_stock_details(code).get('quantity', 0)
+        if self.us_stock_data:
+            for symbol in dict.fromkeys(self.us_stock_data.get_stock_symbols()):
+                holdings[(symbol, 'US')] = self.us_stock_data.get_stock_details(symbol).get('quantity', 0)
+        if not holdings:
+            return {}
+        
+        try:
+            model = refresh_risk_model(self.risk_state_path, list(holdings),
+                                       self.price_fetcher.get_bulk_historical_data)
+        except (OSError, ValueError) as e:
+            logger.warning("リスクモデルの更新エラー: %s", e)
+            return {}
+        if model is None:
+            return {}
+        
+        # 評価額は保存済みの最新終値（円建て）×保有数量
+        values = {}
+        for (code, market), quantity in holdings.items():
+            key = f"{market}:{code}"
+            column = model.index.get(key)
+            if column is None:
+                continue
+            price = model.last_prices[column]
+            if price == price:
+                values[key] = price * quantity
+        benchmarks = {label: f"{market}:{code}" for label, (code, market) in BENCHMARKS.items()}
+        return model.metrics(values, benchmarks)
+    
+    def _create_risk_lines(self) -> list:
+        """リスク指標のセクションを作成"""
+        if not self.risk_metrics:
+            return []
+        
+        metrics = self._compute_risk_metrics()
+        if not metrics:
+            return []
+        
+        lines = ["⚖️ リスク指標（円建て・直近%d営業日）" % metrics['observations']]
+        lines.append(f"   ボラティリティ(年率) {metrics['volatility']:.1f}%")
+        lines.append(f"   VaR({metrics['var_level'] * 100:.0f}%/1日) {metrics['var']:,.0f}円 ({metrics['var_pct']:.2f}%)")
+        if metrics['betas']:
+            lines.append("   ベータ " + " / ".join(f"{label} {beta:.2f}" for label, beta in metrics['betas'].items()))
+        symbol, weight = metrics['max_weight']
+        lines.append(f"   集中度 HHI {metrics['hhi']:.3f} (実効{metrics['effective_count']:.1f}銘柄, 最大 {symbol.split(':', 1)[1]} {weight:.1f}%)")
+        return lines
+    
+    def _compute_sector_breakdown(self, jp_data: dict, us_data: dict, exchange_rate: float = None) -> dict:
+        """保有株式（日本株・米国株、円建て評価額）のセクター別構成比を企業情報ストアから計算
+
+        ストアにない銘柄のみ取得し、以降はローカルの企業情報を参照する。
+        """
+        values = {}
+        for stock in (jp_data or {}).get('stocks', []):
+            values[(stock['code'], 'JP')] = stock['current_price'] * stock['quantity']
+        if exchange_rate:
+            for stock in (us_data or {}).get('stocks', []):
+                values[(stock['symbol'], 'US')] = stock['current_price'] * stock['quantity'] * exchange_rate
+        if not values:
+            return {}
+        
+        self.metadata_store.prefetch(list(values))
+        breakdown = self.metadata_store.get_sector_breakdown(values)
+        # 企業情報が1件もない場合は表示しない
+        return {} if list(breakdown) == ['不明'] else breakdown
+    
+    def _create_sector_lines(self, breakdown: dict, max_sectors: int = 5) -> list:
+        """セクター構成のセクションを作成（上位 max_sectors 件、残りはその他にまとめる）"""
+        items = list(breakdown.items())
+        if len(items) > max_sectors:
+            items = items[:max_sectors - 1] + [("その他", sum(pct for _, pct in items[max_sectors - 1:]))]
+        return ["🏭 セクター構成（株式・円建て評価額）"] + [f"   {sector} {pct:.1f}%" for sector, pct in items]
+    
+    def _create_unavailable_lines(self, data: dict) -> list:
+        """株価を取得できなかった銘柄の行を作成"""
+        unavailable = data.get('unavailable', [])
+        if not unavailable:
+            return []
+        return [f"⚠️ 取得不可: {len(unavailable)}銘柄", f"   {', '.join(unavailable)}"]
+    
     def _create_jp_stock_section(self, jp_data: dict) -> list:
         """日本株セクションのメッセージを作成"""
         lines = []
         lines.append("🇯🇵 日本株")
         lines.append(f"銘柄数: {jp_data.get('count', 0)}銘柄")
+        lines.extend(self._create_returns_lines(jp_data))
         
-        for stock in jp_data.get('stocks', []):
-            code = stock.get('code', '')
-            name = stock.get('name', '')
-            current_price = stock.get('current_price', 0)
-            change = stock.get('price_change', 0)
-            change_pct = stock.get('price_change_pct', 0)
-            
-            # 変動の矢印表示
-            arrow = "📈" if change > 0 else "📉" if change < 0 else "➡️"
-            
-            lines.append(f"{arrow} {code} {name}")
-            lines.append(f"   {current_price:.0f}円 ({change:+.0f}円 {change_pct:+.2f}%)")
+        stocks = jp_data.get('stocks', [])
+        if self.top_k and len(stocks) > self.top_k:
+            lines.extend(self._create_top_movers_lines(
+                stocks, self._format_jp_stock_lines,
+                lambda stock: stock['current_price'] * stock['quantity'], "円"
+            ))
+        else:
+            for stock in stocks:
+                lines.extend(self._format_jp_stock_lines(stock))
+        
+        if jp_data.get('unchanged_count'):
+            lines.append(f"➖ 変動なし: {jp_data['unchanged_count']}銘柄")
+        lines.extend(self._create_unavailable_lines(jp_data))
         
         return lines
     
@@ -208,23 +724,39 @@ class StockNotifier:
         
         if exchange_rate:
             lines.append(f"USD/JPY: {exchange_rate:.2f}")
+        lines.extend(self._create_returns_lines(us_data))
         
-        for stock in us_data.get('stocks', []):
-            symbol = stock.get('symbol', '')
-            current_price = stock.get('current_price', 0)
-            change = stock.get('price_change', 0)
-            change_pct = stock.get('price_change_pct', 0)
-            
-            # 変動の矢印表示
+        stocks = us_data.get('stocks', [])
+        if self.top_k and len(stocks) > self.top_k:
+            rate = exchange_rate or 1.0
+            lines.extend(self._create_top_movers_lines(
+                stocks, lambda stock: self._format_us_stock_lines(stock, exchange_rate),
+                lambda stock: stock['current_price'] * stock['quantity'] * rate,
+                "円" if exchange_rate else "ドル"
+            ))
+        else:
+            for stock in stocks:
+                lines.extend(self._format_us_stock_lines(stock, exchange_rate))
+        
+        if us_data.get('unchanged_count'):
+            lines.append(f"➖ 変動なし: {us_data['unchanged_count']}銘柄")
+        lines.extend(self._create_unavailable_lines(us_data))
+        
+        return lines
+    
+    def _create_fund_section(self, fund_data: dict) -> list:
+        """投資信託セクションのメッセージを作成"""
+        lines = []
+        lines.append("🏦 投資信託")
+        lines.append(f"ファンド数: {fund_data.get('count', 0)}本")
+        
+        for fund in fund_data.get('funds', []):
+            change = fund['nav_change']
             arrow = "📈" if change > 0 else "📉" if change < 0 else "➡️"
             
-            lines.append(f"{arrow} {symbol}")
-            lines.append(f"   ${current_price:.2f} (${change:+.2f} {change_pct:+.2f}%)")
-            
-            # 円換算表示（為替レートがある場合）
-            if exchange_rate:
-                jpy_price = current_price * exchange_rate
-                lines.append(f"   ≈{jpy_price:.0f}円")
+            lines.append(f"{arrow} {fund['name']}")
+            lines.append(f"   {fund['nav']:,.0f}円 ({change:+,.0f}円 {fund['nav_change_pct']:+.2f}%) {fund['nav_date'] or ''}".rstrip())
+            lines.append(f"   評価額 {fund['evaluation']:,.0f}円")
         
         return lines
     
@@ -236,73 +768,163 @@ class StockNotifier:
         lines.append(self.line_notifier.get_usage())
         return lines
     
+    def _apply_delta(self, market: str, data: dict) -> dict:
+        """差分モード: 前回送信時から閾値以上変動した銘柄のみに絞り込む"""
+        if self.delta_threshold is None or not data:
+            return data
+        
+        key = 'code' if market == 'jp' else 'symbol'
+        changed = self.snapshot_store.diff(market, data['stocks'], key, self.delta_threshold)
+        logger.info("🔍 差分モード(%s): %d/%d銘柄が閾値 %.2f%% 以上変動",
+                    market, len(changed), len(data['stocks']), self.delta_threshold)
+        
+        return {**data, 'stocks': changed, 'unchanged_count': len(data['stocks']) - len(changed)}
+    
+    def _record_valuations(self, market: str, data: dict) -> dict:
+        """今回計算した評価額を評価額ストアに追記し、期間騰落率を付与したデータを返す"""
+        if not data or not data.get('stocks'):
+            return data
+        
+        key = 'code' if market == 'jp' else 'symbol'
+        day = self.calendars[market].local_date()
+        # キャッシュ・CSV・ローカルファイルの株価は履歴に残さない（市場合計が欠けないよう全銘柄が取得できた日のみ記録）
+        stale = [stock[key] for stock in data['stocks'] if stock.get('price_source', 'live') != 'live']
+        valuations = {str(stock[key]): (stock['current_price'], stock['quantity']) for stock in data['stocks']}
+        try:
+            if stale:
+                logger.info("最新の株価を取得できなかった銘柄があるため評価額を記録しません (%s): %d銘柄",
+                            market, len(stale))
+            else:
+                self.valuation_store.append(market, day, valuations)
+            returns = self.valuation_store.get_returns(market, day)
+        except (OSError, ValueError) as e:
+            logger.warning("評価額ストアの更新エラー (%s): %s", market, e)
+            return data
+        
+        return {**data, 'returns': returns}
+    
+    def _record_snapshot(self, market: str, sent_data: dict, all_data: dict):
+        """送信した銘柄をスナップショットに記録"""
+        if not sent_data:
+            return
+        
+        key = 'code' if market == 'jp' else 'symbol'
+        try:
+            self.snapshot_store.update(market, sent_data['stocks'], key,
+                                       held_symbols=[stock[key] for stock in all_data['stocks']])
+        except OSError as e:
+            logger.warning("スナップショットの保存エラー (%s): %s", market, e)
+    
     def _send_report(self, message: str, success_msg: str) -> bool:
         """共通のレポート送信処理"""
-        print("📱 LINE通知を送信中...")
+        logger.info("📱 LINE通知を送信中...")
         success = self.line_notifier.send_message(message, isbroadcast=False)
         
         if success:
-            print(f"✅ {success_msg}")
+            logger.info("✅ %s", success_msg)
         else:
-            print("❌ レポート送信に失敗しました")
+            logger.error("❌ レポート送信に失敗しました")
         
         return success
     
     def send_morning_report(self) -> bool:
         """朝のレポートを送信"""
-        print("🌅 朝のポートフォリオレポートを作成中...")
+        logger.info("🌅 朝のポートフォリオレポートを作成中...")
         
         # データ収集
         jp_data = self.collect_jp_stock_data()
         us_data = self.collect_us_stock_data()
+        fund_data = self.collect_fund_data()
         exchange_rate = self.get_exchange_rate() if us_data else None
         
         # 通知がない場合
         if not jp_data and not us_data:
-            print("❌ 送信するポートフォリオデータがありません")
+            logger.error("❌ 送信するポートフォリオデータがありません")
             return False
         
+        jp_data = self._record_valuations('jp', jp_data)
+        us_data = self._record_valuations('us', us_data)
+        
+        # 差分モードでは変動した銘柄のみ送信
+        jp_sent = self._apply_delta('jp', jp_data)
+        us_sent = self._apply_delta('us', us_data)
+        if self.delta_threshold is not None and not (jp_sent and jp_sent['stocks']) and not (us_sent and us_sent['stocks']):
+            logger.info("🔕 閾値以上の変動がないため送信をスキップしました")
+            return True
+        
+        # 差分モードで変動した銘柄のない市場はセクションごと省略
+        jp_section, us_section = jp_sent, us_sent
+        if self.delta_threshold is not None:
+            jp_section = jp_sent if jp_sent and jp_sent['stocks'] else None
+            us_section = us_sent if us_sent and us_sent['stocks'] else None
+        
         # メッセージ作成
         message = self.create_portfolio_message(
-            jp_data=jp_data if jp_data else None,
-            us_data=us_data if us_data else None,
-            exchange_rate=exchange_rate
+            jp_data=jp_section if jp_section else None,
+            us_data=us_section if us_section else None,
+            exchange_rate=exchange_rate,
+            fund_data=fund_data if fund_data else None,
+            sector_breakdown=self._compute_sector_breakdown(jp_data, us_data, exchange_rate)
         )
         
         # LINE通知送信
-        print("📱 LINE通知を送信中...")
+        logger.info("📱 LINE通知を送信中...")
         success = self.line_notifier.send_message(message, isbroadcast=False)
         
         if success:
-            print("✅ 朝のレポートを送信しました")
+            logger.info("✅ 朝のレポートを送信しました")
+            self._record_snapshot('jp', jp_sent, jp_data)
+            self._record_snapshot('us', us_sent, us_data)
+            self._send_charts(jp_data, us_data, exchange_rate)
         else:
-            print("❌ レポート送信に失敗しました")
+            logger.error("❌ レポート送信に失敗しました")
         
         return success
     
     def send_jp_report(self) -> bool:
         """日本株レポートを送信"""
-        print("🇯🇵 日本株レポートを作成中...")
+        logger.info("🇯🇵 日本株レポートを作成中...")
         
         # 日本株データ収集
         jp_data = self.collect_jp_stock_data()
         
         # 通知がない場合
         if not jp_data:
-            print("❌ 送信する日本株データがありません")
+            logger.error("❌ 送信する日本株データがありません")
             return False
         
+        jp_data = self._record_valuations('jp', jp_data)
+        
+        # 差分モードでは変動した銘柄のみ送信
+        jp_sent = self._apply_delta('jp', jp_data)
+        if self.delta_threshold is not None and not jp_sent['stocks']:
+            logger.info("🔕 閾値以上の変動がないため送信をスキップしました")
+            return True
+        
         # メッセージ作成（日本株のみ）
         message_lines = ["📊 日本株レポート (16:00)", "=" * 30]
-        message_lines.extend(self._create_jp_stock_section(jp_data))
+        message_lines.extend(self._create_jp_stock_section(jp_sent))
+        
+        fund_data = self.collect_fund_data()
+        if fund_data:
+            message_lines.append("")
+            message_lines.extend(self._create_fund_section(fund_data))
+        risk_lines = self._create_risk_lines()
+        if risk_lines:
+            message_lines.append("")
+            message_lines.extend(risk_lines)
         self._add_timestamp_and_usage(message_lines)
         
         message = "\n".join(message_lines)
-        return self._send_report(message, "日本株レポートを送信しました")
+        success = self._send_report(message, "日本株レポートを送信しました")
+        if success:
+            self._record_snapshot('jp', jp_sent, jp_data)
+            self._send_charts(jp_data=jp_data)
+        return success
     
     def send_us_report(self) -> bool:
         """米国株レポートを送信"""
-        print("🇺🇸 米国株レポートを作成中...")
+        logger.info("🇺🇸 米国株レポートを作成中...")
         
         # 米国株データ収集
         us_data = self.collect_us_stock_data()
@@ -310,22 +932,327 @@ class StockNotifier:
         
         # 通知がない場合
         if not us_data:
-            print("❌ 送信する米国株データがありません")
+            logger.error("❌ 送信する米国株データがありません")
             return False
         
+        us_data = self._record_valuations('us', us_data)
+        
+        # 差分モードでは変動した銘柄のみ送信
+        us_sent = self._apply_delta('us', us_data)
+        if self.delta_threshold is not None and not us_sent['stocks']:
+            logger.info("🔕 閾値以上の変動がないため送信をスキップしました")
+            return True
+        
         # メッセージ作成（米国株のみ）
         message_lines = ["📊 米国株レポート (06:00)", "=" * 30]
-        message_lines.extend(self._create_us_stock_section(us_data, exchange_rate))
+        message_lines.extend(self._create_us_stock_section(us_sent, exchange_rate))
+        risk_lines = self._create_risk_lines()
+        if risk_lines:
+            message_lines.append("")
+            message_lines.extend(risk_lines)
         self._add_timestamp_and_usage(message_lines)
         
         message = "\n".join(message_lines)
-        return self._send_report(message, "米国株レポートを送信しました")
+        success = self._send_report(message, "米国株レポートを送信しました")
+        if success:
+            self._record_snapshot('us', us_sent, us_data)
+            self._send_charts(us_data=us_data, exchange_rate=exchange_rate)
+        return success
+    
+    def _send_charts(self, jp_data: dict = None, us_data: dict = None, exchange_rate: float = None,
+                     max_holdings: int = 30) -> list:
+        """保有銘柄のスパークライン（1ヶ月）と評価額の構成比の画像を作成し、LINEに画像として送信
+
+        画像は入力データのハッシュでキャッシュし、株価の変わらない銘柄は再描画しない。
+        """
+        if not self.charts:
+            return []
+        if not charts_available():
+            logger.warning("matplotlibが見つからないためチャートを作成しません")
+            return []
+        
+        # レポートの本文は送信済みのため、チャートの失敗はレポートの結果に影響させない
+        try:
+            return self._render_and_send_charts(jp_data, us_data, exchange_rate, max_holdings)
+        except Exception as e:
+            logger.warning("チャートの作成・送信エラー: %s", e)
+            return []
+    
+    def _render_and_send_charts(self, jp_data: dict, us_data: dict, exchange_rate: float, max_holdings: int) -> list:
+        # 評価額（円）の大きい順に max_holdings 銘柄
+        values = {}
+        for stock in (jp_data or {}).get('stocks', []):
+            values[(stock['code'], 'JP')] = stock['current_price'] * stock['quantity']
+        for stock in (us_data or {}).get('stocks', []):
+            values[(stock['symbol'], 'US')] = stock['current_price'] * stock['quantity'] * (exchange_rate or 0)
+        holdings = sorted(values, key=values.get, reverse=True)[:max_holdings]
+        if not holdings:
+            return []
+        
+        paths = []
+        rendered, reused = self.chart_renderer.rendered, self.chart_renderer.reused
+        # 他市場の営業日で前日の値を埋めると平らな点が入るため、欠損は埋めずに銘柄ごとに除外する
+        history = self.price_fetcher.get_bulk_historical_data(holdings, period='1mo', fill_gaps=False)
+        if history is not None:
+            closes = history['終値']
+            series = {code: closes[code].dropna().tolist() for code, _ in holdings if code in closes.columns}
+            paths.append(self.chart_renderer.render_sparkline_grid(series))
+        paths.append(self.chart_renderer.render_allocation_pie({code: values[(code, market)] for code, market in holdings}))
+        paths = [path for path in paths if path]
+        
+        logger.info("🖼️ チャートを作成しました: 描画 %d件 / キャッシュ %d件",
+                    self.chart_renderer.rendered - rendered, self.chart_renderer.reused - reused)
+        self.chart_renderer.prune()
+        if not paths:
+            return []
+        if not self.chart_base_url:
+            logger.info("CHART_BASE_URLが未設定のためチャートは送信しません: %s", ", ".join(paths))
+            return paths
+        
+        self.line_notifier.send_images(chart_urls(paths, self.chart_base_url))
+        return paths
+    
+    def _get_acquisition_prices(self, market: str, symbols: list) -> dict:
+        """保有銘柄の取得単価を取得"""
+        prices = {}
+        for symbol in symbols:
+            if market == 'jp' and self.jp_stock_data:
+                details = self.jp_stock_data.get_stock_details(symbol)
+                if details:
+                    prices[symbol] = details['acquisition_price']
+            elif market == 'us' and self.us_stock_data:
+                details = self.us_stock_data.get_stock_details(symbol)
+                if details:
+                    prices[symbol] = details['acquisition_price_usd']
+        return prices
+    
+    def _get_held_symbols(self) -> list:
+        """保有銘柄を (コード, 市場) のリストで取得"""
+        symbols = []
+        if self.jp_stock_data:
+            symbols.extend((code, "JP") for code in dict.fromkeys(self.jp_stock_data.get_stock_codes()))
+        if self.us_stock_data:
+            symbols.extend((symbol, "US") for symbol in dict.fromkeys(self.us_stock_data.get_stock_symbols()))
+        return symbols
+    
+    def prefetch_company_info(self) -> int:
+        """保有銘柄の企業情報を一括でプリフェッチ（取得済みの銘柄は除く）"""
+        return self.metadata_store.prefetch(self._get_held_symbols())
+    
+    def check_alerts(self, market: str, use_quote_board: bool = False) -> bool:
+        """アラートルールを評価し、発火したルールのみLINE通知
+
+        use_quote_board=True の場合、株価ボードにある銘柄はボードの株価で評価し、
+        ボードにない銘柄のみ取得する。
+        """
+        if not self.alert_engine:
+            return False
+        
+        with self._alert_lock:
+            return self._check_alerts(market, use_quote_board)
+    
+    def _check_alerts(self, market: str, use_quote_board: bool) -> bool:
+        symbols = self.alert_engine.get_symbols(market)
+        if not symbols:
+            return False
+        
+        # ボードの株価はキャッシュの有効期間内のもののみ使う（古いキャッシュ・CSVの値は取得し直す）
+        quotes = (self.quote_board.get_quotes(market, symbols, max_age=self.price_fetcher.cache_ttl)
+                  if use_quote_board else {})
+        missing = [symbol for symbol in symbols if symbol not in quotes]
+        if missing:
+            quotes.update(self.price_fetcher.get_multiple_prices(missing, market=market.upper(), delay=0.3))
+        alerts = self.alert_engine.evaluate(
+            quotes,
+            market=market,
+            acquisition_prices=self._get_acquisition_prices(market, symbols)
+        )
+        
+        if not alerts:
+            logger.info("🔕 発火したアラートはありません (%s)", market)
+            return False
+        
+        message_lines = [f"🔔 価格アラート ({len(alerts)}件)", "=" * 30]
+        message_lines.extend(AlertRuleEngine.format_alert(alert) for alert in alerts)
+        return self._send_report("\n".join(message_lines), f"アラートを送信しました: {len(alerts)}件")
+    
+    def backtest_alerts(self, market: str, period: str = '2y', rules_path: str = 'input/alert_rules.json'):
+        """アラート・指標ルールを過去の日次終値で評価し、発火回数と発火後リターンをログに出力"""
+        if not os.path.exists(rules_path):
+            logger.error("❌ アラートルールがありません: %s", rules_path)
+            return None
+        with open(rules_path, 'r', encoding='utf-8') as f:
+            rules = json.load(f)
+        
+        symbols = list(dict.fromkeys(str(rule['symbol']) for rule in rules
+                                     if rule.get('market', 'JP').upper() == market.upper()))
+        if not symbols:
+            return None
+        
+        history = self.price_fetcher.get_bulk_historical_data([(symbol, market.upper()) for symbol in symbols], period)
+        if history is None:
+            return None
+        
+        summary = backtest_rules(rules, history['終値'], market=market,
+                                 acquisition_prices=self._get_acquisition_prices(market, symbols))
+        logger.info("🧪 バックテスト (%s, %s, %d営業日)", market, period, len(history))
+        for row in summary.itertuples():
+            logger.info("   %s %s %s %s %s: %d回 / 5日後 %+.2f%% (勝率 %.0f%%)",
+                        row.id, row.symbol, row.type, row.direction, row.threshold, row.fires,
+                        row.return_5d if row.fires else 0, row.win_rate_5d if row.fires else 0)
+        return summary
+    
+    def refresh_quotes(self, market: str):
+        """保有銘柄の株価キャッシュを更新（デーモンの場中更新用）"""
+        self.reload_portfolio_if_changed()
+        
+        if market == 'jp':
+            self.collect_jp_stock_data()
+        elif market == 'us':
+            self.collect_us_stock_data()
+        
+        self._log_revaluation()
+        self.check_alerts(market, use_quote_board=True)
+    
+    def _log_revaluation(self):
+        """株価ボードから評価額・損益・前日比を再計算してログに出力"""
+        totals = self.quote_board.revalue()
+        for market in ('JP', 'US', 'total'):
+            summary = totals[market]
+            if summary['count']:
+                logger.info("💹 %s: 評価額 %s円 / 損益 %s円 (%+.2f%%) / 前日比 %s円 (%+.2f%%)",
+                            market, f"{summary['value']:,.0f}", f"{summary['profit_loss']:+,.0f}",
+                            summary['profit_loss_pct'], f"{summary['day_change']:+,.0f}", summary['day_change_pct'])
+    
+    def start_quote_stream(self, source: str = 'yahoo', markets: tuple = ('jp', 'us')) -> QuoteStreamer:
+        """保有銘柄の株価をプッシュ型フィードから受信し、株価ボード・株価キャッシュに書き込む
+    
+        source: yahoo（Yahoo FinanceのWebSocket）/ simulated（ランダムウォークのローカルフィード）
+        """
+        self._stream_markets = tuple(markets)
+        self._stream_prices = {} if source == 'simulated' else None
+        symbols = self._get_stream_symbols(markets)
+        if source == 'simulated':
+            feed_factory = lambda: SimulatedQuoteFeed(self._stream_prices)
+        else:
+            feed_factory = YahooQuoteFeed
+    
+        self.quote_streamer = QuoteStreamer(feed_factory, symbols, self._apply_stream_ticks)
+        self.quote_streamer.start()
+        logger.info("📡 株価ストリーミングを開始しました: %d銘柄 (%s)", len(symbols), source)
+        return self.quote_streamer
+    
+    def _get_stream_symbols(self, markets: tuple) -> dict:
+        """ストリーミングで購読する保有銘柄（Yahoo Finance形式のシンボル -> (コード, 市場)）"""
+        symbols = {
+            self.price_fetcher._get_yahoo_symbol(code, market): (code, market)
+            for code, market in self._get_held_symbols() if market.lower() in markets
+        }
+        if self._stream_prices is not None:
+            # シミュレーションの初期株価（追加された銘柄のみ補完値から設定）
+            for yahoo_symbol, (code, market) in symbols.items():
+                if yahoo_symbol not in self._stream_prices:
+                    quote = self._get_fallback_quote(code, market.lower())
+                    self._stream_prices[yahoo_symbol] = quote['current_price'] if quote else 100.0
+        return symbols
+    
+    def stop_quote_stream(self):
+        """株価ストリーミングを停止"""
+        if self.quote_streamer is None:
+            return
+        self.quote_streamer.stop()
+        stats = self.quote_streamer.stats()
+        logger.info("📡 株価ストリーミングを停止しました: 受信 %d件 / 反映 %d件 / 集約 %d件 / 破棄 %d件 / 再接続 %d回",
+                    stats['received'], stats['delivered'], stats['conflated'], stats['dropped'], stats['reconnects'])
+        self.quote_streamer = None
+    
+    def _apply_stream_ticks(self, ticks: list):
+        """受信した株価を株価ボード・株価キャッシュに反映し、一定間隔でアラートを評価"""
+        markets = set()
+        for tick in ticks:
+            self.quote_board.update(tick['symbol'], tick['market'], tick['price'],
+                                    previous_close=tick['previous_close'], timestamp=tick['timestamp'])
+            self.price_fetcher.put_price(tick['symbol'], tick['market'], tick['price'],
+                                         previous_close=tick['previous_close'], timestamp=tick['timestamp'])
+            markets.add(tick['market'].lower())
+    
+        if not self.alert_engine:
+            return
+        now = time_module.monotonic()
+        for market in markets:
+            last_checked = self._stream_alert_checked.get(market)
+            if last_checked is None or now - last_checked >= self.stream_alert_interval:
+                self._stream_alert_checked[market] = now
+                self.check_alerts(market, use_quote_board=True)
+    
+    def _run_scheduled_report(self, market: str) -> bool:
+        """CSVの更新を反映してから定時レポートを送信"""
+        self.reload_portfolio_if_changed()
+        return self.send_jp_report() if market == 'jp' else self.send_us_report()
+    
+    def run_daemon(self, markets: tuple = ('jp', 'us'), jp_report_time: time = time(16, 0),
+                   us_report_time: time = time(6, 0), intraday_minutes: int = None, stream_source: str = None,
+                   http_port: int = None):
+        """常駐モードで実行（ポートフォリオ・キャッシュを保持したまま定時レポートを送信）
+
+        stream_source を指定した場合は保有銘柄の株価をストリーミングで受信し続ける。
+        http_port を指定した場合はポートフォリオの数値をJSONで返すHTTPサービスを開始する。
+        """
+        scheduler = MarketScheduler(tz='Asia/Tokyo')
+        
+        if self.jp_stock_data and 'jp' in markets:
+            scheduler.add_daily_job('jp-report', jp_report_time, 'JP', lambda: self._run_scheduled_report('jp'))
+            if intraday_minutes:
+                scheduler.add_interval_job('jp-refresh', intraday_minutes, 'JP', lambda: self.refresh_quotes('jp'))
+        
+        if self.us_stock_data and 'us' in markets:
+            scheduler.add_daily_job('us-report', us_report_time, 'US', lambda: self._run_scheduled_report('us'))
+            if intraday_minutes:
+                scheduler.add_interval_job('us-refresh', intraday_minutes, 'US', lambda: self.refresh_quotes('us'))
+        
+        if not scheduler.jobs:
+            logger.error("❌ 監視対象のポートフォリオデータがありません")
+            return
+        
+        # SIGTERM/SIGINTで安全に停止
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, lambda signum, frame: scheduler.stop())
+        
+        # 企業情報は起動時に不足分を取得し、以降は期限切れ分のみバックグラウンドで更新
+        self.prefetch_company_info()
+        self.metadata_store.start_background_refresh()
+        if stream_source:
+            self.start_quote_stream(stream_source, markets)
+        query_service = None
+        if http_port is not None:
+            query_service = PortfolioQueryService(self, port=http_port)
+            query_service.start()
+        
+        scheduler.run_forever()
+        if query_service:
+            query_service.stop()
+        self.stop_quote_stream()
+        self.metadata_store.stop()
+    
+    def serve_queries(self, port: int = 8765):
+        """株価を1回取得してからHTTPサービスを開始し、停止されるまで待つ（デーモンを使わない場合）"""
+        self.collect_jp_stock_data()
+        self.collect_us_stock_data()
+        self.get_exchange_rate()
+        
+        query_service = PortfolioQueryService(self, port=port)
+        query_service.start()
+        stop_event = threading.Event()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, lambda signum, frame: stop_event.set())
+        stop_event.wait()
+        query_service.stop()
     
     def schedule_check(self) -> bool:
         """実行時刻チェック（GitHub Actionsの場合は常にTrue）"""
         # GitHub Actionsで実行される場合は時間チェックをスキップ
         if os.getenv('GITHUB_ACTIONS'):
-            print("🤖 GitHub Actions環境で実行中 - 時間チェックをスキップ")
+            logger.info("🤖 GitHub Actions環境で実行中 - 時間チェックをスキップ")
             return True
         
         now = datetime.now()
@@ -335,10 +1262,15 @@ class StockNotifier:
         if 6 <= current_hour < 9:
             return True
         else:
-            print(f"⏰ 現在時刻 {now.strftime('%H:%M')} - 朝の通知時間外です (6:00-9:00)")
+            logger.info("⏰ 現在時刻 %s - 朝の通知時間外です (6:00-9:00)", now.strftime('%H:%M'))
             return False
 
 
+def _parse_hhmm(value: str) -> time:
+    """HH:MM形式の時刻を解析"""
+    return datetime.strptime(value, '%H:%M').time()
+
+
 def main():
     """メイン実行関数"""
     import argparse
@@ -347,18 +1279,113 @@ def main():
     parser = argparse.ArgumentParser(description='Portfolio notification system')
     parser.add_argument('--market', choices=['jp', 'us', 'both'], default='both',
                        help='Market to notify (jp: Japanese stocks, us: US stocks, both: both markets)')
+    parser.add_argument('--log-level', default=os.getenv('LOG_LEVEL', 'INFO'),
+                       choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                       help='Logging level (default: INFO, or $LOG_LEVEL)')
+    parser.add_argument('--log-format', choices=['text', 'json'], default='text',
+                       help='Log output format (json: one record per line for log aggregation)')
+    parser.add_argument('--quiet', action='store_true',
+                       help='Suppress per-symbol progress logs')
+    parser.add_argument('--delta-threshold', type=float, default=None, metavar='PCT',
+                       help='Send only holdings whose price moved at least PCT%% since the last delivered report')
+    parser.add_argument('--top-k', type=int, default=None, metavar='K',
+                       help='Show only top-K gainers, losers and largest positions; fold the rest into summary lines')
+    parser.add_argument('--prefetch-metadata', action='store_true',
+                       help='Fetch company info for all held symbols into the local metadata store and exit')
+    parser.add_argument('--quote-policy', choices=['fresh', 'swr'], default='fresh',
+                       help='fresh: wait for live quotes; swr: answer from cached/CSV prices and refresh in the background')
+    parser.add_argument('--deadline', type=float, default=None, metavar='SECONDS',
+                       help='Overall time budget for quote fetching; holdings not fetched in time are marked unavailable')
+    parser.add_argument('--jp-exports', default=None, metavar='PATH',
+                       help='Directory or glob of JP brokerage exports (one CSV per account), parsed in parallel')
+    parser.add_argument('--us-exports', default=None, metavar='PATH',
+                       help='Directory or glob of US brokerage exports (one CSV per account), parsed in parallel')
+    parser.add_argument('--artifact', default='input/portfolio.skpf', metavar='PATH',
+                       help='Pre-parsed portfolio artifact used for markets without CSV files (default: input/portfolio.skpf)')
+    parser.add_argument('--compile-artifact', action='store_true',
+                       help='Parse the CSV exports into the portfolio artifact and exit')
+    parser.add_argument('--lean-parse', action='store_true',
+                       help='Parse CSVs with categorical text columns and downcast numbers to reduce memory per row')
+    parser.add_argument('--risk-metrics', action='store_true',
+                       help='Add portfolio volatility, historical VaR, beta vs TOPIX/S&P 500 and concentration to reports')
+    parser.add_argument('--charts', action='store_true',
+                       help='Send 1-month sparklines and an allocation pie as LINE images after reports (needs matplotlib and $CHART_BASE_URL)')
+    parser.add_argument('--backtest', default=None, metavar='PERIOD',
+                       help='Replay daily history for PERIOD (e.g. 2y) through input/alert_rules.json and report fire counts')
+    parser.add_argument('--check-alerts', action='store_true',
+                       help='Evaluate input/alert_rules.json once and notify only fired rules')
+    parser.add_argument('--daemon', action='store_true',
+                       help='Run as a long-lived process with an internal TSE/NYSE-aware scheduler')
+    parser.add_argument('--jp-report-time', type=_parse_hhmm, default=time(16, 0),
+                       help='JST time of the JP report in daemon mode (default: 16:00)')
+    parser.add_argument('--us-report-time', type=_parse_hhmm, default=time(6, 0),
+                       help='JST time of the US report in daemon mode (default: 06:00)')
+    parser.add_argument('--intraday-interval', type=int, default=None, metavar='MINUTES',
+                       help='Refresh quotes every N minutes during market hours in daemon mode')
+    parser.add_argument('--http-port', type=int, default=None, metavar='PORT',
+                       help='Serve holdings, valuation, movers and history as cached JSON on 127.0.0.1:PORT')
+    parser.add_argument('--stream', choices=['yahoo', 'simulated'], default=None,
+                       help='Stream quotes for held symbols from a push feed in daemon mode (simulated: local random-walk feed)')
     args = parser.parse_args()
     
-    notifier = StockNotifier()
+    setup_logging(level=args.log_level, quiet=args.quiet, json_format=(args.log_format == 'json'))
+    
+    if args.compile_artifact:
+        counts = compile_portfolio_artifact(args.jp_exports or 'input/jp_data.csv',
+                                            args.us_exports or 'input/us_data.csv', args.artifact,
+                                            lean=args.lean_parse)
+        logger.info("📦 アーティファクトを作成しました: %s (%s)", args.artifact,
+                    ', '.join(f"{name}={count}行" for name, count in counts.items()))
+        return
+    
+    portfolio_paths = {}
+    if args.jp_exports:
+        portfolio_paths['jp'] = args.jp_exports
+    if args.us_exports:
+        portfolio_paths['us'] = args.us_exports
+    
+    notifier = StockNotifier(delta_threshold=args.delta_threshold, top_k=args.top_k,
+                             quote_policy=args.quote_policy, fetch_deadline=args.deadline,
+                             portfolio_paths=portfolio_paths, artifact_path=args.artifact,
+                             lean_parse=args.lean_parse, risk_metrics=args.risk_metrics, charts=args.charts)
+    
+    if args.daemon:
+        logger.info("🔁 SmartKabuka デーモンモード")
+        notifier.run_daemon(
+            markets=('jp', 'us') if args.market == 'both' else (args.market,),
+            jp_report_time=args.jp_report_time,
+            us_report_time=args.us_report_time,
+            intraday_minutes=args.intraday_interval,
+            stream_source=args.stream,
+            http_port=args.http_port
+        )
+        return
+    
+    if args.http_port is not None:
+        notifier.serve_queries(args.http_port)
+        return
+    
+    if args.prefetch_metadata:
+        count = notifier.prefetch_company_info()
+        logger.info("🏢 企業情報を保存しました: %d銘柄", count)
+        return
+    
+    if args.backtest:
+        for market in (('jp', 'us') if args.market == 'both' else (args.market,)):
+            notifier.backtest_alerts(market, args.backtest)
+        return
+    
+    if args.check_alerts:
+        for market in (('jp', 'us') if args.market == 'both' else (args.market,)):
+            notifier.check_alerts(market)
+        return
     
-    print("=" * 50)
     if args.market == 'jp':
-        print("🇯🇵 SmartKabuka 日本株通知システム")
+        logger.info("🇯🇵 SmartKabuka 日本株通知システム")
     elif args.market == 'us':
-        print("🇺🇸 SmartKabuka 米国株通知システム")
+        logger.info("🇺🇸 SmartKabuka 米国株通知システム")
     else:
-        print("🔔 SmartKabuka ポートフォリオ通知システム")
-    print("=" * 50)
+        logger.info("🔔 SmartKabuka ポートフォリオ通知システム")
     
     # 時刻チェック（GitHub Actionsでは常にTrue）
     if not notifier.schedule_check():
@@ -372,17 +1399,22 @@ def main():
     else:
         success = notifier.send_morning_report()
     
+    # swrモードの株価更新はデーモンスレッドで実行されるため、終了前に（上限付きで）完了を待つ
+    if args.quote_policy == 'swr' and not notifier.price_fetcher.wait_for_background_refresh(
+            timeout=args.deadline or 30.0):
+        logger.warning("⏱️ バックグラウンドの株価更新が完了する前に終了します")
+    
     if success:
         market_name = {"jp": "日本株", "us": "米国株", "both": "ポートフォリオ"}[args.market]
-        print(f"\n🎉 {market_name}レポート送信完了！")
+        logger.info("🎉 %sレポート送信完了！", market_name)
     else:
-        print("\n💥 レポート送信に問題が発生しました")
-        print("📋 チェック項目:")
-        print("  - .envファイルのLINE_MESSAGING_API_TOKEN設定")
-        print("  - .envファイルのLINE_USER_ID設定")
-        print("  - input/jp_data.csv（日本株）の存在")
-        print("  - input/us_data.csv（米国株）の存在")
-        print("  - インターネット接続")
+        logger.error("💥 レポート送信に問題が発生しました\n"
+                     "📋 チェック項目:\n"
+                     "  - .envファイルのLINE_MESSAGING_API_TOKEN設定\n"
+                     "  - .envファイルのLINE_USER_ID設定\n"
+                     "  - input/jp_data.csv（日本株）の存在\n"
+                     "  - input/us_data.csv（米国株）の存在\n"
+                     "  - インターネット接続")
 
 
 if __name__ == "__main__":
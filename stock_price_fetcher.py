@@ -1,135 +1,482 @@
 import yfinance as yf
 import pandas as pd
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
+import logging
+import threading
 import time
+from contextlib import nullcontext
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from libs.log_config import get_progress_logger
+from libs.price_providers import PriceProvider, default_providers, download_yahoo, yahoo_symbol
+from libs.rate_control import (AdaptiveLimiter, CircuitBreaker, CircuitOpenError,
+                               is_client_error, is_throttle_error, jittered_backoff)
+
+logger = logging.getLogger(__name__)
+progress_logger = get_progress_logger()
+
+# 履歴データの日本語カラム名
+HISTORY_COLUMNS = {
+    'Open': '始値',
+    'High': '高値',
+    'Low': '安値',
+    'Close': '終値',
+    'Volume': '出来高'
+}
+
+
+class _InflightCall:
+    """進行中の取得処理（同一キーの呼び出し元で結果を共有する）"""
+    
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
 
 
 class StockPriceFetcher:
     """Yahoo Finance APIを使って株価情報を取得するクラス"""
     
-    def __init__(self):
+    def __init__(self, providers: List[PriceProvider] = None):
         self.cache = {}
         self.cache_ttl = 300  # 5分間キャッシュ
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        # Yahoo Financeのスロットリングに合わせて同時実行数・間隔を自動調整
+        self.limiter = AdaptiveLimiter()
+        self.breaker = CircuitBreaker()
+        # 株価の取得元（優先順）。Yahoo Financeのプロバイダーは上記のレート制限とブレーカーを共有する
+        self.providers = providers if providers is not None else default_providers(self.limiter, self.breaker)
+        self.max_retries = 2
+        self.request_timeout = 15  # 1リクエストあたりの待ち時間上限（秒）
+        self._refresh_threads = {}
+    
+    def _call_upstream(self, fetch_fn, limiter: AdaptiveLimiter = None, breaker: CircuitBreaker = None):
+        """レート制御・サーキットブレーカー・リトライ付きで上流を呼び出す（既定はYahoo Financeの制御）"""
+        limiter = limiter or self.limiter
+        breaker = breaker or self.breaker
+        for attempt in range(self.max_retries + 1):
+            if not breaker.allow_request():
+                raise CircuitOpenError("上流への呼び出しを一時停止中です")
+            
+            try:
+                with limiter.slot():
+                    result = fetch_fn()
+            except Exception as e:
+                if is_client_error(e):
+                    # 上流は応答している（銘柄側のエラー）ため成功として扱い、ハーフオープンの試行も終了させる
+                    breaker.record_success()
+                    raise
+                if is_throttle_error(e):
+                    limiter.on_throttle()
+                else:
+                    limiter.on_failure()
+                breaker.record_failure()
+                
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(jittered_backoff(attempt))
+                continue
+            
+            limiter.on_success()
+            breaker.record_success()
+            return result
+    
+    def _get_cached(self, cache_key: str, ttl: float):
+        """有効期限内のキャッシュを取得"""
+        entry = self.cache.get(cache_key)
+        if entry is not None:
+            cached_data, timestamp = entry
+            if time.time() - timestamp < ttl:
+                return cached_data
+        return None
+    
+    def _single_flight(self, key: str, fetch_fn):
+        """同一キーの取得が進行中なら新たに取得せず、その結果を待って共有する"""
+        with self._inflight_lock:
+            call = self._inflight.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = _InflightCall()
+                self._inflight[key] = call
+        
+        if not is_leader:
+            call.event.wait()
+            return call.result
+        
+        try:
+            call.result = fetch_fn()
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+            call.event.set()
+        
+        return call.result
     
     def _get_yahoo_symbol(self, code: str, market: str = "JP") -> str:
         """株式コードをYahoo Finance形式に変換"""
-        if market == "JP":
-            return f"{code}.T"  # 日本株
-        elif market == "US":
-            return code  # 米国株はそのまま（例：AAPL, GOOGL）
-        else:
-            return code
+        return yahoo_symbol(code, market)
     
     def get_current_price(self, code: str, market: str = "JP") -> Optional[Dict]:
-        """単一銘柄の現在価格を取得"""
-        yahoo_symbol = self._get_yahoo_symbol(code, market)
-        
+        """単一銘柄の現在価格を取得（同一銘柄の同時要求は1回の取得にまとめる）"""
         # キャッシュチェック
         cache_key = f"current_{market}_{code}"
-        if cache_key in self.cache:
-            cached_data, timestamp = self.cache[cache_key]
-            if time.time() - timestamp < self.cache_ttl:
-                return cached_data
+        cached_data = self._get_cached(cache_key, self.cache_ttl)
+        if cached_data is not None:
+            return cached_data
         
+        return self._single_flight(cache_key, lambda: self.fetch_quotes([(code, market)])[0].get((code, market)))
+    
+    def _route(self, symbol: Tuple[str, str], tried: set) -> Optional[PriceProvider]:
+        """未試行で利用可能なプロバイダーのうち、優先順位が最も高いものを選択"""
+        for provider in self.providers:
+            if provider.name not in tried and provider.supports(symbol[1]) and provider.is_available():
+                return provider
+        return None
+    
+    def _fetch_batch(self, provider: PriceProvider, batch: List[Tuple[str, str]], progress: str,
+                     on_start=None) -> Dict:
+        """1バッチ分の株価をプロバイダーから取得してキャッシュに保存（失敗時は空）
+
+        on_start はレート制御の待ちが終わり、上流を呼び出す直前に（リトライごとに）呼ばれる。
+        """
+        progress_logger.info("株価取得中... %s %s %s", progress, provider.name,
+                             ", ".join(code for code, _ in batch[:3]) + (" ..." if len(batch) > 3 else ""),
+                             extra={'provider': provider.name, 'market': batch[0][1]})
         try:
-            ticker = yf.Ticker(yahoo_symbol)
-            info = ticker.info
-            
-            if 'currentPrice' not in info and 'regularMarketPrice' not in info:
-                print(f"価格情報が取得できませんでした: {code}")
-                return None
-            
-            current_price = info.get('currentPrice', info.get('regularMarketPrice', 0))
-            previous_close = info.get('previousClose', info.get('regularMarketPreviousClose', 0))
-            
-            # 前日比を計算
-            price_change = current_price - previous_close if previous_close else 0
-            price_change_pct = (price_change / previous_close * 100) if previous_close else 0
-            
-            result = {
-                'code': code,
-                'symbol': yahoo_symbol,
-                'market': market,
-                'current_price': current_price,
-                'previous_close': previous_close,
-                'price_change': price_change,
-                'price_change_pct': price_change_pct,
-                'market_cap': info.get('marketCap'),
-                'volume': info.get('volume', info.get('regularMarketVolume')),
-                'currency': info.get('currency', 'JPY' if market == 'JP' else 'USD'),
-                'last_update': datetime.now().isoformat()
-            }
-            
-            # キャッシュに保存
-            self.cache[cache_key] = (result, time.time())
-            
-            return result
+            def fetch():
+                if on_start is not None:
+                    on_start()
+                return provider.fetch_batch(batch, self.request_timeout)
             
+            with provider.slots:
+                quotes = self._call_upstream(fetch, provider.limiter, provider.breaker)
+        except CircuitOpenError as e:
+            logger.warning("株価取得スキップ (%s): %s", provider.name, e, extra={'provider': provider.name})
+            return {}
         except Exception as e:
-            print(f"株価取得エラー ({code}): {e}")
-            return None
+            logger.error("株価取得エラー (%s, %d銘柄): %s", provider.name, len(batch), e,
+                         extra={'provider': provider.name, 'symbols': [code for code, _ in batch]})
+            return {}
+        
+        now = time.time()
+        for (code, market), quote in quotes.items():
+            self.cache[f"current_{market}_{code}"] = (quote, now)
+        return quotes
     
-    def get_multiple_prices(self, codes: List[str], market: str = "JP", delay: float = 0.5) -> Dict[str, Dict]:
-        """複数銘柄の現在価格を取得（レート制限対応）"""
+    def fetch_quotes(self, symbols: List[Tuple[str, str]],
+                     deadline: float = None) -> Tuple[Dict[Tuple[str, str], Dict], List[Tuple[str, str]]]:
+        """複数銘柄の現在価格をプロバイダーごとにまとめて並列取得し、結果をキャッシュに保存
+
+        銘柄ごとに利用可能で優先順位の最も高いプロバイダーに振り分け、プロバイダーの batch_size
+        ごとに並列で取得する。取得に失敗した銘柄・データがなかった銘柄・request_timeout 秒を
+        超えたバッチの銘柄は、次のプロバイダーで取得し直す。打ち切った取得はバックグラウンドで
+        完了まで実行され、結果はキャッシュに保存される。
+        戻り値は (コード, 市場) -> 株価データと、期限・タイムアウトで打ち切った銘柄のリスト。
+        """
+        pending = list(dict.fromkeys(symbols))
+        tried = {symbol: set() for symbol in pending}
         results = {}
+        abandoned = set()
+        failover = False
+        begin = time.monotonic()
+        expired = lambda: deadline is not None and time.monotonic() - begin >= deadline
+        executor = ThreadPoolExecutor(max_workers=sum(provider.max_concurrency for provider in self.providers))
         
-        for i, code in enumerate(codes):
-            print(f"株価取得中... ({i+1}/{len(codes)}) {code} ({market})")
-            price_data = self.get_current_price(code, market)
-            
-            if price_data:
-                results[code] = price_data
-            
-            # API制限回避のための待機
-            if i < len(codes) - 1:
-                time.sleep(delay)
+        try:
+            while pending and not expired():
+                groups = {}
+                for symbol in pending:
+                    provider = self._route(symbol, tried[symbol])
+                    if provider is not None:
+                        tried[symbol].add(provider.name)
+                        groups.setdefault(provider, []).append(symbol)
+                if not groups:
+                    break
+                if failover:
+                    logger.info("%d銘柄を次のプロバイダーで取得します", sum(len(group) for group in groups.values()))
+                failover = True
+                
+                batches = [(provider, group[i:i + provider.batch_size])
+                           for provider, group in groups.items() for i in range(0, len(group), provider.batch_size)]
+                started = {}
+                
+                def _run(index: int, provider: PriceProvider, batch: List[Tuple[str, str]]) -> Dict:
+                    # タイムアウトはレート制御の待ち時間を含めず、上流の呼び出し開始から計る
+                    def on_start():
+                        started[index] = time.monotonic()
+                    return self._fetch_batch(provider, batch, f"({index + 1}/{len(batches)})", on_start)
+                
+                futures = {executor.submit(_run, i, provider, batch): i for i, (provider, batch) in enumerate(batches)}
+                waiting = set(futures)
+                while waiting:
+                    now = time.monotonic()
+                    limits = [started[futures[f]] + self.request_timeout for f in waiting if futures[f] in started]
+                    if deadline is not None:
+                        limits.append(begin + deadline)
+                    if any(futures[f] not in started for f in waiting):
+                        # レート制御で待機中のバッチが開始したらタイムアウトの監視を始める
+                        limits.append(now + 0.5)
+                    timeout = max(0.0, min(limits) - now) if limits else None
+                    
+                    done, waiting = wait(waiting, timeout=timeout, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        results.update(future.result())
+                    
+                    # 1バッチあたりのタイムアウトを超えた取得を打ち切り（銘柄は次のプロバイダーへ）
+                    now = time.monotonic()
+                    timed_out = {f for f in waiting
+                                 if futures[f] in started and now - started[futures[f]] >= self.request_timeout}
+                    for future in timed_out:
+                        abandoned.update(batches[futures[future]][1])
+                    waiting -= timed_out
+                    
+                    if expired():
+                        for future in waiting:
+                            abandoned.update(batches[futures[future]][1])
+                        break
+                
+                pending = [symbol for symbol in pending if symbol not in results]
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
         
+        skipped = [symbol for symbol in tried if symbol not in results and (symbol in abandoned or expired())]
+        failed = [symbol for symbol in tried if symbol not in results and symbol not in skipped]
+        for code, market in failed:
+            logger.warning("価格情報が取得できませんでした: %s", code, extra={'symbol': code, 'market': market})
+        return results, skipped
+    
+    def _fetch_shared(self, symbols: List[Tuple[str, str]],
+                      deadline: float = None) -> Tuple[Dict[Tuple[str, str], Dict], List[Tuple[str, str]]]:
+        """fetch_quotes を銘柄ごとに single-flight で実行（他の呼び出しが取得中の銘柄はその結果を待つ）"""
+        begin = time.monotonic()
+        leading, following = {}, {}
+        with self._inflight_lock:
+            for code, market in symbols:
+                key = f"current_{market}_{code}"
+                call = self._inflight.get(key)
+                if call is None:
+                    call = _InflightCall()
+                    self._inflight[key] = call
+                    leading[(code, market)] = (key, call)
+                else:
+                    following[(code, market)] = call
+        
+        results, skipped = {}, []
+        try:
+            if leading:
+                results, skipped = self.fetch_quotes(list(leading), deadline=deadline)
+        finally:
+            with self._inflight_lock:
+                for symbol, (key, call) in leading.items():
+                    call.result = results.get(symbol)
+                    del self._inflight[key]
+                    call.event.set()
+        
+        for symbol, call in following.items():
+            remaining = None if deadline is None else max(0.0, deadline - (time.monotonic() - begin))
+            if not call.event.wait(remaining):
+                skipped.append(symbol)
+            elif call.result is not None:
+                results[symbol] = call.result
+        return results, skipped
+    
+    def get_multiple_prices(self, codes: List[str], market: str = "JP", delay: float = None,
+                            deadline: float = None) -> Dict[str, Dict]:
+        """複数銘柄の現在価格を並列取得（レート制限対応）
+
+        同時実行数とリクエスト間隔はスロットリングの状況に応じて自動調整される。
+        delay を指定した場合は、この呼び出しの間だけリクエスト間隔の下限として使用する。
+        """
+        results, _ = self.get_multiple_prices_within(codes, market, deadline=deadline, delay=delay)
         return results
     
+    def get_multiple_prices_within(self, codes: List[str], market: str = "JP", deadline: float = None,
+                                   delay: float = None) -> Tuple[Dict[str, Dict], List[str]]:
+        """期限（秒）内に取得できた株価と、打ち切った銘柄のリストを返す
+
+        キャッシュにない銘柄はプロバイダーごとにまとめて取得する（fetch_quotes）。
+        1バッチあたり request_timeout 秒を超えた取得も打ち切る。打ち切った取得は
+        バックグラウンドで完了まで実行され、結果はキャッシュに保存される。
+        """
+        codes = list(dict.fromkeys(codes))
+        results = {}
+        for code in codes:
+            cached_data = self._get_cached(f"current_{market}_{code}", self.cache_ttl)
+            if cached_data is not None:
+                results[code] = cached_data
+        
+        skipped = []
+        missing = [(code, market) for code in codes if code not in results]
+        if missing:
+            # delay はこの呼び出しの間だけリクエスト間隔の下限とする（共有のリミッタは変更しない）
+            with self.limiter.interval_floor(delay) if delay is not None else nullcontext():
+                quotes, skipped_symbols = self._fetch_shared(missing, deadline=deadline)
+            results.update({code: quote for (code, _), quote in quotes.items()})
+            skipped = [code for code, _ in skipped_symbols]
+        
+        if skipped:
+            logger.warning("⏱️ 期限内に取得できなかった銘柄: %d件 (%s)", len(skipped), market,
+                           extra={'market': market, 'skipped': skipped})
+        
+        return results, skipped
+    
+    def get_cached_price(self, code: str, market: str = "JP") -> Optional[tuple]:
+        """有効期限に関わらずキャッシュ済みの現在価格と経過秒数を取得（ネットワークアクセスなし）"""
+        entry = self.cache.get(f"current_{market}_{code}")
+        if entry is None:
+            return None
+        
+        cached_data, timestamp = entry
+        return cached_data, time.time() - timestamp
+
+    def put_price(self, code: str, market: str, price: float, previous_close: float = None,
+                  timestamp: float = None) -> Dict:
+        """ストリーミングで受信した株価をキャッシュに書き込む（時価総額などは既存のキャッシュを引き継ぐ）"""
+        cache_key = f"current_{market}_{code}"
+        entry = self.cache.get(cache_key)
+        result = dict(entry[0]) if entry else {
+            'code': code,
+            'symbol': self._get_yahoo_symbol(code, market),
+            'market': market,
+            'previous_close': 0,
+            'market_cap': None,
+            'volume': None,
+            'currency': 'JPY' if market == 'JP' else 'USD',
+        }
+        if previous_close:
+            result['previous_close'] = previous_close
+        previous_close = result['previous_close']
+    
+        price_change = price - previous_close if previous_close else 0
+        result.update({
+            'current_price': price,
+            'price_change': price_change,
+            'price_change_pct': (price_change / previous_close * 100) if previous_close else 0,
+            'last_update': datetime.now().isoformat(),
+        })
+        self.cache[cache_key] = (result, timestamp or time.time())
+        return result
+    
+    def refresh_prices_in_background(self, codes: List[str], market: str = "JP") -> Optional[threading.Thread]:
+        """複数銘柄の現在価格をバックグラウンドで更新（同一市場の更新が実行中なら何もしない）"""
+        running = self._refresh_threads.get(market)
+        if running and running.is_alive():
+            return None
+        
+        thread = threading.Thread(target=self.get_multiple_prices, args=(list(codes), market),
+                                  name=f"quote-refresh-{market}", daemon=True)
+        self._refresh_threads[market] = thread
+        thread.start()
+        return thread
+    
+    def wait_for_background_refresh(self, timeout: float = 30.0) -> bool:
+        """実行中のバックグラウンド更新の完了を待つ（全体で timeout 秒まで）。すべて完了したらTrue"""
+        end = time.monotonic() + timeout
+        for thread in list(self._refresh_threads.values()):
+            thread.join(max(0.0, end - time.monotonic()))
+        return not any(thread.is_alive() for thread in self._refresh_threads.values())
+    
     def get_historical_data(self, code: str, market: str = "JP", period: str = "1mo") -> Optional[pd.DataFrame]:
-        """過去の株価データを取得"""
+        """過去の株価データを取得（同一条件の同時要求は1回の取得にまとめる）"""
+        key = f"history_{market}_{code}_{period}"
+        hist = self._single_flight(key, lambda: self._fetch_historical_data(code, market, period))
+        # 呼び出し元ごとに独立したDataFrameを返す
+        return hist.copy() if hist is not None else None
+    
+    def _fetch_historical_data(self, code: str, market: str, period: str) -> Optional[pd.DataFrame]:
+        """Yahoo Financeから過去の株価データを取得"""
         yahoo_symbol = self._get_yahoo_symbol(code, market)
         
         try:
-            ticker = yf.Ticker(yahoo_symbol)
-            hist = ticker.history(period=period)
+            hist = self._call_upstream(lambda: yf.Ticker(yahoo_symbol).history(period=period, timeout=self.request_timeout))
             
             if hist.empty:
-                print(f"履歴データが取得できませんでした: {code}")
+                logger.warning("履歴データが取得できませんでした: %s", code, extra={'symbol': code, 'market': market})
                 return None
             
             # 日本語カラム名に変更
-            hist = hist.rename(columns={
-                'Open': '始値',
-                'High': '高値', 
-                'Low': '安値',
-                'Close': '終値',
-                'Volume': '出来高'
-            })
+            hist = hist.rename(columns=HISTORY_COLUMNS)
             
             hist['銘柄コード'] = code
             
             return hist
             
         except Exception as e:
-            print(f"履歴データ取得エラー ({code}): {e}")
+            logger.error("履歴データ取得エラー (%s): %s", code, e, extra={'symbol': code, 'market': market})
             return None
     
-    def get_company_info(self, code: str, market: str = "JP") -> Optional[Dict]:
-        """企業情報を取得"""
-        yahoo_symbol = self._get_yahoo_symbol(code, market)
+    def get_bulk_historical_data(self, symbols: List[Tuple[str, str]], period: str = "1mo",
+                                 fill_gaps: bool = True) -> Optional[pd.DataFrame]:
+        """複数銘柄の過去の株価データを1回の一括リクエストで取得
+
+        symbols は (コード, 市場) のリスト。戻り値の列は (項目, コード) のMultiIndexで、
+        df['終値'] で銘柄を列とした終値の表が得られる。日付は日本株・米国株の取引日の和集合
+        （タイムゾーンなしの日付）に揃え、fill_gaps=True の場合は休場日の価格を直前の終値等で
+        前方補完し、出来高を0とする（上場前・取得開始前の欠損はそのまま）。
+        """
+        symbols = list(dict.fromkeys(symbols))
+        if not symbols:
+            return None
+        
+        key = f"bulk_history_{period}_{fill_gaps}_" + ",".join(f"{market}:{code}" for code, market in symbols)
+        hist = self._single_flight(key, lambda: self._fetch_bulk_historical_data(symbols, period, fill_gaps))
+        return hist.copy() if hist is not None else None
+    
+    def _fetch_bulk_historical_data(self, symbols: List[Tuple[str, str]], period: str,
+                                    fill_gaps: bool) -> Optional[pd.DataFrame]:
+        """Yahoo Financeから複数銘柄の履歴データを一括取得して整形"""
+        codes = {self._get_yahoo_symbol(code, market): code for code, market in symbols}
+        
+        try:
+            # 1銘柄も取得できなかった場合（レート制限など）は例外になり、失敗として記録される
+            raw = self._call_upstream(lambda: download_yahoo(
+                list(codes), period=period, group_by='column', auto_adjust=True, ignore_tz=True,
+                progress=False, timeout=self.request_timeout, multi_level_index=True
+            ))
+        except Exception as e:
+            logger.error("一括履歴データ取得エラー (%d銘柄): %s", len(codes), e)
+            return None
         
+        # (項目, Yahooシンボル) -> (日本語の項目, コード)
+        fields = [field for field in HISTORY_COLUMNS if field in raw.columns.get_level_values(0)]
+        hist = raw[fields].rename(columns=HISTORY_COLUMNS, level=0).rename(columns=codes, level=1)
+        hist.columns = hist.columns.set_names(['項目', '銘柄コード'])
+        hist.index = pd.DatetimeIndex(hist.index).tz_localize(None).normalize()
+        hist = hist[~hist.index.duplicated(keep='last')].sort_index()
+        
+        # 1件も取得できなかった銘柄は除外
+        closes = hist['終値']
+        missing = [code for code in closes.columns if closes[code].isna().all()]
+        if missing:
+            logger.warning("履歴データが取得できなかった銘柄: %s", ", ".join(missing))
+            hist = hist.drop(columns=missing, level=1)
+        
+        if fill_gaps:
+            is_price = hist.columns.get_level_values(0) != '出来高'
+            hist.loc[:, is_price] = hist.loc[:, is_price].ffill()
+            if not is_price.all():
+                # 休場日（補完後の終値があり出来高が欠損）の出来高は0
+                volume = hist['出来高']
+                hist.loc[:, ~is_price] = volume.where(volume.notna() | hist['終値'].isna(), 0).to_numpy()
+        
+        return hist
+    
+    def get_company_info(self, code: str, market: str = "JP") -> Optional[Dict]:
+        """企業情報を取得（同一銘柄の同時要求は1回の取得にまとめる）"""
         # キャッシュチェック
         cache_key = f"info_{market}_{code}"
-        if cache_key in self.cache:
-            cached_data, timestamp = self.cache[cache_key]
-            if time.time() - timestamp < 3600:  # 1時間キャッシュ
-                return cached_data
+        cached_data = self._get_cached(cache_key, 3600)  # 1時間キャッシュ
+        if cached_data is not None:
+            return cached_data
+        
+        return self._single_flight(cache_key, lambda: self._fetch_company_info(code, market, cache_key))
+    
+    def _fetch_company_info(self, code: str, market: str, cache_key: str) -> Optional[Dict]:
+        """Yahoo Financeから企業情報を取得してキャッシュに保存"""
+        yahoo_symbol = self._get_yahoo_symbol(code, market)
         
         try:
-            ticker = yf.Ticker(yahoo_symbol)
-            info = ticker.info
+            info = self._call_upstream(lambda: yf.Ticker(yahoo_symbol).info)
             
             result = {
                 'code': code,
@@ -153,18 +500,27 @@ class StockPriceFetcher:
             return result
             
         except Exception as e:
-            print(f"企業情報取得エラー ({code}): {e}")
+            logger.error("企業情報取得エラー (%s): %s", code, e, extra={'symbol': code, 'market': market})
             return None
     
     def clear_cache(self):
         """キャッシュをクリア"""
         self.cache.clear()
 
+    def prune_cache(self, market: str, keep_codes: List[str]):
+        """保有しなくなった銘柄のキャッシュを削除（保有継続銘柄のキャッシュは維持）"""
+        keep = {f"{prefix}_{market}_{code}" for code in keep_codes for prefix in ('current', 'info')}
+        for cache_key in list(self.cache):
+            if f"_{market}_" in cache_key and cache_key not in keep:
+                del self.cache[cache_key]
+
 
 def main():
     """テスト用のメイン関数"""
     from libs.jp_stock_data import JPStockData
-    from libs.us_stock_data import USStockData
+    from libs.log_config import setup_logging
+
+    setup_logging()
     
     # 保有銘柄を取得
     stock_data = JPStockData('input/jp_data.csv')
@@ -0,0 +1,59 @@
+import unittest
+from unittest import mock
+
+from yfinance.exceptions import YFRateLimitError
+
+from libs.price_providers import YahooDownloadError, YahooDownloadProvider, download_yahoo
+from libs.rate_control import CircuitBreaker, is_throttle_error
+from stock_price_fetcher import StockPriceFetcher
+
+SYMBOLS = [('AAPL', 'US'), ('MSFT', 'US')]
+
+
+class YahooDownloadThrottleTest(unittest.TestCase):
+    """yf.download が銘柄ごとの429を握りつぶした場合も、レート制御・ブレーカーに失敗として伝わること"""
+
+    def setUp(self):
+        # yf.download の内部で呼ばれる Ticker.history を429にする（ネットワークには接続しない）
+        patches = [
+            mock.patch('yfinance.base.TickerBase.history', side_effect=YFRateLimitError()),
+            mock.patch('time.sleep'),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_download_raises_throttle_error(self):
+        with self.assertRaises(YahooDownloadError) as context:
+            download_yahoo(['AAPL', 'MSFT'], period='5d', progress=False, threads=False)
+        self.assertTrue(is_throttle_error(context.exception))
+
+    def test_throttled_batches_reduce_concurrency_and_open_breaker(self):
+        fetcher = StockPriceFetcher(providers=[])
+        fetcher.max_retries = 0
+        fetcher.breaker = CircuitBreaker(failure_threshold=3)
+        fetcher.providers = [YahooDownloadProvider(fetcher.limiter, fetcher.breaker)]
+        initial_concurrency = fetcher.limiter.concurrency
+        initial_interval = fetcher.limiter.interval
+
+        for _ in range(3):
+            quotes, _ = fetcher.fetch_quotes(SYMBOLS)
+            self.assertEqual(quotes, {})
+
+        self.assertLess(fetcher.limiter.concurrency, initial_concurrency)
+        self.assertGreater(fetcher.limiter.interval, initial_interval)
+        self.assertEqual(fetcher.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(fetcher.providers[0].is_available())
+
+    def test_throttled_bulk_history_is_recorded_as_failure(self):
+        fetcher = StockPriceFetcher(providers=[])
+        fetcher.max_retries = 0
+        initial_concurrency = fetcher.limiter.concurrency
+
+        self.assertIsNone(fetcher.get_bulk_historical_data(SYMBOLS, '1mo'))
+        self.assertLess(fetcher.limiter.concurrency, initial_concurrency)
+        self.assertEqual(fetcher.breaker._failures, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()